@@ -7,6 +7,7 @@ from django.conf import settings
 from django.urls import path, reverse, NoReverseMatch
 from . import views
 from .tasks import generate_narrative_blueprint
+from .services.upload_progress import get_upload_progress, format_upload_progress
 
 print("--- [DEBUG] admin.py file is being loaded ---")
 
@@ -106,9 +107,26 @@ class MediaAdmin(admin.ModelAdmin):
             path('<path:media_id>/batch-upload/', self.admin_site.admin_view(views.batch_upload_page_view),
                  name='%s_%s_batch_upload' % info),
 
-            # (新增) 文件上传接收器的 API URL
-            path('<path:media_id>/api/upload/', self.admin_site.admin_view(views.batch_file_upload_view),
-                 name='%s_%s_batch_upload_api' % info),
+            # (新增) 可断点续传的分片上传 API
+            path('<path:media_id>/api/upload/init/', self.admin_site.admin_view(views.chunked_upload_init_view),
+                 name='%s_%s_chunked_upload_init' % info),
+            path('<path:media_id>/api/upload/<str:upload_id>/chunk/<int:chunk_index>/',
+                 self.admin_site.admin_view(views.chunked_upload_chunk_view),
+                 name='%s_%s_chunked_upload_chunk' % info),
+            path('<path:media_id>/api/upload/<str:upload_id>/complete/',
+                 self.admin_site.admin_view(views.chunked_upload_complete_view),
+                 name='%s_%s_chunked_upload_complete' % info),
+            path('<path:media_id>/api/upload/<str:upload_id>/',
+                 self.admin_site.admin_view(views.chunked_upload_status_view),
+                 name='%s_%s_chunked_upload_status' % info),
+
+            # (新增) S3 直传 API
+            path('<path:media_id>/api/s3-upload/init/', self.admin_site.admin_view(views.s3_upload_init_view),
+                 name='%s_%s_s3_upload_init' % info),
+            path('<path:media_id>/api/s3-upload/sign/', self.admin_site.admin_view(views.s3_upload_sign_view),
+                 name='%s_%s_s3_upload_sign' % info),
+            path('<path:media_id>/api/s3-upload/complete/', self.admin_site.admin_view(views.s3_upload_complete_view),
+                 name='%s_%s_s3_upload_complete' % info),
 
             # (新增) 任务触发器的 URL
             path('<path:media_id>/trigger-ingest/', self.admin_site.admin_view(views.trigger_ingest_task),
@@ -123,9 +141,9 @@ class AssetAdmin(admin.ModelAdmin):
     资产条目 (Asset) 模型的后台管理配置
     """
     list_display = (
-        '__str__', 'processing_status', 'l1_status', 'l2_l3_status', 'copyright_status', 'updated_at', 'subeditor_actions','annotator_actions'
+        '__str__', 'processing_status', 'transcode_progress_display', 'l1_status', 'l2_l3_status', 'copyright_status', 'updated_at', 'subeditor_actions','annotator_actions'
     )
-    list_filter = ('media', 'processing_status', 'l1_status', 'l2_l3_status', 'copyright_status', 'language')
+    list_filter = ('media', 'processing_status', 'processing_path', 'l1_status', 'l2_l3_status', 'copyright_status', 'language')
     search_fields = ('title', 'media__title')
 
     fieldsets = (
@@ -139,7 +157,12 @@ class AssetAdmin(admin.ModelAdmin):
             'classes': ('collapse',),
             'fields': (
                 ('processing_status', 'processing_status_changed_at'),
+                ('transcode_progress_display', 'upload_progress_display'),
                 'processed_video_url',
+                ('proxy_video_url', 'thumbnails_vtt_url'),
+                ('processing_path', 'transcode_cache_key'),
+                'source_probe',
+                'artifact_checksums',
                 ('l1_status', 'l1_status_changed_at'),
                 'l1_output_file',
                 ('l2_l3_status', 'l2_l3_status_changed_at')
@@ -156,6 +179,12 @@ class AssetAdmin(admin.ModelAdmin):
         'l1_status_changed_at',
         'l2_l3_status_changed_at',
         'subeditor_actions_in_form',
+        'transcode_cache_key',
+        'transcode_progress_display',
+        'upload_progress_display',
+        'processing_path',
+        'source_probe',
+        'artifact_checksums',
     )
 
     def get_fieldsets(self, request, obj=None):
@@ -175,6 +204,18 @@ class AssetAdmin(admin.ModelAdmin):
 
         return fieldsets
 
+    def transcode_progress_display(self, obj):
+        """显示转码进度摘要：百分比、fps、速度倍率与剩余时间"""
+        return obj.get_transcode_progress_display() or '-'
+
+    transcode_progress_display.short_description = '转码进度'
+
+    def upload_progress_display(self, obj):
+        """显示产出物上传进度与吞吐量（读取 Redis 中的上传进度）"""
+        return format_upload_progress(get_upload_progress(obj.id)) or '-'
+
+    upload_progress_display.short_description = '上传进度'
+
     def subeditor_actions(self, obj):
         """用于列表页的按钮生成方法"""
         target_url = obj.get_subeditor_url()
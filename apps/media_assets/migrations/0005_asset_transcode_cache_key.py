@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_assets', '0004_media_ingestion_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='transcode_cache_key',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True, verbose_name='转码缓存键'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_assets', '0005_asset_transcode_cache_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='transcode_progress',
+            field=models.JSONField(blank=True, null=True, verbose_name='转码进度'),
+        ),
+    ]
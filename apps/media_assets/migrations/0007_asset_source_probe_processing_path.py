@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_assets', '0006_asset_transcode_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='processing_path',
+            field=models.CharField(blank=True, choices=[('transcode', '重新编码'), ('remux', '流复制封装'), ('cache', '复用转码缓存')], max_length=20, null=True, verbose_name='处理路径'),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='source_probe',
+            field=models.JSONField(blank=True, null=True, verbose_name='源文件探测信息'),
+        ),
+    ]
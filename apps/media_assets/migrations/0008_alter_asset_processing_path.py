@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_assets', '0007_asset_source_probe_processing_path'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='asset',
+            name='processing_path',
+            field=models.CharField(blank=True, choices=[('transcode', '重新编码'), ('remux', '流复制封装'), ('segmented', '分段并行编码'), ('cache', '复用转码缓存')], max_length=20, null=True, verbose_name='处理路径'),
+        ),
+    ]
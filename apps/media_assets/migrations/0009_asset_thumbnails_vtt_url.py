@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_assets', '0008_alter_asset_processing_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='thumbnails_vtt_url',
+            field=models.URLField(blank=True, max_length=1024, null=True, verbose_name='缩略图索引URL (WebVTT)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_assets', '0009_asset_thumbnails_vtt_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='proxy_video_url',
+            field=models.URLField(blank=True, max_length=1024, null=True, verbose_name='标注代理视频URL'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_assets', '0010_asset_proxy_video_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='artifact_checksums',
+            field=models.JSONField(blank=True, null=True, verbose_name='产出物校验和'),
+        ),
+    ]
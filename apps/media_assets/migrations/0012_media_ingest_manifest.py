@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_assets', '0011_asset_artifact_checksums'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='media',
+            name='ingest_manifest',
+            field=models.JSONField(blank=True, null=True, verbose_name='批量加载清单'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_assets', '0012_media_ingest_manifest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirectUploadSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_key', models.CharField(max_length=1024, verbose_name='对象键')),
+                ('upload_id', models.CharField(max_length=1024, verbose_name='分片上传ID')),
+                ('total_size', models.BigIntegerField(verbose_name='文件大小')),
+                ('last_modified', models.BigIntegerField(verbose_name='文件最后修改时间')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('media', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='direct_upload_sessions', to='media_assets.media', verbose_name='所属媒资')),
+            ],
+            options={
+                'verbose_name': 'S3 直传会话',
+                'verbose_name_plural': 'S3 直传会话',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='directuploadsession',
+            constraint=models.UniqueConstraint(fields=('media', 'object_key'), name='unique_direct_upload_session_per_key'),
+        ),
+    ]
@@ -41,6 +41,8 @@ class Media(models.Model):
         upload_to='ls_exports/', blank=True, null=True, verbose_name="Label Studio 导出文件"
     )
     blueprint_status = models.CharField(max_length=20, default='pending', verbose_name="叙事蓝图生成状态")
+    # 批量加载清单：{源视频文件名: 指纹、内容哈希与对应 Asset}，重新加载时只处理新增或变化的文件
+    ingest_manifest = models.JSONField(blank=True, null=True, verbose_name="批量加载清单")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
 
@@ -83,6 +85,12 @@ class Asset(models.Model):
         ('owned', '自有版权'),
         ('restricted', '受限'),
     )
+    PROCESSING_PATH_CHOICES = (
+        ('transcode', '重新编码'),
+        ('remux', '流复制封装'),
+        ('segmented', '分段并行编码'),
+        ('cache', '复用转码缓存'),
+    )
     LANGUAGE_CHOICES = (
         ('zh-CN', '中文 (简体)'),
         ('en-US', '英语 (美国)'),
@@ -137,8 +145,27 @@ class Asset(models.Model):
     processed_video_url = models.URLField(max_length=1024, blank=True, null=True, verbose_name="处理后视频URL (CDN)")
     source_subtitle_url = models.URLField(max_length=1024, blank=True, null=True,
                                           verbose_name="源字幕文件URL (CDN/Public)")
+    # 仅用于标注的低分辨率、密集关键帧代理视频，Label Studio 任务优先使用它
+    proxy_video_url = models.URLField(max_length=1024, blank=True, null=True, verbose_name="标注代理视频URL")
+    # 时间轴预览用的缩略图雪碧图索引 (WebVTT)，cue 内容形如 "sprite_001.jpg#xywh=x,y,w,h"
+    thumbnails_vtt_url = models.URLField(max_length=1024, blank=True, null=True, verbose_name="缩略图索引URL (WebVTT)")
     l1_output_file = models.FileField(upload_to='l1_outputs/', blank=True, null=True, verbose_name="第一层产出 (.ass)")
 
+    # 源文件探测结果（编码、码率、分辨率、moov 位置）与实际采用的处理路径
+    source_probe = models.JSONField(blank=True, null=True, verbose_name="源文件探测信息")
+    processing_path = models.CharField(max_length=20, choices=PROCESSING_PATH_CHOICES, blank=True, null=True,
+                                       verbose_name="处理路径")
+
+    # 实时转码进度：percent / fps / speed / eta_seconds 等，由转码任务节流写入
+    transcode_progress = models.JSONField(blank=True, null=True, verbose_name="转码进度")
+
+    # 转码缓存键：源文件内容哈希 + 编码参数，用于复用相同输入的转码产出物
+    transcode_cache_key = models.CharField(max_length=64, blank=True, null=True, db_index=True,
+                                           verbose_name="转码缓存键")
+
+    # 已上传到 S3 的产出物校验记录：{对象键: {sha256, size, etag}}，在上传的同一次读取中计算，用于跳过内容相同的重复上传
+    artifact_checksums = models.JSONField(blank=True, null=True, verbose_name="产出物校验和")
+
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
 
@@ -152,7 +179,10 @@ class Asset(models.Model):
         srt_url = self.source_subtitle_url
         asset_id = str(self.id)
 
-        return f"{subeditor_base_url}?videoUrl={video_url}&srtUrl={srt_url}&assetId={asset_id}"
+        subeditor_url = f"{subeditor_base_url}?videoUrl={video_url}&srtUrl={srt_url}&assetId={asset_id}"
+        if self.thumbnails_vtt_url:
+            subeditor_url += f"&thumbnailsUrl={self.thumbnails_vtt_url}"
+        return subeditor_url
 
     def get_label_studio_task_url(self):
         """返回此资产条目在 Label Studio 中的具体任务 URL。"""
@@ -165,6 +195,23 @@ class Asset(models.Model):
         # 注意：这里我们使用公开的URL
         return f"{settings.LABEL_STUDIO_PUBLIC_URL}/projects/{project_id}/data?tab={task_id}&task={task_id}"
 
+    def get_transcode_progress_display(self):
+        """返回适合在后台展示的转码进度摘要。"""
+        progress = self.transcode_progress
+        if not progress:
+            return None
+        parts = []
+        if progress.get('percent') is not None:
+            parts.append(f"{progress['percent']:.1f}%")
+        if progress.get('fps'):
+            parts.append(f"{progress['fps']:.0f} fps")
+        if progress.get('speed'):
+            parts.append(f"{progress['speed']:.2f}x")
+        if progress.get('eta_seconds') and not progress.get('finished'):
+            minutes, seconds = divmod(int(progress['eta_seconds']), 60)
+            parts.append(f"剩余 {minutes}:{seconds:02d}")
+        return ' · '.join(parts) or None
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # 记录初始状态值
@@ -206,4 +253,30 @@ class Asset(models.Model):
     class Meta:
         verbose_name = "资产条目（剧集）"
         verbose_name_plural = verbose_name
-        ordering = ['media', 'sequence_number']
\ No newline at end of file
+        ordering = ['media', 'sequence_number']
+
+class DirectUploadSession(models.Model):
+    """
+    S3 直传中尚未完成的分片上传，记录创建时的文件身份（大小与客户端报告的最后修改时间）。
+
+    S3 不会返回未完成分片上传的元数据，因此身份保存在这里：再次初始化同名文件时只有身份一致
+    才复用已上传的分片，否则放弃旧的分片上传重新开始，避免将不同文件的分片拼接在一起。
+    """
+    media = models.ForeignKey(Media, on_delete=models.CASCADE, related_name='direct_upload_sessions',
+                              verbose_name="所属媒资")
+    object_key = models.CharField(max_length=1024, verbose_name="对象键")
+    upload_id = models.CharField(max_length=1024, verbose_name="分片上传ID")
+    total_size = models.BigIntegerField(verbose_name="文件大小")
+    # 浏览器 File.lastModified，毫秒时间戳
+    last_modified = models.BigIntegerField(verbose_name="文件最后修改时间")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+
+    def __str__(self):
+        return f"{self.object_key} ({self.upload_id})"
+
+    class Meta:
+        verbose_name = "S3 直传会话"
+        verbose_name_plural = verbose_name
+        constraints = [
+            models.UniqueConstraint(fields=['media', 'object_key'], name='unique_direct_upload_session_per_key'),
+        ]
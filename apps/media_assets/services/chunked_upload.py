@@ -0,0 +1,214 @@
+# 文件路径: apps/media_assets/services/chunked_upload.py
+
+import hashlib
+import json
+import os
+import shutil
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Dict, Any, List
+
+from django.conf import settings
+
+# 导入 Media 模型用于类型提示，避免循环导入
+from apps.media_assets.models import Media
+
+# 从请求体中流式读取分片时每次读取的字节数
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class ChunkedUploadError(Exception):
+    """分片上传协议错误，status_code 为建议返回给客户端的 HTTP 状态码。"""
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _Crc32:
+    """提供与 hashlib 对象一致的 update/hexdigest 接口的 CRC32 校验器。"""
+    def __init__(self):
+        self._value = 0
+
+    def update(self, data: bytes) -> None:
+        self._value = zlib.crc32(data, self._value)
+
+    def hexdigest(self) -> str:
+        return f"{self._value & 0xffffffff:08x}"
+
+
+CHECKSUM_ALGORITHMS = {
+    'sha256': hashlib.sha256,
+    'crc32': _Crc32,
+}
+
+
+class ChunkedUploadService:
+    """
+    可断点续传的分片上传服务。
+
+    每个上传会话对应 batch_uploads/<media_id>/.partial/<upload_id>/ 目录：
+    - data：按最终大小写入的数据文件，各分片按偏移量直接写入，支持多个分片并行上传
+    - chunks/<index>：已通过校验的分片标记文件，用于服务端的进度（偏移量）记录
+    - state.json：会话元数据（文件名、总大小、客户端报告的最后修改时间、分片大小、分片数）
+
+    upload_id 由 Media、文件名和文件大小确定，连接中断后重新初始化即可拿到已接收的分片列表并继续上传；
+    最后修改时间与会话记录不一致（同名同大小的另一个文件）时丢弃旧会话重新开始。
+    """
+    def __init__(self, media: Media):
+        self.media = media
+        self.upload_dir = Path(settings.MEDIA_ROOT) / 'batch_uploads' / str(media.id)
+        self.partial_root = self.upload_dir / '.partial'
+
+    @staticmethod
+    def _safe_filename(filename: str) -> str:
+        name = os.path.basename(filename or '').strip()
+        if not name or name in ('.', '..'):
+            raise ChunkedUploadError('Invalid filename')
+        return name
+
+    def _session_dir(self, upload_id: str) -> Path:
+        if not upload_id.isalnum():
+            raise ChunkedUploadError('Invalid upload id')
+        return self.partial_root / upload_id
+
+    def _load_state(self, upload_id: str) -> Dict[str, Any]:
+        state_path = self._session_dir(upload_id) / 'state.json'
+        if not state_path.exists():
+            raise ChunkedUploadError('Upload session not found', status_code=404)
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _received_chunks(self, upload_id: str) -> List[int]:
+        chunks_dir = self._session_dir(upload_id) / 'chunks'
+        if not chunks_dir.exists():
+            return []
+        return sorted(int(marker.name) for marker in chunks_dir.iterdir() if marker.name.isdigit())
+
+    def _status(self, upload_id: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        received = self._received_chunks(upload_id)
+        received_bytes = sum(self._chunk_length(state, index) for index in received)
+        return {
+            'upload_id': upload_id,
+            'filename': state['filename'],
+            'total_size': state['total_size'],
+            'chunk_size': state['chunk_size'],
+            'total_chunks': state['total_chunks'],
+            'received_chunks': received,
+            'received_bytes': received_bytes,
+        }
+
+    @staticmethod
+    def _chunk_length(state: Dict[str, Any], index: int) -> int:
+        offset = index * state['chunk_size']
+        return min(state['chunk_size'], state['total_size'] - offset)
+
+    def init_upload(self, filename: str, total_size: int, chunk_size: int, last_modified: int) -> Dict[str, Any]:
+        """
+        创建或恢复一个上传会话。
+
+        :param filename: 原始文件名
+        :param total_size: 文件总字节数
+        :param chunk_size: 客户端使用的分片大小
+        :param last_modified: 客户端报告的文件最后修改时间（File.lastModified，毫秒时间戳）
+        :return: 会话状态，包含 upload_id 与已接收的分片序号
+        """
+        filename = self._safe_filename(filename)
+        if total_size < 0 or chunk_size <= 0 or chunk_size > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+            raise ChunkedUploadError('Invalid size or chunk size')
+        if last_modified < 0:
+            raise ChunkedUploadError('Invalid last modified time')
+
+        upload_id = hashlib.sha1(f"{self.media.id}|{filename}|{total_size}".encode('utf-8')).hexdigest()[:32]
+        session_dir = self._session_dir(upload_id)
+        state_path = session_dir / 'state.json'
+
+        if state_path.exists():
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state['chunk_size'] == chunk_size and state.get('last_modified') == last_modified:
+                return self._status(upload_id, state)
+            # 分片大小变化或已是另一个文件时，已接收的分片无法复用，重新开始
+            shutil.rmtree(session_dir)
+
+        (session_dir / 'chunks').mkdir(parents=True, exist_ok=True)
+        state = {
+            'filename': filename,
+            'total_size': total_size,
+            'last_modified': last_modified,
+            'chunk_size': chunk_size,
+            'total_chunks': max(1, -(-total_size // chunk_size)),
+        }
+        # 预分配数据文件，使各分片可以按偏移量并行写入
+        with open(session_dir / 'data', 'wb') as f:
+            f.truncate(total_size)
+        with open(state_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        return self._status(upload_id, state)
+
+    def get_status(self, upload_id: str) -> Dict[str, Any]:
+        """返回上传会话的当前状态。"""
+        return self._status(upload_id, self._load_state(upload_id))
+
+    def write_chunk(self, upload_id: str, index: int, stream: BinaryIO, checksum: str) -> Dict[str, Any]:
+        """
+        流式读取一个分片写入数据文件的对应偏移处，并在同一次读取中校验其长度与校验和。
+
+        :param upload_id: 会话 ID
+        :param index: 分片序号（从 0 开始）
+        :param stream: 分片内容的可读流（通常为 request 本身）
+        :param checksum: 形如 "sha256=<hex>" 或 "crc32=<hex>" 的校验和
+        :return: 该分片的接收结果
+        """
+        state = self._load_state(upload_id)
+        if not 0 <= index < state['total_chunks']:
+            raise ChunkedUploadError('Chunk index out of range')
+
+        algorithm, _, expected_digest = (checksum or '').partition('=')
+        if algorithm not in CHECKSUM_ALGORITHMS or not expected_digest:
+            raise ChunkedUploadError('Missing or unsupported chunk checksum')
+        digest = CHECKSUM_ALGORITHMS[algorithm]()
+
+        expected_length = self._chunk_length(state, index)
+        offset = index * state['chunk_size']
+        written = 0
+        session_dir = self._session_dir(upload_id)
+        marker_path = session_dir / 'chunks' / str(index)
+        # 重传已接收的分片时会覆盖数据文件中的这段字节：先撤销标记，校验失败时该分片重新计为未接收
+        marker_path.unlink(missing_ok=True)
+        fd = os.open(session_dir / 'data', os.O_WRONLY)
+        try:
+            for block in iter(lambda: stream.read(READ_BLOCK_SIZE), b''):
+                if written + len(block) > expected_length:
+                    raise ChunkedUploadError('Chunk is larger than expected')
+                digest.update(block)
+                os.pwrite(fd, block, offset + written)
+                written += len(block)
+        finally:
+            os.close(fd)
+
+        if written != expected_length:
+            raise ChunkedUploadError(f'Chunk length mismatch: expected {expected_length}, got {written}')
+        if digest.hexdigest() != expected_digest.lower():
+            raise ChunkedUploadError('Chunk checksum mismatch', status_code=422)
+
+        marker_path.touch()
+        return {'upload_id': upload_id, 'index': index, 'received_bytes': written}
+
+    def complete_upload(self, upload_id: str) -> Path:
+        """
+        确认所有分片都已接收后，将数据文件移动到 batch_uploads/<media_id>/<filename>。
+
+        :param upload_id: 会话 ID
+        :return: 组装完成的文件路径
+        """
+        state = self._load_state(upload_id)
+        received = set(self._received_chunks(upload_id))
+        missing = [index for index in range(state['total_chunks']) if index not in received]
+        if missing:
+            raise ChunkedUploadError(f'Upload incomplete, {len(missing)} chunks missing', status_code=409)
+
+        session_dir = self._session_dir(upload_id)
+        target_path = self.upload_dir / state['filename']
+        os.replace(session_dir / 'data', target_path)
+        shutil.rmtree(session_dir)
+        return target_path
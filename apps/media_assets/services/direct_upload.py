@@ -0,0 +1,198 @@
+# 文件路径: apps/media_assets/services/direct_upload.py
+
+import os
+from pathlib import Path
+from typing import Dict, Any, List
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+
+# 导入 Media 模型用于类型提示，避免循环导入
+from apps.media_assets.models import DirectUploadSession, Media
+from apps.media_assets.services.chunked_upload import ChunkedUploadError
+from apps.media_assets.services.storage import get_s3_client
+
+# S3 分片上传的分片数量上限
+S3_MAX_PARTS = 10000
+
+
+class S3DirectUploadService:
+    """
+    浏览器直传 S3 的分片上传服务。
+
+    Django 只负责创建分片上传、为各分片签发预签名 URL，以及在服务端（通过 list_parts）完成上传；
+    文件内容由浏览器并行直接写入桶中的 AWS_S3_SOURCE_UPLOADS_PREFIX<media_id>/<filename>，
+    不再经过 Django 和本地磁盘。重复初始化同一文件（文件名、大小与客户端的最后修改时间均一致）时
+    会复用未完成的分片上传，实现断点续传；文件身份记录在 DirectUploadSession 中。
+    """
+    def __init__(self, media: Media):
+        self.media = media
+        self.bucket = settings.AWS_STORAGE_BUCKET_NAME
+        self.key_prefix = f"{settings.AWS_S3_SOURCE_UPLOADS_PREFIX}{media.id}/"
+        self.s3_client = get_s3_client()
+        # 预签名 URL 需要使用浏览器能访问到的地址
+        self.presign_client = get_s3_client(endpoint_url=settings.AWS_S3_PRESIGN_ENDPOINT_URL)
+
+    def _object_key(self, filename: str) -> str:
+        name = os.path.basename(filename or '').strip()
+        if not name or name in ('.', '..'):
+            raise ChunkedUploadError('Invalid filename')
+        return f"{self.key_prefix}{name}"
+
+    def _list_parts(self, key: str, upload_id: str) -> List[Dict[str, Any]]:
+        parts = []
+        paginator = self.s3_client.get_paginator('list_parts')
+        for page in paginator.paginate(Bucket=self.bucket, Key=key, UploadId=upload_id):
+            parts.extend(page.get('Parts', []))
+        return parts
+
+    def _pending_upload_ids(self, key: str) -> List[str]:
+        upload_ids = []
+        paginator = self.s3_client.get_paginator('list_multipart_uploads')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=key):
+            upload_ids.extend(upload['UploadId'] for upload in page.get('Uploads', []) if upload['Key'] == key)
+        return upload_ids
+
+    def init_upload(self, filename: str, total_size: int, last_modified: int,
+                    content_type: str = '') -> Dict[str, Any]:
+        """
+        创建或恢复一个分片上传。
+
+        只有未完成的分片上传创建时记录的文件大小与最后修改时间都与本次一致时才恢复；
+        同名但内容不同的文件会放弃该对象键下所有未完成的分片上传，重新开始。
+
+        :param filename: 原始文件名
+        :param total_size: 文件总字节数
+        :param last_modified: 客户端报告的文件最后修改时间（File.lastModified，毫秒时间戳）
+        :param content_type: 文件的 Content-Type
+        :return: 上传会话信息，包含对象键、upload_id、分片大小与已上传的分片号
+        """
+        key = self._object_key(filename)
+        if total_size < 0:
+            raise ChunkedUploadError('Invalid size')
+        if last_modified < 0:
+            raise ChunkedUploadError('Invalid last modified time')
+
+        # 分片数不能超过 S3 的上限，必要时自动放大分片
+        part_size = max(settings.S3_DIRECT_UPLOAD_PART_SIZE, -(-total_size // S3_MAX_PARTS))
+        total_parts = max(1, -(-total_size // part_size))
+
+        session = DirectUploadSession.objects.filter(media=self.media, object_key=key).first()
+        resumable_upload_id = (session.upload_id if session and session.total_size == total_size
+                               and session.last_modified == last_modified else None)
+        upload_id = None
+        uploaded_parts = []
+        for pending_upload_id in self._pending_upload_ids(key):
+            if pending_upload_id == resumable_upload_id:
+                existing_parts = self._list_parts(key, pending_upload_id)
+                # 只有分片大小一致时，已上传的分片才能复用
+                if all(part['Size'] == part_size for part in existing_parts if part['PartNumber'] < total_parts):
+                    upload_id = pending_upload_id
+                    uploaded_parts = [part['PartNumber'] for part in existing_parts]
+                    continue
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=pending_upload_id)
+
+        if not upload_id:
+            extra_args = {'ContentType': content_type} if content_type else {}
+            upload_id = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=key, **extra_args)['UploadId']
+            DirectUploadSession.objects.update_or_create(
+                media=self.media, object_key=key,
+                defaults={'upload_id': upload_id, 'total_size': total_size, 'last_modified': last_modified},
+            )
+
+        return {
+            'key': key,
+            'upload_id': upload_id,
+            'part_size': part_size,
+            'total_parts': total_parts,
+            'uploaded_parts': sorted(uploaded_parts),
+        }
+
+    def sign_parts(self, key: str, upload_id: str, part_numbers: List[int]) -> Dict[int, str]:
+        """
+        为指定分片签发预签名 PUT URL。
+
+        :param key: 对象键
+        :param upload_id: 分片上传 ID
+        :param part_numbers: 分片号列表（从 1 开始）
+        :return: {分片号: 预签名 URL}
+        """
+        if not key.startswith(self.key_prefix):
+            raise ChunkedUploadError('Key does not belong to this media', status_code=403)
+        urls = {}
+        for part_number in part_numbers:
+            if not 1 <= part_number <= S3_MAX_PARTS:
+                raise ChunkedUploadError('Part number out of range')
+            urls[part_number] = self.presign_client.generate_presigned_url(
+                'upload_part',
+                Params={'Bucket': self.bucket, 'Key': key, 'UploadId': upload_id, 'PartNumber': part_number},
+                ExpiresIn=settings.S3_DIRECT_UPLOAD_URL_EXPIRES,
+            )
+        return urls
+
+    def complete_upload(self, key: str, upload_id: str, total_parts: int) -> str:
+        """
+        在服务端根据已上传的分片列表完成分片上传，浏览器无需读取各分片的 ETag。
+
+        :param key: 对象键
+        :param upload_id: 分片上传 ID
+        :param total_parts: 预期的分片总数
+        :return: 对象键
+        """
+        if not key.startswith(self.key_prefix):
+            raise ChunkedUploadError('Key does not belong to this media', status_code=403)
+        parts = self._list_parts(key, upload_id)
+        uploaded = {part['PartNumber'] for part in parts}
+        missing = [number for number in range(1, total_parts + 1) if number not in uploaded]
+        if missing:
+            raise ChunkedUploadError(f'Upload incomplete, {len(missing)} parts missing', status_code=409)
+
+        self.s3_client.complete_multipart_upload(
+            Bucket=self.bucket, Key=key, UploadId=upload_id,
+            MultipartUpload={'Parts': [{'PartNumber': part['PartNumber'], 'ETag': part['ETag']}
+                                       for part in sorted(parts, key=lambda part: part['PartNumber'])]},
+        )
+        DirectUploadSession.objects.filter(media=self.media, object_key=key, upload_id=upload_id).delete()
+        return key
+
+    def list_source_objects(self) -> Dict[str, Dict[str, Any]]:
+        """返回该 Media 已直传到桶中的源文件：{文件名: {size, etag}}，用作增量加载时的内容指纹。"""
+        objects = {}
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.key_prefix):
+            for obj in page.get('Contents', []):
+                objects[obj['Key'][len(self.key_prefix):]] = {'size': obj['Size'], 'etag': obj['ETag']}
+        return objects
+
+    @staticmethod
+    def _etag_path(local_path: Path) -> Path:
+        # 本地副本下载时对象的 ETag，记录在 batch_uploads/<media_id>/.etags/<filename>.etag
+        return local_path.parent / '.etags' / f"{local_path.name}.etag"
+
+    def download_source(self, local_path: Path) -> bool:
+        """
+        将桶中的源文件下载到本地对应路径（batch_uploads/<media_id>/<filename>）。
+
+        本地已有副本且其下载时记录的 ETag 与桶中对象一致时跳过；桶中的文件被替换后（即使大小相同）重新下载。
+
+        :param local_path: 本地目标路径，文件名即对象名
+        :return: 本地文件是否可用（源对象不存在时返回 False）
+        """
+        key = self._object_key(local_path.name)
+        try:
+            head = self.s3_client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        etag_path = self._etag_path(local_path)
+        if (local_path.exists() and local_path.stat().st_size == head['ContentLength']
+                and etag_path.exists() and etag_path.read_text() == head['ETag']):
+            return True
+        etag_path.parent.mkdir(parents=True, exist_ok=True)
+        # 先删除旧记录：下载中断时本地副本不会被当作有效副本
+        etag_path.unlink(missing_ok=True)
+        self.s3_client.download_file(self.bucket, key, str(local_path))
+        # 记录的是下载前 HEAD 得到的 ETag：下载期间对象被替换时只会导致下次多下载一次
+        etag_path.write_text(head['ETag'])
+        return True
@@ -0,0 +1,111 @@
+# 文件路径: apps/media_assets/services/ingest_manifest.py
+
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+# 导入模型用于类型提示，避免循环导入
+from apps.media_assets.models import Asset, Media
+from apps.media_assets.services.transcoding import compute_file_hash
+
+Fingerprint = Dict[str, Any]
+
+
+def local_file_fingerprint(path: Path) -> Optional[Fingerprint]:
+    """返回本地文件的 {size, mtime_ns} 指纹，文件不存在时返回 None。"""
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _same_content(recorded: Optional[Fingerprint], current: Optional[Fingerprint], path: Path,
+                  recorded_sha256: Optional[str]) -> bool:
+    if recorded == current:
+        return True
+    if not recorded or not current or recorded.get('size') != current.get('size'):
+        return False
+    # 本地文件大小相同而修改时间不同（例如重新拷贝了同一个文件）时，按内容哈希确认；
+    # 对象存储中的源文件以 ETag 作为内容指纹，不同即视为已变化
+    if 'mtime_ns' not in current or not recorded_sha256:
+        return False
+    return compute_file_hash(path) == recorded_sha256
+
+
+class IngestManifest:
+    """
+    Media 批量加载的清单，保存在 Media.ingest_manifest 中，形如::
+
+        {"ep01.mp4": {"asset_id": ..., "video": {size, mtime_ns | etag}, "subtitle": {...} | null,
+                      "video_sha256": ..., "subtitle_sha256": ..., "ingested_at": ...}}
+
+    每个源文件在其 Asset 成功处理后才写入（见 record）。重新加载时，指纹与清单一致、
+    且对应 Asset 仍处于 completed 状态的源文件会被跳过，只处理新增或变化的文件。
+    """
+    def __init__(self, media: Media):
+        self.media = media
+        self.entries: Dict[str, Dict[str, Any]] = dict(media.ingest_manifest or {})
+        self._dirty = False
+
+    def is_unchanged(self, asset: Asset, video_path: Path, srt_path: Path, fingerprint: Dict[str, Any]) -> bool:
+        """
+        判断源文件（视频与同名字幕）自上次成功处理后是否未发生变化。
+
+        :param asset: 源文件对应的 Asset
+        :param video_path: 源视频路径（对象存储模式下为本地下载路径，仅用于取文件名）
+        :param srt_path: 同名字幕路径
+        :param fingerprint: 当前指纹 {'video': ..., 'subtitle': ...}
+        :return: 是否可以跳过
+        """
+        entry = self.entries.get(video_path.name)
+        if not entry or entry.get('asset_id') != str(asset.id) or asset.processing_status != 'completed':
+            return False
+        unchanged = (
+            _same_content(entry.get('video'), fingerprint['video'], video_path, entry.get('video_sha256'))
+            and _same_content(entry.get('subtitle'), fingerprint['subtitle'], srt_path, entry.get('subtitle_sha256'))
+        )
+        if unchanged and (entry.get('video') != fingerprint['video'] or entry.get('subtitle') != fingerprint['subtitle']):
+            # 内容未变、仅修改时间变化：刷新指纹，下次无需再计算哈希
+            self.entries[video_path.name] = {**entry, **fingerprint}
+            self._dirty = True
+        return unchanged
+
+    def save(self) -> None:
+        """保存 is_unchanged 中刷新过的指纹。"""
+        if self._dirty:
+            with transaction.atomic():
+                media = Media.objects.select_for_update().get(id=self.media.id)
+                media.ingest_manifest = {**(media.ingest_manifest or {}), **self.entries}
+                media.save(update_fields=['ingest_manifest'])
+            self._dirty = False
+
+    @staticmethod
+    def record(media_id, asset_id, video_path: Path, srt_path: Path, fingerprint: Optional[Dict[str, Any]],
+               video_sha256: Optional[str]) -> None:
+        """
+        在 Asset 处理成功后写入其源文件的清单条目。同一 Media 的多个子任务会并发写入，
+        因此在事务中锁定 Media 行后合并，互不覆盖。
+
+        :param media_id: Media ID
+        :param asset_id: Asset ID
+        :param video_path: 源视频路径
+        :param srt_path: 同名字幕路径
+        :param fingerprint: 派发任务时记录的指纹，为 None 时不写入（例如单独重试的任务）
+        :param video_sha256: 源视频内容的 SHA-256（与转码缓存键共用同一次计算）
+        """
+        if fingerprint is None:
+            return
+        entry = {
+            'asset_id': str(asset_id),
+            'video': fingerprint['video'],
+            'subtitle': fingerprint['subtitle'],
+            'video_sha256': video_sha256,
+            'subtitle_sha256': compute_file_hash(str(srt_path)) if srt_path.exists() else None,
+            'ingested_at': timezone.now().isoformat(),
+        }
+        with transaction.atomic():
+            media = Media.objects.select_for_update().get(id=media_id)
+            media.ingest_manifest = {**(media.ingest_manifest or {}), video_path.name: entry}
+            media.save(update_fields=['ingest_manifest'])
@@ -70,7 +70,11 @@ class LabelStudioService:
                     print(f"警告: 剧集 '{asset.title}' 没有处理后的视频URL，跳过导入。")
                     continue
 
-                task_payload = {"data": {"video_url": asset.processed_video_url}}
+                # 优先使用密集关键帧的代理视频，标注时的逐帧定位更快
+                task_payload = {"data": {"video_url": asset.proxy_video_url or asset.processed_video_url}}
+                if asset.thumbnails_vtt_url:
+                    # 时间轴预览用的缩略图索引，供标注模板按需使用
+                    task_payload["data"]["thumbnails_url"] = asset.thumbnails_vtt_url
                 task_response = requests.post(f"{self.internal_ls_url}/api/projects/{project_id}/tasks", json=task_payload,
                                               headers=self.headers)
 
@@ -1,50 +1,112 @@
 # ass_parser.py
 
+import io
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Iterable, Iterator, NamedTuple, Tuple
 import json
 
 # 导入我们新建的公共工具
-# from time_utils import TimeConverter
+from apps.media_assets.services.modeling.event_store import (EventStore, DIALOGUE_FIELDS, DIALOGUE_CODED,
+                                                             CAPTION_FIELDS, CAPTION_CODED)
+from apps.media_assets.services.modeling.time_utils import TimeConverter
 
+# [Events] 段没有 Format 行时使用的 ASS v4+ 默认列顺序
+DEFAULT_EVENT_FORMAT = ("layer", "start", "end", "style", "name", "marginl", "marginr", "marginv", "effect", "text")
 
-def parse(ass_file_path: Path) -> Tuple[List[Dict], List[Dict]]:
-    """
-    接收一个.ass文件路径，将其解析为dialogues和captions列表。
-    只输出包含原始时间字符串的中间数据对象。
+
+class AssEvent(NamedTuple):
+    """[Events] 段中的一条 Dialogue 行，时间已转换为秒数。"""
+    start_sec: float
+    end_sec: float
+    name: str
+    text: str
+
+
+def _resolve_columns(format_fields: Tuple[str, ...]) -> Tuple[int, int, int, int]:
+    """根据 Format 行的列名，返回 (start, end, name, text) 所在的列号；缺少 Name 列时 name 列号为 -1。"""
+    missing = [field for field in ("start", "end", "text") if field not in format_fields]
+    if missing:
+        raise ValueError(f"ASS [Events] Format line is missing required fields: {', '.join(missing)}")
+    if format_fields[-1] != "text":
+        raise ValueError("ASS [Events] Format line must end with the Text field")
+    name_column = format_fields.index("name") if "name" in format_fields else -1
+    return format_fields.index("start"), format_fields.index("end"), name_column, len(format_fields) - 1
+
+
+def iter_events(lines: Iterable[str]) -> Iterator[AssEvent]:
     """
-    if not ass_file_path.exists():
-        print(f"Warning: ASS file not found at {ass_file_path}")
-        return [], []
+    逐行解析 ASS 内容，产出 [Events] 段中的 Dialogue 事件，不保留已处理的行。
 
-    dialogues, captions = [], []
-    with open(ass_file_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
+    列顺序按段内的 Format 行解析一次（没有 Format 行时使用 DEFAULT_EVENT_FORMAT），
+    Text 为最后一列，可以包含逗号；列数不足的行被跳过。
 
+    :param lines: 文本行的可迭代对象，例如以文本模式打开的文件
+    :return: AssEvent 的迭代器
+    """
     event_section = False
+    start_col, end_col, name_col, text_col = _resolve_columns(DEFAULT_EVENT_FORMAT)
     for line in lines:
         line = line.strip()
-        if line.lower() == '[events]': event_section = True; continue
-        if event_section and line.startswith('['): break
-        if not event_section or not line.lower().startswith('dialogue:'): continue
-
-        parts = line.split(':', 1)[1].strip().split(',', 9)
-        if len(parts) < 10: continue
-
-        start_time_str, end_time_str, name, text = parts[1], parts[2], parts[4], parts[9]
-        event_data = {
-            "start_time_raw": start_time_str,
-            "end_time_raw": end_time_str,
-            "content": text.replace('\\N', '\n')
-        }
-        if name.upper() == 'CAPTION':
-            captions.append(event_data)
+        if not event_section:
+            if line.lower() == '[events]': event_section = True
+            continue
+        if line.startswith('['): break
+
+        key, sep, value = line.partition(':')
+        if not sep: continue
+        key = key.lower()
+        if key == 'format':
+            format_fields = tuple(field.strip().lower() for field in value.split(','))
+            start_col, end_col, name_col, text_col = _resolve_columns(format_fields)
+        elif key == 'dialogue':
+            parts = value.strip().split(',', text_col)
+            if len(parts) <= text_col: continue
+            yield AssEvent(
+                TimeConverter.ass_time_to_seconds(parts[start_col]),
+                TimeConverter.ass_time_to_seconds(parts[end_col]),
+                parts[name_col] if name_col >= 0 else '',
+                parts[text_col],
+            )
+
+
+def new_event_stores() -> Tuple[EventStore, EventStore]:
+    """返回空的 (dialogues, captions) 事件存储。"""
+    return EventStore(DIALOGUE_FIELDS, DIALOGUE_CODED), EventStore(CAPTION_FIELDS, CAPTION_CODED)
+
+
+def parse_lines(lines: Iterable[str]) -> Tuple[EventStore, EventStore]:
+    """将 ASS 文本行解析为 dialogues 和 captions 两个事件存储（说话人为 CAPTION 的行视为字幕）。"""
+    dialogues, captions = new_event_stores()
+    for event in iter_events(lines):
+        content = event.text.replace('\\N', '\n')
+        if event.name.upper() == 'CAPTION':
+            captions.append(event.start_sec, event.end_sec, content=content)
         else:
-            event_data["speaker"] = name
-            dialogues.append(event_data)
+            dialogues.append(event.start_sec, event.end_sec, content=content, speaker=event.name)
     return dialogues, captions
 
 
+def parse(ass_file_path: Path) -> Tuple[EventStore, EventStore]:
+    """
+    接收一个.ass文件路径，逐行读取并解析为dialogues和captions两个事件存储。
+    时间在解析时即转换为秒数，说话人按编码存储，不再为每条对白生成中间字典。
+    """
+    if not ass_file_path.exists():
+        print(f"Warning: ASS file not found at {ass_file_path}")
+        return new_event_stores()
+
+    with open(ass_file_path, 'r', encoding='utf-8-sig') as f:
+        return parse_lines(f)
+
+
+def parse_bytes(data: bytes) -> Tuple[EventStore, EventStore]:
+    """
+    解析已在内存中的 ASS 内容（UTF-8 编码），例如请求体，无需先写入磁盘。
+    按行增量解码，不会生成整份内容的字符串副本。
+    """
+    return parse_lines(io.TextIOWrapper(io.BytesIO(data), encoding='utf-8-sig'))
+
+
 # --- 独立测试入口 ---
 if __name__ == '__main__':
     # 设定要测试的ASS文件路径
@@ -58,8 +120,8 @@ if __name__ == '__main__':
 
     # 将结果打包到一个字典中，便于查看
     output_data = {
-        "dialogues": parsed_dialogues,
-        "captions": parsed_captions
+        "dialogues": [row.to_dict() for row in parsed_dialogues],
+        "captions": [row.to_dict() for row in parsed_captions]
     }
 
     # 定义输出文件，并确保目录存在
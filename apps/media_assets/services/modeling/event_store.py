@@ -0,0 +1,112 @@
+# event_store.py
+from array import array
+from typing import Any, Dict, Iterator, Tuple
+
+from apps.media_assets.services.modeling.time_utils import TimeConverter
+
+# 各类事件的字段（按最终输出的键顺序）与取值高度重复、按编码存储的字段
+DIALOGUE_FIELDS, DIALOGUE_CODED = ("content", "speaker"), ("speaker",)
+CAPTION_FIELDS, CAPTION_CODED = ("content",), ()
+HIGHLIGHT_FIELDS, HIGHLIGHT_CODED = ("id", "type", "description", "mood"), ("type", "mood")
+NARRATIVE_CUE_FIELDS, NARRATIVE_CUE_CODED = ("type", "value"), ("type",)
+
+
+class EventStore:
+    """
+    同一类事件（对白、字幕、高光或叙事线索）的列式存储，作为解析器与场景组装之间的中间表示。
+
+    开始 / 结束时间在写入时即转换为秒数，存放在 array('d') 中；说话人、类型等取值高度重复的字段
+    存为整数编码加一份取值表，其余字段各占一个列表。与每个事件一个含原始时间字符串的字典相比，
+    每个事件只占几个数组槽位，不再有逐事件的字典与时间字符串。
+
+    事件只在分配到场景时通过 materialize 转换为最终输出的字典。
+    """
+    __slots__ = ("fields", "starts", "ends", "_columns", "_vocabularies", "_codes")
+
+    def __init__(self, fields: Tuple[str, ...], coded: Tuple[str, ...] = ()):
+        """
+        :param fields: 事件字段名，顺序即最终输出字典中的键顺序（start_time / end_time 固定在最后）
+        :param coded: 其中按编码存储的字段
+        """
+        self.fields = fields
+        self.starts = array('d')
+        self.ends = array('d')
+        self._columns = {name: (array('I') if name in coded else []) for name in fields}
+        self._vocabularies = {name: [] for name in coded}
+        self._codes = {name: {} for name in coded}
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index: int) -> "EventRow":
+        if not -len(self) <= index < len(self):
+            raise IndexError("event index out of range")
+        return EventRow(self, index % len(self))
+
+    def __iter__(self) -> Iterator["EventRow"]:
+        return (EventRow(self, index) for index in range(len(self)))
+
+    def append(self, start_sec: float, end_sec: float, **values: Any) -> None:
+        """
+        追加一个事件。
+
+        :param start_sec: 开始时间（秒）
+        :param end_sec: 结束时间（秒）
+        :param values: 各字段的值，缺省为 None
+        """
+        self.starts.append(start_sec)
+        self.ends.append(end_sec)
+        for name, column in self._columns.items():
+            value = values.get(name)
+            if name in self._codes:
+                codes = self._codes[name]
+                code = codes.get(value)
+                if code is None:
+                    code = codes[value] = len(self._vocabularies[name])
+                    self._vocabularies[name].append(value)
+                column.append(code)
+            else:
+                column.append(value)
+
+    def extend(self, other: "EventStore") -> None:
+        """追加另一个同类存储中的全部事件（例如将一个章节各任务的高光合并）。"""
+        for row in other:
+            self.append(row.start_sec, row.end_sec, **{name: row[name] for name in self.fields})
+
+    def value(self, index: int, name: str) -> Any:
+        """返回第 index 个事件的字段值。"""
+        stored = self._columns[name][index]
+        return self._vocabularies[name][stored] if name in self._vocabularies else stored
+
+    def materialize(self, index: int) -> Dict[str, Any]:
+        """将第 index 个事件转换为最终输出格式的字典（各字段 + start_time / end_time）。"""
+        event = {name: self.value(index, name) for name in self.fields}
+        event["start_time"] = TimeConverter.seconds_to_final_format(self.starts[index])
+        event["end_time"] = TimeConverter.seconds_to_final_format(self.ends[index])
+        return event
+
+
+class EventRow:
+    """EventStore 中一个事件的轻量视图，只持有存储与行号，不复制任何字段。"""
+    __slots__ = ("store", "index")
+
+    def __init__(self, store: EventStore, index: int):
+        self.store = store
+        self.index = index
+
+    @property
+    def start_sec(self) -> float:
+        return self.store.starts[self.index]
+
+    @property
+    def end_sec(self) -> float:
+        return self.store.ends[self.index]
+
+    def __getitem__(self, name: str) -> Any:
+        return self.store.value(self.index, name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.store.materialize(self.index)
+
+    def __repr__(self) -> str:
+        return f"EventRow({self.to_dict()!r})"
@@ -1,6 +1,9 @@
 # highlight_parser.py
 from typing import Dict, Any
 
+from apps.media_assets.services.modeling.event_store import EventStore, HIGHLIGHT_FIELDS, HIGHLIGHT_CODED
+from apps.media_assets.services.modeling.time_utils import TimeConverter
+
 def _flatten_and_get(region_data: Dict[str, Any], key: str) -> Any:
     """一个安全的取值函数，能处理嵌套的Label Studio值对象。"""
     if key in region_data:
@@ -15,15 +18,19 @@ def _flatten_and_get(region_data: Dict[str, Any], key: str) -> Any:
             return value_to_store
     return None
 
-def parse(raw_region_data: Dict[str, Any]) -> Dict[str, Any]:
+def new_event_store() -> EventStore:
+    """返回空的高光事件存储。"""
+    return EventStore(HIGHLIGHT_FIELDS, HIGHLIGHT_CODED)
+
+def parse(raw_region_data: Dict[str, Any], store: EventStore) -> None:
     """
-    解析一个“高光”区域，只输出包含原始浮点数时间的中间对象。
+    解析一个“高光”区域，将其追加到高光事件存储中（时间为秒数）。
     """
-    return {
-        "start_time_raw": raw_region_data.get("start_time"),
-        "end_time_raw": raw_region_data.get("end_time"),
-        "id": _flatten_and_get(raw_region_data, "highlight_id"),
-        "type": _flatten_and_get(raw_region_data, "highlight_type"),
-        "description": _flatten_and_get(raw_region_data, "highlight_description"),
-        "mood": _flatten_and_get(raw_region_data, "highlight_mood")
-    }
\ No newline at end of file
+    store.append(
+        TimeConverter.ls_time_to_seconds(raw_region_data.get("start_time")),
+        TimeConverter.ls_time_to_seconds(raw_region_data.get("end_time")),
+        id=_flatten_and_get(raw_region_data, "highlight_id"),
+        type=_flatten_and_get(raw_region_data, "highlight_type"),
+        description=_flatten_and_get(raw_region_data, "highlight_description"),
+        mood=_flatten_and_get(raw_region_data, "highlight_mood")
+    )
\ No newline at end of file
@@ -0,0 +1,84 @@
+# ls_export_reader.py
+import codecs
+import json
+from pathlib import Path
+from typing import Any, Dict, IO, Iterator, Union
+
+# 每次从导出文件读取的字节数；单个任务超过缓冲区时，缓冲区按需成倍扩大
+READ_CHUNK_SIZE = 4 * 1024 * 1024
+
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_tasks(source: Union[str, Path, IO]) -> Iterator[Dict[str, Any]]:
+    """
+    逐个读取 Label Studio 导出文件（顶层为任务数组的 JSON）中的任务，不将整个文件载入内存。
+
+    同一时刻只保留读缓冲区与当前任务，调用方处理完一个任务后即可将其丢弃。
+    顶层不是数组时不产出任何任务（与 ScriptModeler 对非列表导出的处理一致）。
+
+    :param source: 导出文件路径，或已打开的文件对象（文本或二进制，例如 Django 存储中的 FieldFile）
+    :return: 任务字典的迭代器
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, 'rb') as f:
+            yield from _iter_array_items(f)
+    else:
+        yield from _iter_array_items(source)
+
+
+def _iter_array_items(f: IO) -> Iterator[Any]:
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer, pos, eof = '', 0, False
+
+    def fill() -> None:
+        nonlocal buffer, pos, eof
+        # 读取量不小于当前缓冲区，保证跨越多个块的大任务只会被重复尝试解码 O(log n) 次
+        chunk = f.read(max(READ_CHUNK_SIZE, len(buffer) - pos))
+        if isinstance(chunk, bytes):
+            chunk = text_decoder.decode(chunk, final=not chunk)
+        if not chunk:
+            eof = True
+        buffer, pos = buffer[pos:] + chunk, 0
+
+    def next_char() -> str:
+        # 跳过空白，返回下一个非空白字符（文件结束时返回空字符串），不移动位置
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return buffer[pos] if pos < len(buffer) else ''
+            fill()
+
+    if next_char() != '[':
+        return
+    pos += 1
+    expect_item = True
+    while True:
+        char = next_char()
+        if char == ']':
+            return
+        if not char:
+            raise ValueError("Unexpected end of Label Studio export: unterminated task array")
+        if not expect_item:
+            if char != ',':
+                raise ValueError(f"Malformed Label Studio export: expected ',' or ']' but found {char!r}")
+            pos += 1
+            expect_item = True
+            continue
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        if end == len(buffer) and not eof and not isinstance(item, (dict, list, str)):
+            # 缓冲区末尾的数字或字面量可能被截断，读入更多数据后重新解码
+            fill()
+            continue
+        pos = end
+        expect_item = False
+        yield item
@@ -1,29 +1,57 @@
+import hashlib
 import json
+import os
 import re
-from collections import defaultdict
+import tempfile
+from collections import defaultdict, deque
 from datetime import datetime, timezone
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+import billiard
 
 # 假设我们之前开发的解析器现在是可导入的模块
 # 并且annotation_parser.py中的主函数已重命名为parse_label_studio_export
 # 为保持独立性，此处暂时将ASS解析逻辑直接放入
 
 
-from apps.media_assets.services.modeling import ass_parser, scene_parser, highlight_parser, narrative_cue_parser
+from apps.media_assets.services.modeling import (ass_parser, scene_parser, highlight_parser, narrative_cue_parser,
+                                                 ls_export_reader)
+from apps.media_assets.services.modeling.event_index import EventIndex
+from apps.media_assets.services.modeling.event_store import EventStore
+from apps.media_assets.services.modeling.narrative_timeline import build_sequence
 from apps.media_assets.services.modeling.time_utils import TimeConverter
 
+# 章节缓存的格式版本：解析或组装逻辑发生变化时递增，使已有缓存全部失效
+CHAPTER_CACHE_VERSION = 1
+
 
 class ScriptModeler:
     """
     总编排器，负责将Label Studio的JSON标注和Aegisub的ASS文件
     完全整合成最终的 structured_script.json。
+
+    指定 cache_dir 时，每个章节的组装结果（场景及其对白、字幕、高光、叙事线索）按
+    “ASS 文件内容 + 标注内容”的哈希缓存；重新生成时只重新解析有变化的章节，
+    再统一拼接章节、场景编号与叙事时间线。
+
+    标注按任务流式读取（导出文件见 ls_export_reader，也可直接传入任务迭代器 tasks），
+    每个任务转换为场景 / 高光 / 叙事线索记录后即丢弃原始标注，内存占用不随导出文件整体大小增长。
+
+    各章节的 ASS 文件互不依赖，需要重新组装的章节多于一个时在进程池中并行解析（见 _parse_ass_files），
+    进程数由 parse_workers 限制：None 或 0 表示按 CPU 核数，1 表示在当前进程中逐个解析。
     """
 
-    def __init__(self, ls_json_path: Path, ass_dir_path: Path):
+    def __init__(self, ls_json_path: Optional[Path], ass_dir_path: Path, cache_dir: Optional[Path] = None,
+                 tasks: Optional[Iterable[Dict[str, Any]]] = None, parse_workers: Optional[int] = None):
         self.ls_json_path = ls_json_path
+        self.tasks = tasks
         self.ass_dir_path = ass_dir_path
         self.project_name = ass_dir_path.name
+        self.cache_dir = cache_dir
+        self.parse_workers = parse_workers
+        self.cache_stats = {"hits": 0, "misses": 0}
 
     def _build_project_metadata(self, scenes: Dict[str, Any], chapters: Dict[str, Any]) -> Dict[str, Any]:
         """根据场景和章节数据，构建 project_metadata 对象。"""
@@ -77,44 +105,14 @@ class ScriptModeler:
                     "branches": [branch_id] + branch_info["intersection_with"]
                 })
 
-        # 如果所有场景都是线性，则使用简单逻辑
+        # 如果所有场景都是线性，则对全部场景排序
         if is_linear:
-            base_timeline = [s_id for s_id, s_data in scenes.items() if
-                             s_data.get("timeline_marker", {}).get("type") not in ["INSERT_PAST", "FORWARD"]]
-            inserts = sorted([(s_id, s_data['timeline_marker']) for s_id, s_data in scenes.items() if
-                              s_data.get("timeline_marker", {}).get("type") == "INSERT_PAST"],
-                             key=lambda x: (x[1]['insert_chapter_id'], x[1]['insert_scene_id'], x[1]['inner_index']))
-            for scene_to_insert_id, marker in inserts:
-                target_scene_id = str(marker['insert_scene_id'])
-                if target_scene_id in base_timeline:
-                    insert_index = base_timeline.index(target_scene_id) + 1
-                    base_timeline.insert(insert_index, scene_to_insert_id)
-                else:
-                    base_timeline.append(scene_to_insert_id)
-            sequence = {scene_id: {"narrative_index": i + 1} for i, scene_id in enumerate(base_timeline)}
-            return {"type": "linear", "sequence": sequence}
-
-        # --- 多分支叙事排序逻辑 ---
+            return {"type": "linear", "sequence": build_sequence(scenes.items())}
+
+        # --- 多分支叙事排序逻辑：对每个分支独立应用同一排序 ---
         final_branches = {}
         for branch_id, scene_ids in scenes_by_branch.items():
-            branch_scenes = {s_id: scenes[s_id] for s_id in scene_ids}
-
-            # 对每个分支，独立应用线性排序逻辑
-            base_timeline = [s_id for s_id, s_data in branch_scenes.items() if
-                             s_data.get("timeline_marker", {}).get("type") not in ["INSERT_PAST", "FORWARD"]]
-            inserts = sorted([(s_id, s_data['timeline_marker']) for s_id, s_data in branch_scenes.items() if
-                              s_data.get("timeline_marker", {}).get("type") == "INSERT_PAST"],
-                             key=lambda x: (x[1]['insert_chapter_id'], x[1]['insert_scene_id'], x[1]['inner_index']))
-
-            for scene_to_insert_id, marker in inserts:
-                target_scene_id = str(marker['insert_scene_id'])
-                if target_scene_id in base_timeline:
-                    insert_index = base_timeline.index(target_scene_id) + 1
-                    base_timeline.insert(insert_index, scene_to_insert_id)
-                else:
-                    base_timeline.append(scene_to_insert_id)
-
-            sequence = {scene_id: {"narrative_index": i + 1} for i, scene_id in enumerate(base_timeline)}
+            sequence = build_sequence((s_id, scenes[s_id]) for s_id in scene_ids)
             final_branches[f"BRANCH_{branch_id}"] = {"sequence": sequence}
 
         # [FIX] 修复：根据规范，返回完整的 narrative_timeline 对象
@@ -124,121 +122,257 @@ class ScriptModeler:
             "intersections": intersections  #
         }
 
+    @staticmethod
+    def _collect_raw_regions(task_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """将一个任务的标注结果按区域 ID 合并，返回按开始时间排序的原始区域。"""
+        annotation_results = task_data.get("annotations", [{}])[0].get("result", [])
+        raw_regions = defaultdict(dict)
+        for result in annotation_results:
+            region_id = result.get("id")
+            from_name, value = result.get("from_name"), result.get("value")
+            if not region_id or not from_name or not value: continue
+            raw_regions[region_id][from_name] = value
+            if "start" in value and "end" in value:
+                raw_regions[region_id]['start_time'] = value["start"]
+                raw_regions[region_id]['end_time'] = value["end"]
+        return sorted(raw_regions.values(), key=lambda r: r.get('start_time', 0))
+
+    def _reduce_task(self, task_data: Dict[str, Any], position: int, chapter_id: int) -> Dict[str, Any]:
+        """
+        将一个任务的原始标注转换为场景、高光与叙事线索记录，以及标注内容的哈希（启用缓存时用于章节缓存键）。
+        返回的记录不再引用原始标注，调用方随后即可丢弃该任务。
+
+        场景编号在这里暂记为 0，由 _assemble_chapter 与 build 重新编号。
+        """
+        annotation_digest = None
+        if self.cache_dir:
+            annotation_results = task_data.get("annotations", [{}])[0].get("result", [])
+            annotation_digest = hashlib.sha256(
+                json.dumps(annotation_results, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+        scenes, highlights, cues = [], highlight_parser.new_event_store(), narrative_cue_parser.new_event_store()
+        for raw_region in self._collect_raw_regions(task_data):
+            region_type_value = raw_region.get("region_type", {}).get("labels", [None])[0]
+            if not region_type_value: continue
+            region_type_key = (
+                region_type_value.split('/', 1)[1] if '/' in region_type_value else region_type_value).upper()
+
+            if region_type_key == "SCENE":
+                scenes.append(scene_parser.parse(raw_region, 0, chapter_id))
+            elif region_type_key == "HIGHLIGHT":
+                highlight_parser.parse(raw_region, highlights)
+            elif region_type_key == "NARRATIVE_CUE":
+                narrative_cue_parser.parse(raw_region, cues)
+
+        return {
+            "inner_id": task_data.get('inner_id', 0),
+            "position": position,
+            "chapter_id": chapter_id,
+            "annotation_digest": annotation_digest,
+            "scenes": scenes,
+            "highlights": highlights,
+            "narrative_cues": cues,
+        }
+
+    def _ass_file_path(self, chapter_id: int) -> Path:
+        return self.ass_dir_path / f"{str(chapter_id).zfill(2)}.ass"
+
+    def _parse_ass_files(self, chapter_ids: List[int]) -> Iterator[Tuple[int, Tuple[EventStore, EventStore]]]:
+        """
+        按给定的章节顺序产出各章节 ASS 文件的解析结果 (dialogues, captions)，文件不存在时为空存储。
+
+        解析是纯 Python 的 CPU 密集型工作，线程受 GIL 限制无法并行，因此多个章节在进程池中并行解析；
+        调用方组装前一个章节时，其余章节仍在后台解析。进程池使用 Celery 自带的 billiard：标准库的
+        multiprocessing / ProcessPoolExecutor 在 prefork worker（daemon 进程）中不允许创建子进程。
+        只有进程池本身无法创建时（例如系统资源不足）才退回在当前进程中逐个解析。
+        """
+        existing = [chapter_id for chapter_id in chapter_ids if self._ass_file_path(chapter_id).exists()]
+        workers = min(self.parse_workers or os.cpu_count() or 1, len(existing))
+        if workers > 1:
+            try:
+                pool = billiard.Pool(processes=workers)
+            except OSError as e:
+                print(f"Warning: parallel ASS parsing unavailable ({e}), parsing sequentially")
+            else:
+                existing_ids = set(existing)
+                ass_file_paths = (self._ass_file_path(chapter_id) for chapter_id in existing)
+                pending = deque()
+                try:
+                    for chapter_id in chapter_ids:
+                        # 最多提前提交 2 倍进程数的章节：出错或调用方提前停止时只需等待少量在途的解析，
+                        # 已解析但尚未组装的章节也不会在内存中堆积；get() 会重新抛出解析时的原始异常
+                        for ass_file_path in islice(ass_file_paths, workers * 2 - len(pending)):
+                            pending.append(pool.apply_async(ass_parser.parse, (ass_file_path,)))
+                        yield chapter_id, (pending.popleft().get() if chapter_id in existing_ids
+                                           else ass_parser.new_event_stores())
+                finally:
+                    # 先等待窗口内已提交的解析结束，结果缓存清空后再终止进程池：仍有未完成任务时 billiard 的
+                    # terminate() 会一直等待结果；close() 发送结束标记时与回收已退出子进程的线程存在竞争，
+                    # 漏收标记的子进程会让 join() 永远等待
+                    for result in pending:
+                        result.wait()
+                    pool.terminate()
+                    pool.join()
+                return
+
+        for chapter_id in chapter_ids:
+            ass_file_path = self._ass_file_path(chapter_id)
+            yield chapter_id, (ass_parser.parse(ass_file_path) if ass_file_path.exists()
+                               else ass_parser.new_event_stores())
+
+    def _assemble_chapter(self, task_records: List[Dict[str, Any]],
+                          ass_events: Tuple[EventStore, EventStore]) -> List[List[Dict[str, Any]]]:
+        """
+        组装一个章节：将其 ASS 文件中的对白、字幕以及高光与叙事线索分配到该章节各任务的场景。
+
+        场景编号在章节内从 1 开始，由 build 在拼接时统一改为全局编号。
+
+        :param task_records: 属于该章节的任务记录（见 _reduce_task，按 inner_id 排序）
+        :param ass_events: 该章节 ASS 文件的解析结果 (dialogues, captions)，见 _parse_ass_files
+        :return: 按任务分组的场景列表
+        """
+        dialogues_in_chapter, captions_in_chapter = ass_events
+
+        scenes_by_task = [record["scenes"] for record in task_records]
+        highlights, cues = highlight_parser.new_event_store(), narrative_cue_parser.new_event_store()
+        for record in task_records:
+            highlights.extend(record["highlights"])
+            cues.extend(record["narrative_cues"])
+        local_scene_id = 1
+        for task_scenes in scenes_by_task:
+            for scene_data in task_scenes:
+                self._renumber_scene(scene_data, local_scene_id)
+                local_scene_id += 1
+
+        # 按事件类型建立一次有序索引，再按场景区间二分查找分配；事件在命中时才转换为输出字典
+        event_indexes = {
+            "dialogues": EventIndex(dialogues_in_chapter),
+            "captions": EventIndex(captions_in_chapter),
+            "highlights": EventIndex(highlights),
+            "narrative_cues": EventIndex(cues),
+        }
+        for task_scenes in scenes_by_task:
+            for scene_data in task_scenes:
+                scene_start_sec = TimeConverter.ls_time_to_seconds(scene_data.get("start_time_raw"))
+                scene_end_sec = TimeConverter.ls_time_to_seconds(scene_data.get("end_time_raw"))
+
+                for event_key, event_index in event_indexes.items():
+                    scene_data[event_key].extend(event_index.between(scene_start_sec, scene_end_sec))
+
+                scene_data["start_time"] = TimeConverter.seconds_to_final_format(scene_start_sec)
+                scene_data["end_time"] = TimeConverter.seconds_to_final_format(scene_end_sec)
+                if "start_time_raw" in scene_data: del scene_data["start_time_raw"]
+                if "end_time_raw" in scene_data: del scene_data["end_time_raw"]
+        return scenes_by_task
+
+    def _chapter_cache_key(self, chapter_id: int, task_records: List[Dict[str, Any]]) -> str:
+        """章节缓存键：缓存格式版本 + 章节号 + ASS 文件内容 + 各任务标注内容哈希的 SHA-256。"""
+        digest = hashlib.sha256(f"v{CHAPTER_CACHE_VERSION}|{chapter_id}|".encode('utf-8'))
+        ass_file_path = self._ass_file_path(chapter_id)
+        digest.update(ass_file_path.read_bytes() if ass_file_path.exists() else b'<missing>')
+        for record in task_records:
+            digest.update(f"|{record['annotation_digest']}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _load_cached_chapter(self, chapter_id: int, cache_key: str) -> Optional[List[List[Dict[str, Any]]]]:
+        """缓存键一致时返回章节缓存中的组装结果，否则返回 None。"""
+        cache_path = self.cache_dir / f"chapter_{chapter_id:02d}.json"
+        if cache_path.exists():
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if cached.get("key") == cache_key:
+                    return cached["scenes_by_task"]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Warning: ignoring unreadable chapter cache {cache_path}: {e}")
+        return None
+
+    def _save_chapter_cache(self, chapter_id: int, cache_key: str,
+                            scenes_by_task: List[List[Dict[str, Any]]]) -> None:
+        """写入章节缓存。同一 Media 的多次生成可能同时写同一章节，每次写入使用独立的临时文件；写入失败只打印警告。"""
+        cache_path = self.cache_dir / f"chapter_{chapter_id:02d}.json"
+        tmp_path = None
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.cache_dir, prefix=f".{cache_path.name}.",
+                                             suffix='.tmp', delete=False) as f:
+                tmp_path = Path(f.name)
+                json.dump({"key": cache_key, "scenes_by_task": scenes_by_task}, f, ensure_ascii=False)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Warning: failed to write chapter cache {cache_path}: {e}")
+            if tmp_path:
+                tmp_path.unlink(missing_ok=True)
+
+    def _prune_chapter_cache(self, chapter_ids) -> None:
+        """删除已不存在的章节的缓存文件。"""
+        if not self.cache_dir or not self.cache_dir.exists():
+            return
+        keep = {f"chapter_{chapter_id:02d}.json" for chapter_id in chapter_ids}
+        for cache_path in self.cache_dir.glob("chapter_*.json"):
+            if cache_path.name not in keep:
+                cache_path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _release_records(task_records: List[Dict[str, Any]]) -> None:
+        # 组装结果（或缓存）已包含所需数据，释放记录中的中间对象
+        for record in task_records:
+            record["scenes"] = record["highlights"] = record["narrative_cues"] = None
+
+    @staticmethod
+    def _renumber_scene(scene_data: Dict[str, Any], scene_id: int) -> None:
+        scene_data["id"] = scene_id
+        scene_data["name"] = f"Scene_{scene_id}"
+        scene_data["textual"] = f"Scene {scene_id}"
+
+    def _iter_source_tasks(self) -> Iterator[Dict[str, Any]]:
+        if self.tasks is not None:
+            return iter(self.tasks)
+        return ls_export_reader.iter_tasks(self.ls_json_path)
+
     def build(self) -> Dict[str, Any]:
-        # 1. 加载源文件
-        with open(self.ls_json_path, 'r', encoding='utf-8') as f:
-            loaded_data = json.load(f)
-
-        all_tasks = loaded_data if isinstance(loaded_data, list) else []
-
-        # 2. 预处理：解析所有ASS文件
-        ass_data_cache = {}
-        for task_data in all_tasks:
-            file_upload = task_data.get("file_upload", "")
-            if not file_upload: continue
-            match = re.search(r'ep(\d+)', file_upload)
-            if not match: continue
-
-            chapter_number_str = match.group(1).zfill(2)
-            ass_filename = f"{chapter_number_str}.ass"
-            if ass_filename not in ass_data_cache:
-                ass_file_path = self.ass_dir_path / ass_filename
-                if ass_file_path.exists():
-                    ass_data_cache[ass_filename] = ass_parser.parse(ass_file_path)
-                else:
-                    ass_data_cache[ass_filename] = ([], [])
-
-        # 3. 预处理：解析所有Label Studio标注
-        temp_scenes, temp_highlights, temp_cues = [], [], []
-        scene_id_counter = 1
-        for task_data in sorted(all_tasks, key=lambda t: t.get('inner_id', 0)):
+        # 1. 流式读取源任务：逐个转换为场景 / 高光 / 叙事线索记录，原始标注随即丢弃
+        task_records = []
+        for position, task_data in enumerate(self._iter_source_tasks()):
             chapter_id_match = re.search(r'ep(\d+)', task_data.get("file_upload", ""))
             if not chapter_id_match: continue
-            chapter_id = int(chapter_id_match.group(1))
-
-            annotation_results = task_data.get("annotations", [{}])[0].get("result", [])
-            raw_regions = defaultdict(dict)
-            for result in annotation_results:
-                region_id = result.get("id")
-                from_name, value = result.get("from_name"), result.get("value")
-                if not region_id or not from_name or not value: continue
-                raw_regions[region_id][from_name] = value
-                if "start" in value and "end" in value:
-                    raw_regions[region_id]['start_time'] = value["start"]
-                    raw_regions[region_id]['end_time'] = value["end"]
-
-            for raw_region in sorted(raw_regions.values(), key=lambda r: r.get('start_time', 0)):
-                region_type_value = raw_region.get("region_type", {}).get("labels", [None])[0]
-                if not region_type_value: continue
-                region_type_key = (
-                    region_type_value.split('/', 1)[1] if '/' in region_type_value else region_type_value).upper()
-
-                if region_type_key == "SCENE":
-                    temp_scenes.append(scene_parser.parse(raw_region, scene_id_counter, chapter_id))
-                    scene_id_counter += 1
-                elif region_type_key == "HIGHLIGHT":
-                    temp_highlights.append(highlight_parser.parse(raw_region))
-                elif region_type_key == "NARRATIVE_CUE":
-                    temp_cues.extend(list(narrative_cue_parser.parse(raw_region)))
-
-        # 4. 组装与“即时转换”
-        project_scenes = {str(s["id"]): s for s in temp_scenes}
-        for scene_id, scene_data in project_scenes.items():
-            chapter_id = scene_data["chapter_id"]
-            ass_filename = f"{str(chapter_id).zfill(2)}.ass"
-            dialogues_in_chapter, captions_in_chapter = ass_data_cache.get(ass_filename, ([], []))
-
-            scene_start_sec = TimeConverter.ls_time_to_seconds(scene_data.get("start_time_raw"))
-            scene_end_sec = TimeConverter.ls_time_to_seconds(scene_data.get("end_time_raw"))
-
-            for dialogue in dialogues_in_chapter:
-                dialogue_start_sec = TimeConverter.ass_time_to_seconds(dialogue.get("start_time_raw"))
-                if scene_start_sec <= dialogue_start_sec < scene_end_sec:
-                    final_dialogue = dialogue.copy()
-                    final_dialogue["start_time"] = TimeConverter.seconds_to_final_format(dialogue_start_sec)
-                    final_dialogue["end_time"] = TimeConverter.seconds_to_final_format(
-                        TimeConverter.ass_time_to_seconds(dialogue.get("end_time_raw")))
-                    del final_dialogue["start_time_raw"]
-                    del final_dialogue["end_time_raw"]
-                    scene_data["dialogues"].append(final_dialogue)
-
-            for caption in captions_in_chapter:
-                caption_start_sec = TimeConverter.ass_time_to_seconds(caption.get("start_time_raw"))
-                if scene_start_sec <= caption_start_sec < scene_end_sec:
-                    final_caption = caption.copy()
-                    final_caption["start_time"] = TimeConverter.seconds_to_final_format(caption_start_sec)
-                    final_caption["end_time"] = TimeConverter.seconds_to_final_format(
-                        TimeConverter.ass_time_to_seconds(caption.get("end_time_raw")))
-                    del final_caption["start_time_raw"]
-                    del final_caption["end_time_raw"]
-                    scene_data["captions"].append(final_caption)
-
-            for highlight in temp_highlights:
-                highlight_start_sec = TimeConverter.ls_time_to_seconds(highlight.get("start_time_raw"))
-                if scene_start_sec <= highlight_start_sec < scene_end_sec:
-                    final_highlight = highlight.copy()
-                    final_highlight["start_time"] = TimeConverter.seconds_to_final_format(highlight_start_sec)
-                    final_highlight["end_time"] = TimeConverter.seconds_to_final_format(
-                        TimeConverter.ls_time_to_seconds(highlight.get("end_time_raw")))
-                    del final_highlight["start_time_raw"]
-                    del final_highlight["end_time_raw"]
-                    scene_data["highlights"].append(final_highlight)
-
-            for cue in temp_cues:
-                cue_start_sec = TimeConverter.ls_time_to_seconds(cue.get("start_time_raw"))
-                if scene_start_sec <= cue_start_sec < scene_end_sec:
-                    final_cue = cue.copy()
-                    final_cue["start_time"] = TimeConverter.seconds_to_final_format(cue_start_sec)
-                    final_cue["end_time"] = TimeConverter.seconds_to_final_format(
-                        TimeConverter.ls_time_to_seconds(cue.get("end_time_raw")))
-                    del final_cue["start_time_raw"]
-                    del final_cue["end_time_raw"]
-                    scene_data["narrative_cues"].append(final_cue)
-
-            scene_data["start_time"] = TimeConverter.seconds_to_final_format(scene_start_sec)
-            scene_data["end_time"] = TimeConverter.seconds_to_final_format(scene_end_sec)
-            if "start_time_raw" in scene_data: del scene_data["start_time_raw"]
-            if "end_time_raw" in scene_data: del scene_data["end_time_raw"]
+            task_records.append(self._reduce_task(task_data, position, int(chapter_id_match.group(1))))
+
+        # 2. 按 inner_id（相同时按源文件中的顺序）排序，并按章节分组
+        task_records.sort(key=lambda record: (record["inner_id"], record["position"]))
+        records_by_chapter = defaultdict(list)
+        for record in task_records:
+            records_by_chapter[record["chapter_id"]].append(record)
+
+        # 3. 未变化的章节直接使用缓存，其余章节并行解析 ASS 后按章节顺序分配事件
+        scenes_by_chapter, cache_keys = {}, {}
+        for chapter_id, chapter_records in records_by_chapter.items():
+            if self.cache_dir:
+                cache_keys[chapter_id] = self._chapter_cache_key(chapter_id, chapter_records)
+                cached = self._load_cached_chapter(chapter_id, cache_keys[chapter_id])
+                if cached is not None:
+                    self.cache_stats["hits"] += 1
+                    scenes_by_chapter[chapter_id] = iter(cached)
+                    self._release_records(chapter_records)
+        pending_chapter_ids = [chapter_id for chapter_id in records_by_chapter if chapter_id not in scenes_by_chapter]
+        for chapter_id, ass_events in self._parse_ass_files(pending_chapter_ids):
+            chapter_records = records_by_chapter[chapter_id]
+            scenes_by_task = self._assemble_chapter(chapter_records, ass_events)
+            if self.cache_dir:
+                self.cache_stats["misses"] += 1
+                self._save_chapter_cache(chapter_id, cache_keys[chapter_id], scenes_by_task)
+            scenes_by_chapter[chapter_id] = iter(scenes_by_task)
+            self._release_records(chapter_records)
+        self._prune_chapter_cache(records_by_chapter)
+
+        # 4. 拼接：按任务顺序为各章节的场景分配全局编号
+        project_scenes = {}
+        scene_id_counter = 1
+        for chapter_id in (record["chapter_id"] for record in task_records):
+            for scene_data in next(scenes_by_chapter[chapter_id]):
+                self._renumber_scene(scene_data, scene_id_counter)
+                project_scenes[str(scene_id_counter)] = scene_data
+                scene_id_counter += 1
 
         # 5. 构建最终输出
         chapters = self._build_chapters(project_scenes)
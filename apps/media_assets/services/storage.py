@@ -1,43 +1,640 @@
 # 文件路径: apps/media_assets/services/storage.py
 
+import base64
+import errno
+import fcntl
+import hashlib
 import os
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import NoCredentialsError, ClientError
 from django.conf import settings
+from django.urls import reverse
 from pathlib import Path
-from typing import Optional
+from typing import Any, BinaryIO, Callable, Dict, Optional, Tuple
 
 # 导入 Asset 模型用于类型提示，避免循环导入
 from apps.media_assets.models import Asset
+from apps.media_assets.services.transcoding import compute_file_hash
+from apps.media_assets.services.upload_progress import UploadProgressReporter
+
+# HLS 与缩略图产出物的 Content-Type，确保播放器能正确识别播放列表、分片、雪碧图与 WebVTT 索引
+HLS_CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+}
+THUMBNAIL_CONTENT_TYPES = {
+    '.vtt': 'text/vtt',
+    '.jpg': 'image/jpeg',
+}
+
+# Linux 的 FICLONE ioctl：在支持写时复制的文件系统（Btrfs、XFS 等）上创建共享数据块的副本
+FICLONE = 0x40049409
+
+
+def _reflink(src: Path, dst: Path) -> None:
+    with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            dst_file.close()
+            os.remove(dst)
+            raise
+
+
+def link_or_copy_file(src: Path, dst: Path, move: bool = False, stats: Optional[Dict[str, int]] = None) -> str:
+    """
+    以尽量不复制数据的方式把文件放到目标路径，供本地存储后端使用。
+
+    - move=True：同一文件系统内直接重命名，跨设备时才退化为复制
+    - move=False：按 LOCAL_STORAGE_LINK_MODE 依次尝试 reflink（写时复制）与硬链接，都不可用时才复制
+
+    目标文件先写入同目录下的临时路径再原子替换，已存在的目标文件会被覆盖。
+
+    :param src: 源文件路径
+    :param dst: 目标文件路径
+    :param move: 是否移动（移动后源文件不再存在）
+    :param stats: 可选的统计字典，按结果累加 bytes_linked / bytes_copied
+    :return: 实际使用的方式：'rename' / 'reflink' / 'hardlink' / 'copy'
+    """
+    src, dst = Path(src), Path(dst)
+    size = src.stat().st_size
+    tmp_dst = dst.with_name(f".{dst.name}.tmp")
+    if tmp_dst.exists():
+        tmp_dst.unlink()
+
+    method = 'copy'
+    if dst.exists() and os.path.samefile(src, dst):
+        # 目标已是源文件的硬链接（例如重复执行），rename 在这种情况下不会做任何事
+        method = 'hardlink'
+        if move:
+            os.remove(src)
+    elif move:
+        try:
+            os.replace(src, dst)
+            method = 'rename'
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.copy2(src, tmp_dst)
+            os.replace(tmp_dst, dst)
+            os.remove(src)
+    else:
+        link_mode = settings.LOCAL_STORAGE_LINK_MODE
+        attempts = {'auto': ('reflink', 'hardlink'), 'reflink': ('reflink',), 'hardlink': ('hardlink',)}
+        for attempt in attempts.get(link_mode, ()):
+            try:
+                if attempt == 'reflink':
+                    _reflink(src, tmp_dst)
+                else:
+                    os.link(src, tmp_dst)
+                method = attempt
+                break
+            except OSError:
+                # 跨设备 (EXDEV)、文件系统不支持 (EOPNOTSUPP/EINVAL/EPERM) 等情况下尝试下一种方式
+                continue
+        if method == 'copy':
+            shutil.copy2(src, tmp_dst)
+        os.replace(tmp_dst, dst)
+
+    if stats is not None:
+        stats['bytes_copied' if method == 'copy' else 'bytes_linked'] += size
+    return method
+
+
+@lru_cache(maxsize=None)
+def get_s3_client(endpoint_url: Optional[str] = None):
+    """
+    返回进程内共享的 S3 客户端（boto3 客户端是线程安全的），避免每个 Asset 都重新创建客户端与连接池。
+    连接池大小由 AWS_S3_MAX_POOL_CONNECTIONS 控制；配置了 AWS_S3_ENDPOINT_URL 时连接到该地址，
+    便于在本地使用 MinIO 等 S3 兼容服务进行测试。
+
+    客户端在首次调用时才创建，因此 Celery 的 prefork 子进程各自持有自己的客户端。
+
+    :param endpoint_url: 覆盖默认的服务地址（例如生成浏览器可访问的预签名 URL 时）
+    :return: boto3 S3 客户端
+    """
+    return boto3.client(
+        's3',
+        region_name=settings.AWS_S3_REGION_NAME or None,
+        endpoint_url=endpoint_url or settings.AWS_S3_ENDPOINT_URL or None,
+        config=Config(
+            max_pool_connections=settings.AWS_S3_MAX_POOL_CONNECTIONS,
+            retries={'max_attempts': 5, 'mode': 'standard'},
+            tcp_keepalive=True,
+        ),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_transfer_config() -> TransferConfig:
+    """返回按 AWS_S3_MULTIPART_* 与 AWS_S3_MAX_CONCURRENCY 调优的 upload_file 传输配置。"""
+    return TransferConfig(
+        multipart_threshold=settings.AWS_S3_MULTIPART_THRESHOLD,
+        multipart_chunksize=settings.AWS_S3_MULTIPART_CHUNKSIZE,
+        max_concurrency=settings.AWS_S3_MAX_CONCURRENCY,
+        use_threads=True,
+    )
+
+
+class ChecksumReader:
+    """
+    包装一个可回溯的文件对象，在 boto3 读取文件上传的同时计算其 SHA-256，不再单独读一遍文件。
+
+    boto3 可能为计算请求校验和或重试而回退并重复读取同一段数据，这里只对首次读到的字节计算摘要；
+    若读取出现跳跃导致摘要不完整，hexdigest() 返回 None。
+    """
+    def __init__(self, fileobj: BinaryIO):
+        self._fileobj = fileobj
+        self._digest = hashlib.sha256()
+        self._hashed_until = 0
+        self._size = os.fstat(fileobj.fileno()).st_size
+
+    def read(self, amount: int = -1) -> bytes:
+        position = self._fileobj.tell()
+        data = self._fileobj.read(amount)
+        if position <= self._hashed_until < position + len(data):
+            self._digest.update(data[self._hashed_until - position:])
+            self._hashed_until = position + len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._fileobj.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._fileobj.tell()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        # s3transfer 在单次 PUT 结束后会关闭传入的文件对象，文件由调用方负责关闭
+        pass
+
+    def hexdigest(self) -> Optional[str]:
+        return self._digest.hexdigest() if self._hashed_until == self._size else None
+
+
+def _head_object_or_none(s3_client, bucket: str, key: str) -> Optional[Dict[str, Any]]:
+    try:
+        return s3_client.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+
+
+def upload_file_checked(s3_client, local_path: str, bucket: str, key: str, content_type: Optional[str] = None,
+                        transfer_config: Optional[TransferConfig] = None,
+                        callback: Optional[Callable[[int], None]] = None,
+                        previous: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], bool]:
+    """
+    上传本地文件，并在同一次读取中计算其 SHA-256；内容与桶中已有对象相同时跳过上传。
+
+    - 跳过判定：previous（上次上传时记录的 {sha256, size, etag}）存在、大小一致，且桶中对象的 ETag 仍为记录值
+      （即对象未被其他写入替换），此时才读取本地文件计算摘要并与记录比较。没有可比对的对象时不做额外读取
+    - 完整性：上传时使用 ChecksumAlgorithm=SHA256，S3 在服务端逐个请求（分片）校验数据，不一致时上传失败，
+      无需上传后再读回对象
+
+    :param s3_client: boto3 S3 客户端
+    :param local_path: 本地文件路径
+    :param bucket: 目标桶
+    :param key: 目标对象键
+    :param content_type: 对象的 Content-Type
+    :param transfer_config: boto3 传输配置
+    :param callback: 上传进度回调（与 boto3 的 Callback 约定一致）
+    :param previous: 该对象上次上传时的校验记录
+    :return: (本次的校验记录 {sha256, size, etag}, 是否因内容相同而跳过了上传)
+    """
+    size = os.path.getsize(local_path)
+    if previous and settings.S3_SKIP_IDENTICAL_UPLOADS and previous.get('size') == size:
+        existing = _head_object_or_none(s3_client, bucket, key)
+        if (existing and existing.get('ETag') == previous.get('etag') and existing.get('ContentLength') == size
+                and compute_file_hash(local_path) == previous.get('sha256')):
+            if callback:
+                callback(size)
+            return {'sha256': previous['sha256'], 'size': size, 'etag': previous['etag']}, True
+
+    extra_args = {'ChecksumAlgorithm': 'SHA256'}
+    if content_type:
+        extra_args['ContentType'] = content_type
+    with open(local_path, 'rb') as f:
+        reader = ChecksumReader(f)
+        s3_client.upload_fileobj(reader, bucket, key, ExtraArgs=extra_args, Config=transfer_config, Callback=callback)
+    # 仅在 boto3 的读取模式与预期不符时才需要重新读取文件
+    sha256 = reader.hexdigest() or compute_file_hash(local_path)
+    etag = s3_client.head_object(Bucket=bucket, Key=key)['ETag']
+    return {'sha256': sha256, 'size': size, 'etag': etag}, False
+
+
+def copy_object_checked(s3_client, bucket: str, source_key: str, key: str,
+                        transfer_config: Optional[TransferConfig] = None,
+                        source_record: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    在桶内服务端复制一个对象（大对象由 boto3 自动使用分片复制），数据不经过本机。
+
+    :param s3_client: boto3 S3 客户端
+    :param bucket: 桶
+    :param source_key: 源对象键
+    :param key: 目标对象键
+    :param transfer_config: boto3 传输配置
+    :param source_record: 源对象的校验记录 {sha256, size, etag}；源对象未被替换时沿用其 sha256
+    :return: 目标对象的校验记录 {sha256, size, etag}，源对象不存在时返回 None
+    """
+    source = _head_object_or_none(s3_client, bucket, source_key)
+    if source is None:
+        return None
+    s3_client.copy({'Bucket': bucket, 'Key': source_key}, bucket, key, Config=transfer_config)
+    copied = s3_client.head_object(Bucket=bucket, Key=key)
+    sha256 = source_record.get('sha256') if source_record and source_record.get('etag') == source.get('ETag') else None
+    return {'sha256': sha256, 'size': copied['ContentLength'], 'etag': copied['ETag']}
+
+
+def upload_stream_multipart(s3_client, stream: BinaryIO, bucket: str, key: str,
+                            content_type: str = 'application/octet-stream',
+                            on_stream_end: Optional[Callable[[], None]] = None,
+                            progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """
+    将一个不可回溯的字节流（例如 FFmpeg 的输出管道）按固定大小切片，以 S3 分片上传的方式写入对象存储。
+
+    读取与上传并行进行：分片在线程池中上传，同时在途的分片数量受 S3_STREAM_MAX_INFLIGHT_PARTS 限制，
+    因此内存占用上限约为 分片大小 x 在途分片数。流读取完毕后先调用 on_stream_end（用于确认生产者
+    正常结束），确认无误才提交上传；任何异常都会中止分片上传，不会在桶中留下不完整的对象。
+    读取流时同时计算整体的 SHA-256，各分片附带 SHA-256 校验和由 S3 在服务端校验。
+
+    :param s3_client: boto3 S3 客户端
+    :param stream: 可读的二进制流
+    :param bucket: 目标桶
+    :param key: 目标对象键
+    :param content_type: 对象的 Content-Type
+    :param on_stream_end: 流读取完毕、提交上传前调用的校验函数，抛出异常则中止上传
+    :param progress_callback: 每个分片上传完成后以其字节数调用（与 boto3 的 Callback 约定一致）
+    :return: 上传结果的校验记录 {sha256, size, etag}
+    """
+    part_size = settings.S3_STREAM_PART_SIZE
+    max_inflight = settings.S3_STREAM_MAX_INFLIGHT_PARTS
+
+    upload_id = s3_client.create_multipart_upload(Bucket=bucket, Key=key, ContentType=content_type,
+                                                  ChecksumAlgorithm='SHA256')['UploadId']
+
+    def upload_part(part_number: int, body: bytes) -> dict:
+        part_checksum = base64.b64encode(hashlib.sha256(body).digest()).decode('ascii')
+        response = s3_client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=part_number,
+                                         Body=body, ChecksumSHA256=part_checksum)
+        if progress_callback:
+            progress_callback(len(body))
+        return {'PartNumber': part_number, 'ETag': response['ETag'], 'ChecksumSHA256': part_checksum}
+
+    completed_parts = []
+    inflight = []
+    total_bytes = 0
+    digest = hashlib.sha256()
+    try:
+        with ThreadPoolExecutor(max_workers=max_inflight) as executor:
+            part_number = 1
+            while True:
+                # 管道的单次 read 可能返回不足一个分片的数据，需要凑满再上传（最后一片除外）
+                buffer = bytearray()
+                while len(buffer) < part_size:
+                    data = stream.read(part_size - len(buffer))
+                    if not data:
+                        break
+                    buffer.extend(data)
+                if not buffer and part_number > 1:
+                    break
+
+                if len(inflight) >= max_inflight:
+                    completed_parts.append(inflight.pop(0).result())
+                inflight.append(executor.submit(upload_part, part_number, bytes(buffer)))
+                digest.update(buffer)
+                total_bytes += len(buffer)
+                part_number += 1
+                if len(buffer) < part_size:
+                    break
+
+            for future in inflight:
+                completed_parts.append(future.result())
+
+        if on_stream_end:
+            on_stream_end()
+
+        response = s3_client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                                       MultipartUpload={'Parts': completed_parts})
+        return {'sha256': digest.hexdigest(), 'size': total_bytes, 'etag': response['ETag']}
+    except Exception:
+        s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
 
 class StorageService:
     """
     一个封装了存储逻辑的服务，可以处理本地存储和AWS S3存储。
+
+    S3 后端使用进程内共享的客户端与调优后的 TransferConfig；每次保存的耗时与字节数记录在
+    upload_stats 中（按 'video' / 'subtitle' 区分），便于按 Asset 评估上传参数。
+    单文件产出物的校验记录收集在 artifact_checksums 中（见 upload_file_checked），由调用方合并回
+    Asset.artifact_checksums；与上次上传内容相同的文件会跳过上传。
+    本地后端优先使用重命名、reflink 或硬链接放置文件（见 link_or_copy_file），
+    local_transfer_stats 记录其中实际复制与仅链接的字节数。
     """
     def __init__(self):
         self.storage_backend = settings.STORAGE_BACKEND
+        self.upload_stats: Dict[str, Dict[str, float]] = {}
+        self.local_transfer_stats = {'bytes_linked': 0, 'bytes_copied': 0}
+        self.artifact_checksums: Dict[str, Dict[str, Any]] = {}
         if self.storage_backend == 's3':
-            self.s3_client = boto3.client('s3', region_name=settings.AWS_S3_REGION_NAME)
+            self.s3_client = get_s3_client()
+            self.transfer_config = get_transfer_config()
 
-    def save_processed_video(self, local_temp_path: str, asset: Asset) -> str:
+    @staticmethod
+    def _local_media_url(asset: Asset, relative_path: str) -> str:
+        """返回本地后端下 MEDIA_ROOT 中文件的访问 URL；启用 PROTECTED_MEDIA_ENABLED 时指向需要登录的受保护地址。"""
+        if settings.PROTECTED_MEDIA_ENABLED:
+            protected_path = reverse('protected_asset_media', args=[asset.id, relative_path])
+            return f"{settings.LOCAL_MEDIA_URL_BASE}{protected_path}"
+        return f"{settings.LOCAL_MEDIA_URL_BASE}{settings.MEDIA_URL}{relative_path}"
+
+    def _record_upload(self, kind: str, size: int, started_at: float, skipped: bool = False) -> None:
+        self.upload_stats[kind] = {'bytes': size, 'seconds': round(time.monotonic() - started_at, 3)}
+        if skipped:
+            self.upload_stats[kind]['skipped'] = True
+
+    def _upload_file(self, local_path: str, asset: Asset, kind: str, s3_key: str,
+                     content_type: Optional[str] = None) -> None:
+        """上传单个文件（内容与上次相同时跳过），记录校验和、耗时与上传进度。"""
+        started_at = time.monotonic()
+        size = os.path.getsize(local_path)
+        previous = (asset.artifact_checksums or {}).get(s3_key)
+        with UploadProgressReporter(asset.id, kind, os.path.basename(s3_key), size) as reporter:
+            record, skipped = upload_file_checked(self.s3_client, local_path, settings.AWS_STORAGE_BUCKET_NAME, s3_key,
+                                                  content_type=content_type, transfer_config=self.transfer_config,
+                                                  callback=reporter, previous=previous)
+        self.artifact_checksums[s3_key] = record
+        self._record_upload(kind, size, started_at, skipped=skipped)
+
+    def apply_artifact_checksums(self, asset: Asset) -> None:
+        """将本次上传的校验记录合并到 asset.artifact_checksums（不保存）。"""
+        if self.artifact_checksums:
+            asset.artifact_checksums = {**(asset.artifact_checksums or {}), **self.artifact_checksums}
+
+    def save_outputs(self, save_video: Optional[Callable[[], str]], local_srt_path: Optional[Path],
+                     asset: Asset) -> Tuple[Optional[str], Optional[str]]:
         """
-        保存处理后的视频文件。
+        并发保存视频产出物与源字幕：字幕在后台线程中上传，视频在当前线程中保存。
 
-        :param local_temp_path: 本地临时视频文件的路径
+        :param save_video: 保存视频并返回其 URL 的函数（例如调用 save_processed_video），为 None 时只保存字幕
+        :param local_srt_path: 本地源字幕文件的 Path 对象，为 None 时只保存视频
         :param asset: 关联的 Asset 对象
-        :return: 文件的公开访问 URL
+        :return: (视频 URL, 字幕 URL)
         """
-        processed_filename = f"{asset.id}.mp4"
+        started_at = time.monotonic()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            srt_future = executor.submit(self.save_source_subtitle, local_srt_path, asset) if local_srt_path else None
+            video_url = save_video() if save_video else None
+            srt_url = srt_future.result() if srt_future else None
+        self.upload_stats['total_seconds'] = round(time.monotonic() - started_at, 3)
+        return video_url, srt_url
+
+    def format_upload_stats(self) -> str:
+        """将 upload_stats 格式化为一行日志，包含各文件的耗时与吞吐量。"""
+        parts = []
+        for kind in ('video', 'subtitle', 'proxy', 'thumbnails'):
+            stats = self.upload_stats.get(kind)
+            if not stats:
+                continue
+            if stats.get('skipped'):
+                parts.append(f"{kind} {stats['bytes']} bytes unchanged, skipped")
+                continue
+            throughput = stats['bytes'] / stats['seconds'] / (1024 * 1024) if stats['seconds'] else 0
+            parts.append(f"{kind} {stats['bytes']} bytes / {stats['seconds']}s ({throughput:.1f} MB/s)")
+        if 'total_seconds' in self.upload_stats:
+            parts.append(f"total {self.upload_stats['total_seconds']}s")
+        if self.storage_backend != 's3':
+            parts.append(f"linked {self.local_transfer_stats['bytes_linked']} bytes, "
+                         f"copied {self.local_transfer_stats['bytes_copied']} bytes")
+        return ', '.join(parts) or 'no uploads'
+
+    def _save_video_file(self, local_temp_path: str, asset: Asset, processed_filename: str, kind: str) -> str:
         if self.storage_backend == 's3':
             video_s3_key = f"{settings.AWS_S3_PROCESSED_VIDEOS_PREFIX}{processed_filename}"
-            self.s3_client.upload_file(local_temp_path, settings.AWS_STORAGE_BUCKET_NAME, video_s3_key)
+            self._upload_file(local_temp_path, asset, kind, video_s3_key, content_type='video/mp4')
             return f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{video_s3_key}"
         else:
+            started_at = time.monotonic()
+            size = os.path.getsize(local_temp_path)
             processed_video_dir = Path(settings.MEDIA_ROOT) / 'processed_videos'
             processed_video_dir.mkdir(parents=True, exist_ok=True)
-            shutil.move(local_temp_path, processed_video_dir / processed_filename)
-            return f"{settings.LOCAL_MEDIA_URL_BASE}{settings.MEDIA_URL}processed_videos/{processed_filename}"
+            link_or_copy_file(local_temp_path, processed_video_dir / processed_filename, move=True,
+                              stats=self.local_transfer_stats)
+            self._record_upload(kind, size, started_at)
+            return self._local_media_url(asset, f"processed_videos/{processed_filename}")
+
+    def save_processed_video(self, local_temp_path: str, asset: Asset) -> str:
+        """
+        保存处理后的视频文件。
+
+        :param local_temp_path: 本地临时视频文件的路径
+        :param asset: 关联的 Asset 对象
+        :return: 文件的公开访问 URL
+        """
+        return self._save_video_file(local_temp_path, asset, f"{asset.id}.mp4", 'video')
+
+    def save_proxy_video(self, local_temp_path: str, asset: Asset) -> str:
+        """
+        保存标注用的代理视频，与处理后视频存放在同一目录（<asset_id>_proxy.mp4）。
+
+        :param local_temp_path: 本地临时代理视频文件的路径
+        :param asset: 关联的 Asset 对象
+        :return: 文件的公开访问 URL
+        """
+        return self._save_video_file(local_temp_path, asset, f"{asset.id}_proxy.mp4", 'proxy')
+
+    def save_processed_video_stream(self, stream: BinaryIO, asset: Asset,
+                                    on_stream_end: Optional[Callable[[], None]] = None) -> str:
+        """
+        将转码进程输出的 fragmented MP4 流直接分片上传到 S3，编码与上传同时进行，不落地临时文件。
+        仅适用于 S3 存储后端。
+
+        :param stream: 转码输出流
+        :param asset: 关联的 Asset 对象
+        :param on_stream_end: 流读取完毕后、提交上传前调用的校验函数
+        :return: 文件的公开访问 URL
+        """
+        if self.storage_backend != 's3':
+            raise ValueError("流式上传仅支持 S3 存储后端。")
+        started_at = time.monotonic()
+        video_s3_key = f"{settings.AWS_S3_PROCESSED_VIDEOS_PREFIX}{asset.id}.mp4"
+        with UploadProgressReporter(asset.id, 'video', f"{asset.id}.mp4") as reporter:
+            record = upload_stream_multipart(self.s3_client, stream, settings.AWS_STORAGE_BUCKET_NAME, video_s3_key,
+                                             content_type='video/mp4', on_stream_end=on_stream_end,
+                                             progress_callback=reporter)
+        self.artifact_checksums[video_s3_key] = record
+        # 耗时包含转码时间，仅供参考
+        self._record_upload('video', record['size'], started_at)
+        return f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{video_s3_key}"
+
+    def _save_directory(self, local_dir: Path, asset: Asset, kind: str, relative_prefix: str, entry_name: str,
+                        content_types: Dict[str, str]) -> str:
+        """
+        保存一个产出物目录：S3 后端下各文件体积较小，按 AWS_S3_MAX_CONCURRENCY 并发上传；
+        本地后端在同一文件系统内直接重命名整个目录。
+
+        :param local_dir: 本地产出物目录
+        :param asset: 关联的 Asset 对象
+        :param kind: 记录到 upload_stats 与上传进度中的类型
+        :param relative_prefix: processed_videos 下的相对目录，例如 "<asset_id>/hls"
+        :param entry_name: 入口文件名，返回其 URL
+        :param content_types: 按扩展名指定的 Content-Type
+        :return: 入口文件的公开访问 URL
+        """
+        started_at = time.monotonic()
+        file_paths = [file_path for file_path in sorted(local_dir.rglob('*')) if file_path.is_file()]
+        size = sum(file_path.stat().st_size for file_path in file_paths)
+        if self.storage_backend == 's3':
+            base_s3_key = f"{settings.AWS_S3_PROCESSED_VIDEOS_PREFIX}{relative_prefix}"
+
+            def upload(file_path: Path, reporter: UploadProgressReporter) -> None:
+                s3_key = f"{base_s3_key}/{file_path.relative_to(local_dir).as_posix()}"
+                content_type = content_types.get(file_path.suffix, 'application/octet-stream')
+                self.s3_client.upload_file(str(file_path), settings.AWS_STORAGE_BUCKET_NAME, s3_key,
+                                           ExtraArgs={'ContentType': content_type}, Config=self.transfer_config,
+                                           Callback=reporter)
+
+            with UploadProgressReporter(asset.id, kind, entry_name, size) as reporter, \
+                    ThreadPoolExecutor(max_workers=settings.AWS_S3_MAX_CONCURRENCY) as executor:
+                # 通过 list() 取出结果，使任一文件的上传异常都能抛出
+                list(executor.map(lambda file_path: upload(file_path, reporter), file_paths))
+            self._record_upload(kind, size, started_at)
+            return f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{base_s3_key}/{entry_name}"
+        else:
+            target_dir = Path(settings.MEDIA_ROOT) / 'processed_videos' / relative_prefix
+            if target_dir.exists():
+                shutil.rmtree(target_dir)
+            target_dir.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.replace(local_dir, target_dir)
+                self.local_transfer_stats['bytes_linked'] += size
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                shutil.move(str(local_dir), target_dir)
+                self.local_transfer_stats['bytes_copied'] += size
+            self._record_upload(kind, size, started_at)
+            return self._local_media_url(asset, f"processed_videos/{relative_prefix}/{entry_name}")
+
+    def save_processed_hls(self, local_hls_dir: Path, asset: Asset) -> str:
+        """
+        保存处理后的 HLS 输出（主播放列表、各档码率的变体播放列表与分片）。
+
+        :param local_hls_dir: 本地 HLS 输出目录，根部包含 master.m3u8
+        :param asset: 关联的 Asset 对象
+        :return: 主播放列表的公开访问 URL
+        """
+        return self._save_directory(local_hls_dir, asset, 'video', f"{asset.id}/hls", 'master.m3u8', HLS_CONTENT_TYPES)
+
+    def save_thumbnails(self, local_thumbnail_dir: Path, asset: Asset) -> str:
+        """
+        保存缩略图雪碧图与 WebVTT 索引，存放在处理后视频旁的 thumbnails 目录中。
+
+        :param local_thumbnail_dir: 本地缩略图输出目录，根部包含 thumbnails.vtt
+        :param asset: 关联的 Asset 对象
+        :return: WebVTT 索引的公开访问 URL
+        """
+        return self._save_directory(local_thumbnail_dir, asset, 'thumbnails', f"{asset.id}/thumbnails",
+                                    'thumbnails.vtt', THUMBNAIL_CONTENT_TYPES)
+
+    def copy_cached_video(self, cached_asset: Asset, asset: Asset, output_format: str) -> Optional[str]:
+        """
+        转码缓存命中时，将另一个 Asset 的处理后视频复制到本 Asset 自己的位置（processed_videos/<asset_id>.mp4
+        或 processed_videos/<asset_id>/hls/）。不直接引用对方的 URL：对方重新处理或被清理时，
+        其产出物会被覆盖或删除。S3 后端使用服务端复制，本地后端优先使用 reflink 或硬链接（见 link_or_copy_file）。
+
+        :param cached_asset: 命中缓存的另一个 Asset（见 TranscodeService.find_cached_output）
+        :param asset: 当前处理的 Asset
+        :param output_format: 'mp4' 或 'hls'
+        :return: 本 Asset 处理后视频的公开访问 URL；缓存的产出物已不存在时返回 None，由调用方重新转码
+        """
+        started_at = time.monotonic()
+        if output_format == 'hls':
+            source_relative, relative, entry_name = f"{cached_asset.id}/hls", f"{asset.id}/hls", 'master.m3u8'
+        else:
+            source_relative, relative, entry_name = f"{cached_asset.id}.mp4", f"{asset.id}.mp4", None
+
+        if self.storage_backend == 's3':
+            bucket = settings.AWS_STORAGE_BUCKET_NAME
+            source_key = f"{settings.AWS_S3_PROCESSED_VIDEOS_PREFIX}{source_relative}"
+            key = f"{settings.AWS_S3_PROCESSED_VIDEOS_PREFIX}{relative}"
+            if entry_name:
+                size = self._copy_s3_prefix(f"{source_key}/", f"{key}/")
+                if size is None:
+                    return None
+                url_key = f"{key}/{entry_name}"
+            else:
+                record = copy_object_checked(
+                    self.s3_client, bucket, source_key, key, transfer_config=self.transfer_config,
+                    source_record=(cached_asset.artifact_checksums or {}).get(source_key))
+                if record is None:
+                    return None
+                self.artifact_checksums[key] = record
+                size, url_key = record['size'], key
+            self._record_upload('video', size, started_at)
+            return f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{url_key}"
+
+        processed_video_dir = Path(settings.MEDIA_ROOT) / 'processed_videos'
+        source_path, target_path = processed_video_dir / source_relative, processed_video_dir / relative
+        if entry_name:
+            if not (source_path / entry_name).exists():
+                return None
+            self._link_or_copy_directory(source_path, target_path)
+            size = sum(file_path.stat().st_size for file_path in target_path.rglob('*') if file_path.is_file())
+            relative = f"{relative}/{entry_name}"
+        else:
+            if not source_path.exists():
+                return None
+            link_or_copy_file(source_path, target_path, stats=self.local_transfer_stats)
+            size = target_path.stat().st_size
+        self._record_upload('video', size, started_at)
+        return self._local_media_url(asset, f"processed_videos/{relative}")
+
+    def _copy_s3_prefix(self, source_prefix: str, prefix: str) -> Optional[int]:
+        """将 source_prefix 下的全部对象服务端复制到 prefix 下，返回总字节数；源前缀下没有对象时返回 None。"""
+        bucket = settings.AWS_STORAGE_BUCKET_NAME
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        objects = [obj for page in paginator.paginate(Bucket=bucket, Prefix=source_prefix)
+                   for obj in page.get('Contents', [])]
+        if not objects:
+            return None
+
+        def copy_one(obj: Dict[str, Any]) -> None:
+            self.s3_client.copy({'Bucket': bucket, 'Key': obj['Key']}, bucket,
+                                f"{prefix}{obj['Key'][len(source_prefix):]}", Config=self.transfer_config)
+
+        with ThreadPoolExecutor(max_workers=settings.AWS_S3_MAX_CONCURRENCY) as executor:
+            # 通过 list() 取出结果，使任一对象的复制异常都能抛出
+            list(executor.map(copy_one, objects))
+        return sum(obj['Size'] for obj in objects)
+
+    def _link_or_copy_directory(self, source_dir: Path, target_dir: Path) -> None:
+        """逐个文件链接（不支持时复制）到临时目录，完成后整体替换目标目录。"""
+        tmp_dir = target_dir.with_name(f".{target_dir.name}.tmp")
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        for file_path in source_dir.rglob('*'):
+            if file_path.is_file():
+                target_file = tmp_dir / file_path.relative_to(source_dir)
+                target_file.parent.mkdir(parents=True, exist_ok=True)
+                link_or_copy_file(file_path, target_file, stats=self.local_transfer_stats)
+        if target_dir.exists():
+            shutil.rmtree(target_dir)
+        os.replace(tmp_dir, target_dir)
 
     def save_source_subtitle(self, local_srt_path: Path, asset: Asset) -> Optional[str]:
         """
@@ -52,10 +649,13 @@ class StorageService:
 
         if self.storage_backend == 's3':
             srt_s3_key = f"{settings.AWS_S3_SOURCE_SUBTITLES_PREFIX}{asset.id}/{local_srt_path.name}"
-            self.s3_client.upload_file(str(local_srt_path), settings.AWS_STORAGE_BUCKET_NAME, srt_s3_key)
+            self._upload_file(str(local_srt_path), asset, 'subtitle', srt_s3_key)
             return f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{srt_s3_key}"
         else:
+            started_at = time.monotonic()
+            size = local_srt_path.stat().st_size
             source_subtitle_dir = Path(settings.MEDIA_ROOT) / 'source_subtitles' / str(asset.id)
             source_subtitle_dir.mkdir(parents=True, exist_ok=True)
-            shutil.copy(str(local_srt_path), source_subtitle_dir / local_srt_path.name)
-            return f"{settings.LOCAL_MEDIA_URL_BASE}{settings.MEDIA_URL}source_subtitles/{asset.id}/{local_srt_path.name}"
\ No newline at end of file
+            link_or_copy_file(local_srt_path, source_subtitle_dir / local_srt_path.name, stats=self.local_transfer_stats)
+            self._record_upload('subtitle', size, started_at)
+            return self._local_media_url(asset, f"source_subtitles/{asset.id}/{local_srt_path.name}")
@@ -0,0 +1,231 @@
+# 文件路径: apps/media_assets/services/temp_reaper.py
+
+import fcntl
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from botocore.exceptions import BotoCoreError, ClientError
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+# 持有运行中任务工作目录的锁文件名，见 owned_work_dir
+OWNER_LOCK_FILENAME = '.owner.lock'
+
+
+@contextmanager
+def owned_work_dir(root: Path, prefix: str) -> Iterator[Path]:
+    """
+    在 root 下创建一个本次运行独占的临时工作目录，并在运行期间持有其中锁文件的 flock。
+
+    TempArtifactReaper 会跳过锁仍被持有的目录；退出时（无论成功与否）删除整个目录。
+    与直接共享 root 目录相比，同一类任务的并发运行之间不会互相删除对方的输入。
+
+    :param root: 工作目录的父目录，例如 MEDIA_ROOT/temp_modeler_inputs
+    :param prefix: 目录名前缀，例如 "<media_id>_"
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    work_dir = Path(tempfile.mkdtemp(prefix=prefix, dir=root))
+    lock_file = open(work_dir / OWNER_LOCK_FILENAME, 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        yield work_dir
+    finally:
+        lock_file.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _is_locked_by_owner(path: Path) -> bool:
+    lock_path = path / OWNER_LOCK_FILENAME
+    if not lock_path.exists():
+        return False
+    with open(lock_path, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return False
+
+
+def _disk_usage_and_mtime(path: Path) -> Tuple[int, float]:
+    """返回路径实际占用的磁盘字节数（按块计算，预分配的稀疏文件不会被高估）与其中最新的修改时间。"""
+    stat = path.lstat()
+    usage, newest_mtime = stat.st_blocks * 512, stat.st_mtime
+    if path.is_dir() and not path.is_symlink():
+        for dir_path, dir_names, file_names in os.walk(path):
+            for name in dir_names + file_names:
+                try:
+                    stat = os.lstat(os.path.join(dir_path, name))
+                except FileNotFoundError:
+                    continue
+                usage += stat.st_blocks * 512
+                newest_mtime = max(newest_mtime, stat.st_mtime)
+    return usage, newest_mtime
+
+
+def _leading_uuid(name: str) -> Optional[str]:
+    # 临时产物以 Asset / Media 的 UUID 开头，例如 "<asset_id>.mp4"、"<asset_id>_hls"、"<media_id>_xxxx"
+    # 返回规范化的 UUID 字符串，可直接用于 id__in 查询；其他名称（例如 36 个字符但并非十六进制）返回 None
+    candidate = name[:36]
+    if len(candidate) != 36 or candidate.count('-') != 4:
+        return None
+    try:
+        return str(uuid.UUID(candidate))
+    except ValueError:
+        return None
+
+
+class TempArtifactReaper:
+    """
+    清理 MEDIA_ROOT 下崩溃或中断的任务遗留的临时产物，并报告回收的磁盘空间。
+
+    清理范围与判定规则：
+    - temp_processed/、temp_segments/：属于仍在处理中的 Asset（processing 且未超过 TEMP_REAPER_STALE_HOURS）时跳过，
+      否则在超过 TEMP_REAPER_MAX_AGE_HOURS 未修改后删除
+    - temp_modeler_inputs/：锁文件仍被运行中的任务持有时跳过（见 owned_work_dir），否则按最长保留时间删除
+    - batch_uploads/<media_id>/.partial/：超过 TEMP_REAPER_PARTIAL_UPLOAD_MAX_AGE_HOURS 的未完成分片上传会话
+    - batch_uploads/<media_id>/：Media 已被删除时按最长保留时间删除；S3 后端下，加载结束后逐个确认桶中
+      存在同名且大小一致的源对象，只将这些本地副本按最长保留时间删除；其余源文件在 TEMP_REAPER_UPLOAD_RETENTION_HOURS
+      大于 0 时才会在加载完成后删除。正在加载的 Media 始终跳过
+    - blueprint_cache/<media_id>/：叙事蓝图的章节缓存，Media 已被删除时按最长保留时间删除
+    """
+    def __init__(self, dry_run: bool = False):
+        self.dry_run = dry_run
+        self.media_root = Path(settings.MEDIA_ROOT)
+        self.now = time.time()
+        self.max_age = settings.TEMP_REAPER_MAX_AGE_HOURS * 3600
+        self.report: Dict[str, Any] = {'reclaimed_bytes': 0, 'removed': [], 'skipped_live': [], 'errors': []}
+
+    def run(self) -> Dict[str, Any]:
+        """执行一次清理，返回报告（回收字节数、已删除与因属于运行中任务而跳过的路径）。"""
+        from apps.media_assets.models import Asset
+
+        stale_before = timezone.now() - timedelta(hours=settings.TEMP_REAPER_STALE_HOURS)
+        # 没有状态变更时间的记录无法判断是否已失效，按运行中处理
+        live_asset_ids = {
+            str(asset_id) for asset_id in Asset.objects.filter(
+                Q(processing_status_changed_at__gte=stale_before) | Q(processing_status_changed_at__isnull=True),
+                processing_status='processing',
+            ).values_list('id', flat=True)
+        }
+        for dirname in ('temp_processed', 'temp_segments'):
+            for path in self._children(self.media_root / dirname):
+                if _leading_uuid(path.name) in live_asset_ids:
+                    self.report['skipped_live'].append(str(path))
+                    continue
+                self._reap_if_older(path, self.max_age)
+
+        for path in self._children(self.media_root / 'temp_modeler_inputs'):
+            if path.is_dir() and _is_locked_by_owner(path):
+                self.report['skipped_live'].append(str(path))
+                continue
+            self._reap_if_older(path, self.max_age)
+
+        self._reap_batch_uploads()
+        self._reap_orphaned_blueprint_caches()
+
+        if self.media_root.exists():
+            self.report['free_bytes'] = shutil.disk_usage(self.media_root).free
+        return self.report
+
+    def _reap_batch_uploads(self) -> None:
+        from apps.media_assets.models import Media
+
+        upload_root = self.media_root / 'batch_uploads'
+        media_dirs = [path for path in self._children(upload_root) if path.is_dir()]
+        media_ids = {path: _leading_uuid(path.name) for path in media_dirs}
+        media_by_id = {
+            str(media.id): media
+            for media in Media.objects.filter(id__in=[media_id for media_id in media_ids.values() if media_id])
+            .only('id', 'ingestion_status')
+        }
+        partial_max_age = settings.TEMP_REAPER_PARTIAL_UPLOAD_MAX_AGE_HOURS * 3600
+        retention = settings.TEMP_REAPER_UPLOAD_RETENTION_HOURS * 3600
+
+        for media_dir in media_dirs:
+            media = media_by_id.get(media_ids[media_dir])
+            status = media.ingestion_status if media else None
+            if status is None:
+                # Media 已被删除（或目录并非 Media 的上传目录）
+                self._reap_if_older(media_dir, self.max_age)
+                continue
+            if status == 'ingesting':
+                self.report['skipped_live'].append(str(media_dir))
+                continue
+
+            for session_dir in self._children(media_dir / '.partial'):
+                self._reap_if_older(session_dir, partial_max_age)
+
+            if status in ('completed', 'failed') and settings.STORAGE_BACKEND == 's3':
+                self._reap_copies_of_bucket_sources(media, media_dir)
+            if status == 'completed' and retention > 0:
+                self._reap_if_older(media_dir, retention)
+
+    def _reap_copies_of_bucket_sources(self, media, media_dir: Path) -> None:
+        """
+        删除桶中已有对应源对象的本地源文件（直传后为加载而下载的副本）。
+
+        是否删除取决于桶中实际存在同名且大小一致的对象，而不是当前的 DIRECT_UPLOAD_TO_S3 设置：
+        通过本地接收目录上传、从未进入桶的源文件不会被删除。
+        """
+        from apps.media_assets.services.direct_upload import S3DirectUploadService
+
+        try:
+            source_objects = S3DirectUploadService(media).list_source_objects()
+        except (BotoCoreError, ClientError) as e:
+            self.report['errors'].append(f"{media_dir}: {e}")
+            return
+        for path in self._children(media_dir):
+            source_object = source_objects.get(path.name)
+            if source_object is None or not path.is_file() or path.is_symlink():
+                continue
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                continue
+            if size == source_object['size']:
+                self._reap_if_older(path, self.max_age)
+
+    def _reap_orphaned_blueprint_caches(self) -> None:
+        from apps.media_assets.models import Media
+
+        cache_dirs = [path for path in self._children(self.media_root / 'blueprint_cache') if path.is_dir()]
+        media_ids = {path: _leading_uuid(path.name) for path in cache_dirs}
+        existing = {
+            str(media_id) for media_id in Media.objects.filter(
+                id__in=[media_id for media_id in media_ids.values() if media_id]).values_list('id', flat=True)
+        }
+        for cache_dir in cache_dirs:
+            if media_ids[cache_dir] not in existing:
+                self._reap_if_older(cache_dir, self.max_age)
+
+    @staticmethod
+    def _children(path: Path) -> List[Path]:
+        return sorted(path.iterdir()) if path.is_dir() else []
+
+    def _reap_if_older(self, path: Path, max_age: float) -> None:
+        try:
+            usage, newest_mtime = _disk_usage_and_mtime(path)
+            if self.now - newest_mtime < max_age:
+                return
+            if not self.dry_run:
+                if path.is_dir() and not path.is_symlink():
+                    shutil.rmtree(path)
+                else:
+                    path.unlink()
+        except FileNotFoundError:
+            # 其他进程在扫描期间已删除该路径
+            return
+        except OSError as e:
+            self.report['errors'].append(f"{path}: {e}")
+            return
+        self.report['reclaimed_bytes'] += usage
+        self.report['removed'].append(str(path))
@@ -0,0 +1,615 @@
+# 文件路径: apps/media_assets/services/transcoding.py
+
+import hashlib
+import io
+import json
+import math
+import struct
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, List, Optional, Tuple
+
+from django.conf import settings
+
+# 导入 Asset 模型用于类型提示，避免循环导入
+from apps.media_assets.models import Asset
+
+# 计算源文件哈希时每次读取的块大小，避免将多 GB 的视频一次性读入内存
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+# 让 FFmpeg 将机器可读的进度信息（key=value 行）写入 stderr，同时只保留错误级别的日志
+FFMPEG_PROGRESS_ARGS = ['-nostats', '-loglevel', 'error', '-progress', 'pipe:2']
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+def compute_file_hash(file_path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """
+    以流式分块的方式计算文件的 SHA-256 摘要。
+
+    :param file_path: 文件路径
+    :param chunk_size: 每次读取的字节数
+    :return: 十六进制格式的摘要字符串
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_bitrate_ladder(ladder: str) -> List[Tuple[int, str]]:
+    """
+    解析形如 "720:2M,480:1M,360:500k" 的码率阶梯配置。
+
+    :param ladder: 逗号分隔的 "高度:码率" 列表
+    :return: [(高度, 码率), ...]，按配置顺序排列
+    """
+    rungs = []
+    for item in ladder.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        height, bitrate = item.split(':', 1)
+        rungs.append((int(height), bitrate.strip()))
+    return rungs
+
+
+def probe_duration(source_path: str) -> Optional[float]:
+    """
+    使用 ffprobe 读取媒体文件的总时长。
+
+    :param source_path: 媒体文件路径
+    :return: 时长（秒），无法获取时返回 None
+    """
+    ffprobe_command = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+                       '-of', 'default=noprint_wrappers=1:nokey=1', source_path]
+    try:
+        result = subprocess.run(ffprobe_command, check=True, capture_output=True, text=True)
+        return float(result.stdout.strip())
+    except (subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def parse_bitrate(value: str) -> int:
+    """将 "2M"、"800k" 这类 FFmpeg 码率配置转换为 bit/s。"""
+    value = value.strip().lower()
+    multipliers = {'k': 1_000, 'm': 1_000_000, 'g': 1_000_000_000}
+    if value and value[-1] in multipliers:
+        return int(float(value[:-1]) * multipliers[value[-1]])
+    return int(float(value))
+
+
+def is_moov_before_mdat(file_path: str) -> Optional[bool]:
+    """
+    扫描 MP4/MOV 文件的顶层 box，判断 moov 是否位于 mdat 之前（即是否已经 faststart）。
+
+    :param file_path: 媒体文件路径
+    :return: True/False，无法判断（非 ISO BMFF 或文件损坏）时返回 None
+    """
+    file_size = Path(file_path).stat().st_size
+    with open(file_path, 'rb') as f:
+        offset = 0
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            box_size, box_type = struct.unpack('>I4s', header)
+            if box_type == b'moov':
+                return True
+            if box_type == b'mdat':
+                return False
+            if box_size == 1:
+                box_size = struct.unpack('>Q', f.read(8))[0]
+            elif box_size == 0:
+                return None
+            if box_size < 8:
+                return None
+            offset += box_size
+    return None
+
+
+def probe_media(source_path: str) -> Dict[str, Any]:
+    """
+    使用 ffprobe 读取源文件的容器与首个视频/音频流信息，并检测 moov 的位置。
+
+    :param source_path: 媒体文件路径
+    :return: 精简后的探测结果字典，探测失败时返回 {'error': ...}
+    """
+    ffprobe_command = ['ffprobe', '-v', 'error', '-show_format', '-show_streams', '-of', 'json', source_path]
+    try:
+        result = subprocess.run(ffprobe_command, check=True, capture_output=True, text=True)
+        raw = json.loads(result.stdout)
+    except (subprocess.CalledProcessError, ValueError) as e:
+        return {'error': str(e)}
+
+    format_info = raw.get('format', {})
+    video = next((st for st in raw.get('streams', []) if st.get('codec_type') == 'video'), None)
+    audio = next((st for st in raw.get('streams', []) if st.get('codec_type') == 'audio'), None)
+
+    def _int_or_none(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    format_name = format_info.get('format_name', '')
+    return {
+        'format_name': format_name,
+        'duration': float(format_info['duration']) if format_info.get('duration') else None,
+        'format_bit_rate': _int_or_none(format_info.get('bit_rate')),
+        'video_codec': video.get('codec_name') if video else None,
+        'video_bit_rate': _int_or_none(video.get('bit_rate')) if video else None,
+        'pix_fmt': video.get('pix_fmt') if video else None,
+        'width': video.get('width') if video else None,
+        'height': video.get('height') if video else None,
+        'audio_codec': audio.get('codec_name') if audio else None,
+        'audio_bit_rate': _int_or_none(audio.get('bit_rate')) if audio else None,
+        'moov_before_mdat': is_moov_before_mdat(source_path) if 'mp4' in format_name else None,
+    }
+
+
+def _parse_speed(value: str) -> Optional[float]:
+    """将 FFmpeg 进度中的 speed 字段（如 "1.52x"）转换为浮点数。"""
+    try:
+        return float(value.rstrip('x'))
+    except ValueError:
+        return None
+
+
+def read_ffmpeg_progress(stream: IO[str], duration: Optional[float],
+                         progress_callback: Optional[ProgressCallback] = None,
+                         interval: float = 0.5) -> List[str]:
+    """
+    逐行读取 FFmpeg `-progress` 输出，计算完成百分比、编码帧率、速度倍率与剩余时间，
+    并按 interval 节流后回调 progress_callback；进度结束（progress=end）时总会回调一次。
+
+    非 key=value 格式的行视为 FFmpeg 的错误日志，原样收集后返回。
+
+    :param stream: FFmpeg 的进度输出流（文本模式）
+    :param duration: 源文件总时长（秒），为 None 时无法计算百分比和剩余时间
+    :param progress_callback: 接收进度字典的回调函数
+    :param interval: 两次回调之间的最小间隔（秒）
+    :return: 收集到的错误日志行
+    """
+    error_lines = []
+    block = {}
+    last_reported_at = 0.0
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        key, sep, value = line.partition('=')
+        if not sep or ' ' in key:
+            error_lines.append(line)
+            continue
+        block[key] = value
+        if key != 'progress':
+            continue
+
+        is_end = value == 'end'
+        now = time.monotonic()
+        if progress_callback and (is_end or now - last_reported_at >= interval):
+            last_reported_at = now
+            # out_time_us 在部分 FFmpeg 版本中缺失，out_time_ms 实际单位同样是微秒
+            out_time_us = block.get('out_time_us') or block.get('out_time_ms') or '0'
+            try:
+                out_time = max(int(out_time_us), 0) / 1_000_000
+            except ValueError:
+                out_time = 0.0
+            speed = _parse_speed(block.get('speed', ''))
+            try:
+                fps = float(block.get('fps', 0))
+            except ValueError:
+                fps = None
+
+            percent, eta_seconds = None, None
+            if duration:
+                percent = 100.0 if is_end else round(min(out_time / duration * 100, 100.0), 2)
+                if speed:
+                    eta_seconds = 0 if is_end else round(max(duration - out_time, 0) / speed, 1)
+
+            progress_callback({
+                'percent': percent,
+                'fps': fps,
+                'speed': speed,
+                'eta_seconds': eta_seconds,
+                'out_time_seconds': round(out_time, 3),
+                'duration_seconds': duration,
+                'finished': is_end,
+                'updated_at': datetime.now(timezone.utc).isoformat(),
+            })
+        block = {}
+    return error_lines
+
+
+def _format_vtt_timestamp(seconds: float) -> str:
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600 * 1000)
+    minutes, milliseconds = divmod(milliseconds, 60 * 1000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+
+class FFmpegStream:
+    """
+    一个以管道输出转码结果的 FFmpeg 进程。stdout 为转码输出，
+    stderr 上的进度信息由后台线程持续读取，避免管道写满导致 FFmpeg 阻塞。
+    """
+    def __init__(self, ffmpeg_command: List[str], duration: Optional[float],
+                 progress_callback: Optional[ProgressCallback] = None, interval: float = 0.5):
+        self.ffmpeg_command = ffmpeg_command
+        self.process = subprocess.Popen(ffmpeg_command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE)
+        self.stdout = self.process.stdout
+        self._error_lines = []
+        self._stderr_reader = threading.Thread(
+            target=self._read_stderr, args=(duration, progress_callback, interval), daemon=True
+        )
+        self._stderr_reader.start()
+
+    def _read_stderr(self, duration, progress_callback, interval):
+        stderr_text = io.TextIOWrapper(self.process.stderr, encoding='utf-8', errors='replace')
+        self._error_lines = read_ffmpeg_progress(stderr_text, duration, progress_callback, interval)
+
+    def wait(self) -> None:
+        """等待进程结束，进程异常退出时抛出 CalledProcessError。"""
+        returncode = self.process.wait()
+        self._stderr_reader.join()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, self.ffmpeg_command, stderr='\n'.join(self._error_lines))
+
+    def kill_if_running(self) -> None:
+        """如果进程仍在运行（例如上传中途失败），强制结束它。"""
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+
+class TranscodeService:
+    """
+    一个封装了 FFmpeg 转码逻辑的服务，并提供基于内容寻址的转码缓存：
+    缓存键由源文件内容的哈希与编码参数共同决定，命中时直接复用已有的处理后视频。
+    """
+    def __init__(self):
+        self.video_bitrate = settings.FFMPEG_VIDEO_BITRATE
+        self.video_preset = settings.FFMPEG_VIDEO_PRESET
+        self.cache_enabled = settings.TRANSCODE_CACHE_ENABLED
+        self.output_format = settings.VIDEO_OUTPUT_FORMAT
+        self.hls_ladder = parse_bitrate_ladder(settings.HLS_BITRATE_LADDER)
+        self.hls_segment_seconds = settings.HLS_SEGMENT_SECONDS
+        self.progress_interval = settings.FFMPEG_PROGRESS_INTERVAL
+        self.remux_enabled = settings.REMUX_FAST_PATH_ENABLED
+        self.remux_max_height = settings.REMUX_MAX_HEIGHT
+        self.segment_seconds = settings.SEGMENTED_TRANSCODE_SEGMENT_MINUTES * 60
+        self.thumbnail_interval = settings.THUMBNAIL_INTERVAL_SECONDS
+        self.thumbnail_width = settings.THUMBNAIL_WIDTH
+        self.sprite_columns = settings.THUMBNAIL_SPRITE_COLUMNS
+        self.sprite_rows = settings.THUMBNAIL_SPRITE_ROWS
+        self.proxy_height = settings.PROXY_HEIGHT
+        self.proxy_crf = settings.PROXY_CRF
+        self.proxy_keyframe_interval = settings.PROXY_KEYFRAME_INTERVAL_SECONDS
+
+    def build_cache_key(self, source_path: str, output_format: Optional[str] = None,
+                        source_hash: Optional[str] = None, processing_path: str = 'transcode') -> str:
+        """
+        根据源文件内容、处理路径和当前编码参数生成转码缓存键。
+
+        存储后端也参与计算，因为命中时复用的是该后端上的产出物。
+        处理路径区分流复制封装 ('remux') 与重新编码 ('transcode')：封装产出物没有经过重新编码，
+        不能作为转码结果复用（例如关闭快速路径之后），反之亦然。
+
+        :param source_path: 源视频文件路径
+        :param output_format: 输出格式 ('mp4' 或 'hls')，默认使用 VIDEO_OUTPUT_FORMAT
+        :param source_hash: 已计算好的源文件 SHA-256，传入时不再重新读取源文件
+        :param processing_path: 'remux' 或 'transcode'（分段转码的产出物与整体转码等价，也使用 'transcode'）
+        :return: 缓存键（SHA-256 十六进制字符串）
+        """
+        output_format = output_format or self.output_format
+        source_hash = source_hash or compute_file_hash(source_path)
+        if processing_path == 'remux':
+            # 流复制封装的结果只取决于源文件
+            params = f"remux|{output_format}|{settings.STORAGE_BACKEND}"
+        else:
+            if output_format == 'hls':
+                encoder_params = f"{settings.HLS_BITRATE_LADDER}|{self.hls_segment_seconds}"
+            else:
+                encoder_params = self.video_bitrate
+            params = (f"transcode|libx264|{output_format}|{encoder_params}|{self.video_preset}|"
+                      f"{settings.STORAGE_BACKEND}")
+        return hashlib.sha256(f"{source_hash}|{params}".encode('utf-8')).hexdigest()
+
+    def find_cached_output(self, cache_key: str, exclude_asset_id=None) -> Optional[Asset]:
+        """
+        查找已使用相同缓存键处理完成的 Asset。调用方应将其产出物复制到自己的位置
+        （见 StorageService.copy_cached_video），而不是直接引用对方的 URL。
+
+        优先选择自己转码（而非复用缓存）的 Asset：早期的缓存命中记录只引用了其他 Asset 的产出物，
+        自己的位置上可能没有文件。
+
+        :param cache_key: 由 build_cache_key 生成的缓存键
+        :param exclude_asset_id: 排除的 Asset（当前处理的 Asset 自身，其产出物位置即复制目标）
+        :return: 可复用其产出物的 Asset，未命中时返回 None
+        """
+        if not self.cache_enabled:
+            return None
+        candidates = (
+            Asset.objects
+            .filter(transcode_cache_key=cache_key, processing_status='completed')
+            .exclude(processed_video_url__isnull=True)
+            .exclude(processed_video_url='')
+            .exclude(id=exclude_asset_id)
+        )
+        return candidates.exclude(processing_path='cache').first() or candidates.first()
+
+    def _run_with_progress(self, ffmpeg_command: List[str], source_path: str,
+                           progress_callback: Optional[ProgressCallback] = None) -> None:
+        """
+        运行 FFmpeg 并实时解析其进度输出，进程异常退出时抛出 CalledProcessError。
+
+        :param ffmpeg_command: 不含进度参数的 FFmpeg 命令
+        :param source_path: 源视频文件路径，用于获取总时长
+        :param progress_callback: 接收进度字典的回调函数
+        """
+        ffmpeg_command = ffmpeg_command[:1] + FFMPEG_PROGRESS_ARGS + ffmpeg_command[1:]
+        print(f"执行 FFmpeg 命令: {' '.join(ffmpeg_command)}")
+        duration = probe_duration(source_path) if progress_callback else None
+        process = subprocess.Popen(ffmpeg_command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE, text=True, errors='replace')
+        error_lines = read_ffmpeg_progress(process.stderr, duration, progress_callback, self.progress_interval)
+        returncode = process.wait()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, ffmpeg_command, stderr='\n'.join(error_lines))
+
+    def transcode(self, source_path: str, output_path: str,
+                  progress_callback: Optional[ProgressCallback] = None) -> None:
+        """
+        使用 FFmpeg 将源视频转码为目标码率的 H.264 视频。
+
+        :param source_path: 源视频文件路径
+        :param output_path: 输出文件路径
+        :param progress_callback: 接收转码进度字典的回调函数
+        """
+        ffmpeg_command = ['ffmpeg', '-i', source_path, '-c:v', 'libx264', '-b:v', self.video_bitrate, '-preset', self.video_preset, '-y',
+                          output_path]
+        self._run_with_progress(ffmpeg_command, source_path, progress_callback)
+
+    def can_remux(self, probe: Dict[str, Any]) -> Tuple[bool, str]:
+        """
+        判断源文件是否已经满足目标规格，可以跳过重新编码、仅做流复制封装。
+
+        目标规格：H.264 / 4:2:0 像素格式 / 码率不高于 FFMPEG_VIDEO_BITRATE / 高度不超过 REMUX_MAX_HEIGHT。
+
+        :param probe: probe_media 返回的探测结果
+        :return: (是否可以直接封装, 判定原因)
+        """
+        if not self.remux_enabled:
+            return False, 'remux fast path disabled'
+        if probe.get('error'):
+            return False, f"probe failed: {probe['error']}"
+        if probe.get('video_codec') != 'h264':
+            return False, f"video codec is {probe.get('video_codec')}"
+        if probe.get('pix_fmt') not in ('yuv420p', 'yuvj420p'):
+            return False, f"pixel format is {probe.get('pix_fmt')}"
+        if not probe.get('height') or probe['height'] > self.remux_max_height:
+            return False, f"height {probe.get('height')} exceeds {self.remux_max_height}"
+
+        # 部分容器（如 MOV/MKV）不在视频流上标注码率，此时退而使用容器整体码率
+        video_bit_rate = probe.get('video_bit_rate')
+        if not video_bit_rate and probe.get('format_bit_rate'):
+            video_bit_rate = probe['format_bit_rate'] - (probe.get('audio_bit_rate') or 0)
+        target_bit_rate = parse_bitrate(self.video_bitrate)
+        if not video_bit_rate or video_bit_rate > target_bit_rate:
+            return False, f"video bitrate {video_bit_rate} exceeds target {target_bit_rate}"
+
+        faststart = 'already faststart' if probe.get('moov_before_mdat') else 'moov will be moved to front'
+        return True, f"source meets target profile ({faststart})"
+
+    def remux(self, source_path: str, output_path: str, probe: Dict[str, Any],
+              progress_callback: Optional[ProgressCallback] = None) -> None:
+        """
+        流复制视频轨并以 faststart 方式重新封装为 MP4；音频仅在不是 AAC 时转码。
+
+        :param source_path: 源视频文件路径
+        :param output_path: 输出文件路径
+        :param probe: probe_media 返回的探测结果
+        :param progress_callback: 接收进度字典的回调函数
+        """
+        audio_codec = 'copy' if probe.get('audio_codec') == 'aac' else 'aac'
+        ffmpeg_command = ['ffmpeg', '-i', source_path, '-map', '0:v:0', '-map', '0:a:0?',
+                          '-c:v', 'copy', '-c:a', audio_codec, '-movflags', '+faststart', '-y', output_path]
+        self._run_with_progress(ffmpeg_command, source_path, progress_callback)
+
+    def split_into_segments(self, source_path: str, output_dir: Path) -> List[Path]:
+        """
+        以流复制方式将源视频的视频轨在关键帧处切分为约 SEGMENTED_TRANSCODE_SEGMENT_MINUTES 分钟的片段，
+        供多个 worker 并行转码。切分不重新编码，耗时主要取决于磁盘读写。
+
+        :param source_path: 源视频文件路径
+        :param output_dir: 片段输出目录
+        :return: 按时间顺序排列的片段路径列表
+        """
+        output_dir.mkdir(parents=True, exist_ok=True)
+        ffmpeg_command = ['ffmpeg', '-i', source_path, '-map', '0:v:0', '-c', 'copy',
+                          '-f', 'segment', '-segment_time', str(self.segment_seconds), '-reset_timestamps', '1',
+                          '-y', str(output_dir / 'source_%04d.mkv')]
+        self._run_with_progress(ffmpeg_command, source_path)
+        return sorted(output_dir.glob('source_*.mkv'))
+
+    def transcode_segment(self, segment_path: str, output_path: str) -> None:
+        """
+        转码单个视频片段（不含音频），编码参数与完整转码保持一致，以便无损拼接。
+
+        :param segment_path: 片段文件路径
+        :param output_path: 输出文件路径
+        """
+        ffmpeg_command = ['ffmpeg', '-i', segment_path, '-an', '-c:v', 'libx264', '-b:v', self.video_bitrate,
+                          '-preset', self.video_preset, '-y', output_path]
+        self._run_with_progress(ffmpeg_command, segment_path)
+
+    def encode_audio(self, source_path: str, output_path: str) -> None:
+        """
+        将源文件的音轨整体编码为 AAC。音频不随视频分段编码，避免片段边界处出现 AAC 编码延迟造成的间隙。
+
+        :param source_path: 源视频文件路径
+        :param output_path: 输出文件路径 (.m4a)
+        """
+        ffmpeg_command = ['ffmpeg', '-i', source_path, '-map', '0:a:0', '-vn', '-c:a', 'aac', '-b:a', '128k',
+                          '-y', output_path]
+        self._run_with_progress(ffmpeg_command, source_path)
+
+    def concat_segments(self, segment_paths: List[Path], audio_path: Optional[Path], output_path: str) -> None:
+        """
+        使用 concat demuxer 以流复制方式拼接已转码的视频片段，并混入整体编码的音轨，输出 faststart MP4。
+
+        :param segment_paths: 按时间顺序排列的已转码片段路径
+        :param audio_path: 音轨文件路径，源文件无音频时为 None
+        :param output_path: 输出文件路径
+        """
+        list_file = Path(output_path).with_suffix('.concat.txt')
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for segment_path in segment_paths:
+                escaped_path = str(segment_path).replace("'", "'\\''")
+                f.write(f"file '{escaped_path}'\n")
+
+        ffmpeg_command = ['ffmpeg', '-f', 'concat', '-safe', '0', '-i', str(list_file)]
+        if audio_path:
+            ffmpeg_command += ['-i', str(audio_path), '-map', '0:v:0', '-map', '1:a:0']
+        ffmpeg_command += ['-c', 'copy', '-movflags', '+faststart', '-y', output_path]
+        try:
+            self._run_with_progress(ffmpeg_command, str(segment_paths[0]))
+        finally:
+            list_file.unlink(missing_ok=True)
+
+    def transcode_hls(self, source_path: str, output_dir: Path, probe: Dict[str, Any],
+                      progress_callback: Optional[ProgressCallback] = None) -> Path:
+        """
+        使用 FFmpeg 将源视频转码为多码率 HLS：每档码率输出一个子目录（分片 + 变体播放列表），
+        并在输出目录根部生成主播放列表 master.m3u8。
+
+        关键帧按分片时长强制对齐，保证各档码率之间可以无缝切换。源视频没有音轨时只输出视频流。
+
+        :param source_path: 源视频文件路径
+        :param output_dir: 输出目录
+        :param probe: probe_media 返回的探测结果，用于判断是否存在音轨
+        :param progress_callback: 接收转码进度字典的回调函数
+        :return: 主播放列表的路径
+        """
+        output_dir.mkdir(parents=True, exist_ok=True)
+        rung_count = len(self.hls_ladder)
+
+        split_outputs = ''.join(f"[v{i}]" for i in range(rung_count))
+        filters = [f"[0:v]split={rung_count}{split_outputs}"]
+        filters += [f"[v{i}]scale=-2:{height}[v{i}out]" for i, (height, _) in enumerate(self.hls_ladder)]
+
+        ffmpeg_command = ['ffmpeg', '-i', source_path, '-filter_complex', ';'.join(filters)]
+        for i, (_, bitrate) in enumerate(self.hls_ladder):
+            ffmpeg_command += ['-map', f"[v{i}out]", f"-c:v:{i}", 'libx264', f"-b:v:{i}", bitrate,
+                               f"-maxrate:v:{i}", bitrate, f"-bufsize:v:{i}", bitrate]
+        has_audio = bool(probe.get('audio_codec'))
+        if has_audio:
+            for i in range(rung_count):
+                ffmpeg_command += ['-map', '0:a:0', f"-c:a:{i}", 'aac', f"-b:a:{i}", '128k']
+
+        var_stream_map = ' '.join(f"v:{i},a:{i}" if has_audio else f"v:{i}" for i in range(rung_count))
+        ffmpeg_command += [
+            '-preset', self.video_preset,
+            '-force_key_frames', f"expr:gte(t,n_forced*{self.hls_segment_seconds})",
+            '-f', 'hls',
+            '-hls_time', str(self.hls_segment_seconds),
+            '-hls_playlist_type', 'vod',
+            '-hls_segment_filename', str(output_dir / 'v%v' / 'seg_%05d.ts'),
+            '-master_pl_name', 'master.m3u8',
+            '-var_stream_map', var_stream_map,
+            '-y', str(output_dir / 'v%v' / 'index.m3u8'),
+        ]
+        self._run_with_progress(ffmpeg_command, source_path, progress_callback)
+        return output_dir / 'master.m3u8'
+
+    def transcode_proxy(self, source_path: str, output_path: str,
+                        progress_callback: Optional[ProgressCallback] = None) -> None:
+        """
+        转码仅用于标注的低分辨率代理视频：每 PROXY_KEYFRAME_INTERVAL_SECONDS 秒强制一个关键帧且不在场景切换处额外插入，
+        不使用 B 帧并按 fastdecode 调优，使标注工具中逐帧定位时只需从很近的关键帧开始解码。
+
+        :param source_path: 源视频文件路径
+        :param output_path: 输出文件路径
+        :param progress_callback: 接收转码进度字典的回调函数
+        """
+        ffmpeg_command = ['ffmpeg', '-i', source_path, '-map', '0:v:0', '-map', '0:a:0?',
+                          '-vf', f"scale=-2:'min({self.proxy_height},ih)'",
+                          '-c:v', 'libx264', '-preset', 'veryfast', '-tune', 'fastdecode', '-crf', str(self.proxy_crf),
+                          '-force_key_frames', f"expr:gte(t,n_forced*{self.proxy_keyframe_interval})",
+                          '-sc_threshold', '0', '-bf', '0', '-pix_fmt', 'yuv420p',
+                          '-c:a', 'aac', '-b:a', '96k', '-movflags', '+faststart', '-y', output_path]
+        self._run_with_progress(ffmpeg_command, source_path, progress_callback)
+
+    def generate_thumbnail_sprites(self, source_path: str, output_dir: Path, probe: Dict[str, Any]) -> Path:
+        """
+        每隔 THUMBNAIL_INTERVAL_SECONDS 秒截取一帧缩略图，按 列 x 行 拼成若干张雪碧图 (sprite_001.jpg ...)，
+        并生成 WebVTT 索引 thumbnails.vtt：每条 cue 对应一个时间区间，内容为 "sprite_001.jpg#xywh=x,y,w,h"。
+        播放器的时间轴预览只需加载一张小图并按坐标裁剪，不必对完整视频发起范围请求并解码。
+
+        :param source_path: 源视频文件路径
+        :param output_dir: 输出目录
+        :param probe: probe_media 返回的探测结果，用于计算总时长与缩略图高度
+        :return: WebVTT 索引文件的路径
+        """
+        duration = probe.get('duration') or probe_duration(source_path)
+        if not duration:
+            raise ValueError("无法获取视频时长，无法生成缩略图。")
+
+        width = self.thumbnail_width
+        if probe.get('width') and probe.get('height'):
+            height = max(2, round(width * probe['height'] / probe['width'] / 2) * 2)
+        else:
+            height = round(width * 9 / 16 / 2) * 2
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+        ffmpeg_command = ['ffmpeg', '-i', source_path, '-map', '0:v:0', '-an',
+                          '-vf', f"fps=1/{self.thumbnail_interval},scale={width}:{height},"
+                                 f"tile={self.sprite_columns}x{self.sprite_rows}",
+                          '-q:v', '5', '-y', str(output_dir / 'sprite_%03d.jpg')]
+        self._run_with_progress(ffmpeg_command, source_path)
+
+        per_sprite = self.sprite_columns * self.sprite_rows
+        sprite_count = len(list(output_dir.glob('sprite_*.jpg')))
+        thumbnail_count = min(math.ceil(duration / self.thumbnail_interval), sprite_count * per_sprite)
+
+        cues = ['WEBVTT', '']
+        for i in range(thumbnail_count):
+            start = i * self.thumbnail_interval
+            end = min(start + self.thumbnail_interval, duration)
+            sprite_index, position = divmod(i, per_sprite)
+            row, column = divmod(position, self.sprite_columns)
+            cues.append(f"{_format_vtt_timestamp(start)} --> {_format_vtt_timestamp(end)}")
+            cues.append(f"sprite_{sprite_index + 1:03d}.jpg#xywh={column * width},{row * height},{width},{height}")
+            cues.append('')
+
+        vtt_path = output_dir / 'thumbnails.vtt'
+        vtt_path.write_text('\n'.join(cues), encoding='utf-8')
+        return vtt_path
+
+    def start_fragmented_mp4_stream(self, source_path: str,
+                                    progress_callback: Optional[ProgressCallback] = None) -> FFmpegStream:
+        """
+        启动一个将转码结果以 fragmented MP4 形式写入标准输出管道的 FFmpeg 进程，
+        调用方可以边编码边消费输出（例如直接送入 S3 分片上传），无需落地临时文件。
+
+        :param source_path: 源视频文件路径
+        :param progress_callback: 接收转码进度字典的回调函数
+        :return: FFmpegStream 对象，其 stdout 为输出管道
+        """
+        ffmpeg_command = ['ffmpeg'] + FFMPEG_PROGRESS_ARGS + [
+            '-i', source_path,
+            '-c:v', 'libx264', '-b:v', self.video_bitrate, '-preset', self.video_preset,
+            '-movflags', 'frag_keyframe+empty_moov+default_base_moof',
+            '-f', 'mp4', 'pipe:1',
+        ]
+        print(f"执行 FFmpeg 命令: {' '.join(ffmpeg_command)}")
+        duration = probe_duration(source_path) if progress_callback else None
+        return FFmpegStream(ffmpeg_command, duration, progress_callback, self.progress_interval)
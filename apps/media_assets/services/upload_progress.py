@@ -0,0 +1,147 @@
+# 文件路径: apps/media_assets/services/upload_progress.py
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import redis
+from django.conf import settings
+
+# Redis 中每个 Asset 的上传进度哈希键（字段为上传类型：video / subtitle），以及进度更新的发布频道
+UPLOAD_PROGRESS_KEY = 'visify:upload_progress:{asset_id}'
+UPLOAD_PROGRESS_CHANNEL = 'visify:upload_progress'
+
+
+@lru_cache(maxsize=None)
+def get_progress_redis() -> redis.Redis:
+    """返回进程内共享的 Redis 连接（连接池），用于读写上传进度。"""
+    return redis.Redis.from_url(settings.UPLOAD_PROGRESS_REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+
+
+def get_upload_progress(asset_id) -> Dict[str, Dict[str, Any]]:
+    """
+    读取一个 Asset 最近的上传进度。
+
+    :param asset_id: Asset ID
+    :return: {上传类型: 进度}，Redis 不可用或没有记录时返回空字典
+    """
+    try:
+        entries = get_progress_redis().hgetall(UPLOAD_PROGRESS_KEY.format(asset_id=asset_id))
+    except redis.RedisError as e:
+        print(f"读取 Asset {asset_id} 的上传进度失败: {e}")
+        return {}
+    return {kind.decode(): json.loads(value) for kind, value in entries.items()}
+
+
+def format_upload_progress(progress: Dict[str, Dict[str, Any]]) -> Optional[str]:
+    """将 get_upload_progress 的结果格式化为适合在后台展示的摘要，例如 "video 42.0% · 85.3 MB/s"。"""
+    parts = []
+    for kind, entry in sorted(progress.items()):
+        summary = [kind]
+        if entry.get('failed'):
+            summary.append('失败')
+        elif entry.get('finished'):
+            summary.append('完成')
+        elif entry.get('percent') is not None:
+            summary.append(f"{entry['percent']:.1f}%")
+        if entry.get('bytes_per_second'):
+            summary.append(f"{entry['bytes_per_second'] / (1024 * 1024):.1f} MB/s")
+        parts.append(' '.join(summary))
+    return ' · '.join(parts) or None
+
+
+class UploadProgressReporter:
+    """
+    上传进度上报器，可直接作为 boto3 upload_file 的 Callback，也可用于分片流式上传。
+
+    boto3 会在多个传输线程中调用回调，因此回调本身只把字节数追加到 deque（append 是原子操作），
+    不加锁、不做任何 I/O；由一个后台线程按 UPLOAD_PROGRESS_INTERVAL 的间隔汇总字节数，
+    计算吞吐量并写入 Redis（同时发布到 UPLOAD_PROGRESS_CHANNEL）。Redis 不可用时只打印一次警告，
+    不影响上传本身。
+
+    用法::
+
+        with UploadProgressReporter(asset.id, 'video', filename, total_bytes) as reporter:
+            s3_client.upload_file(..., Callback=reporter)
+    """
+    def __init__(self, asset_id, kind: str, filename: str, total_bytes: Optional[int] = None,
+                 interval: Optional[float] = None):
+        self.asset_id = str(asset_id)
+        self.kind = kind
+        self.filename = os.path.basename(str(filename))
+        self.total_bytes = total_bytes
+        self.interval = settings.UPLOAD_PROGRESS_INTERVAL if interval is None else interval
+        self.bytes_transferred = 0
+        self._pending = deque()
+        self._stop_event = threading.Event()
+        self._publisher = None
+        self._started_at = None
+        self._redis_failed = False
+
+    def __call__(self, bytes_amount: int) -> None:
+        self._pending.append(bytes_amount)
+
+    def __enter__(self) -> 'UploadProgressReporter':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop(failed=exc_type is not None)
+
+    def start(self) -> None:
+        self._started_at = time.monotonic()
+        self._publish(finished=False)
+        self._publisher = threading.Thread(target=self._run, name=f"upload-progress-{self.asset_id}", daemon=True)
+        self._publisher.start()
+
+    def stop(self, failed: bool = False) -> None:
+        self._stop_event.set()
+        if self._publisher:
+            self._publisher.join()
+        self._publish(finished=not failed, failed=failed)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self._publish(finished=False)
+
+    def _drain(self) -> None:
+        # 只有发布线程（或 stop 时的调用线程）会取出数据，popleft 与回调中的 append 可以并发执行
+        while True:
+            try:
+                self.bytes_transferred += self._pending.popleft()
+            except IndexError:
+                break
+
+    def _publish(self, finished: bool, failed: bool = False) -> None:
+        self._drain()
+        elapsed = time.monotonic() - self._started_at
+        progress = {
+            'kind': self.kind,
+            'filename': self.filename,
+            'bytes_transferred': self.bytes_transferred,
+            'total_bytes': self.total_bytes,
+            'percent': round(self.bytes_transferred / self.total_bytes * 100, 2) if self.total_bytes else None,
+            'bytes_per_second': round(self.bytes_transferred / elapsed) if elapsed > 0 else None,
+            'elapsed_seconds': round(elapsed, 3),
+            'finished': finished,
+            'failed': failed,
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+        }
+        if self._redis_failed:
+            return
+        try:
+            key = UPLOAD_PROGRESS_KEY.format(asset_id=self.asset_id)
+            payload = json.dumps(progress)
+            pipeline = get_progress_redis().pipeline(transaction=False)
+            pipeline.hset(key, self.kind, payload)
+            pipeline.expire(key, settings.UPLOAD_PROGRESS_TTL)
+            pipeline.publish(UPLOAD_PROGRESS_CHANNEL, json.dumps({'asset_id': self.asset_id, **progress}))
+            pipeline.execute()
+        except redis.RedisError as e:
+            self._redis_failed = True
+            print(f"上报 Asset {self.asset_id} 的上传进度失败，本次上传不再上报: {e}")
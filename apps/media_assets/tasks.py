@@ -2,32 +2,38 @@
 import json
 import os
 import shutil
-import subprocess
-import threading
-import boto3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import requests
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError, ClientError
 
-from celery import shared_task
+from celery import shared_task, chain, chord, group
+from celery.exceptions import Ignore
 from django.conf import settings
 from django.core.files.base import ContentFile
 from pathlib import Path
 from .services.modeling.script_modeler import ScriptModeler
-from .services.storage import StorageService
-
-class ProgressLogger:
-    def __init__(self, filename):
-        self._filename = filename
-        self._size = float(os.path.getsize(filename))
-        self._seen_so_far = 0
-        self._lock = threading.Lock()
-
-    def __call__(self, bytes_amount):
-        # boto3 会在多线程中调用这个回调，所以我们需要加锁来保证打印的线程安全
-        with self._lock:
-            self._seen_so_far += bytes_amount
-            percentage = (self._seen_so_far / self._size) * 100
-            print(f"上传进度: {self._filename}  {self._seen_so_far} / {int(self._size)} bytes ({percentage:.2f}%)")
+from .services.storage import (StorageService, copy_object_checked, get_s3_client, get_transfer_config,
+                               link_or_copy_file, upload_file_checked, upload_stream_multipart)
+from .services.transcoding import TranscodeService, compute_file_hash, probe_media
+from .services.direct_upload import S3DirectUploadService
+from .services.ingest_manifest import IngestManifest, local_file_fingerprint
+from .services.upload_progress import UploadProgressReporter
+from .services.temp_reaper import TempArtifactReaper, owned_work_dir
+
+class TranscodeProgressRecorder:
+    """
+    接收 TranscodeService 的转码进度回调，并将其持久化到 Asset.transcode_progress。
+    回调本身已由 TranscodeService 节流，这里使用 queryset.update 直接写库，
+    避免触发 Asset.save() 中的状态与任务逻辑，也不会覆盖任务对其他字段的修改。
+    """
+    def __init__(self, asset_id):
+        self._asset_id = asset_id
+
+    def __call__(self, progress):
+        from .models import Asset
+        Asset.objects.filter(id=self._asset_id).update(transcode_progress=progress)
 
 @shared_task
 def process_media_asset(asset_id):
@@ -55,46 +61,120 @@ def process_media_asset(asset_id):
             source_srt_path = asset.source_subtitle.path
 
         asset.processing_status = 'processing'
-        asset.save(update_fields=['processing_status'])
-
-        # --- 2. FFmpeg 视频处理 ---
-        temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp_processed')
-        os.makedirs(temp_dir, exist_ok=True)
-        processed_filename = f"{asset.id}.mp4"
-        processed_video_path = os.path.join(temp_dir, processed_filename)
+        asset.transcode_progress = None
+        asset.save(update_fields=['processing_status', 'processing_status_changed_at', 'transcode_progress'])
+
+        # --- 2. FFmpeg 视频处理（优先复用转码缓存） ---
+        transcoder = TranscodeService()
+        progress_recorder = TranscodeProgressRecorder(asset.id)
+        # 探测源文件，满足目标规格时走流复制封装的快速路径
+        source_probe = probe_media(source_video_path)
+        remux_eligible, remux_reason = transcoder.can_remux(source_probe)
+        print(f"源文件探测完成, 可直接封装: {remux_eligible} ({remux_reason})")
+
+        # 该任务始终输出单码率 MP4，HLS 模式仅适用于批量加载流程；缓存键区分封装与转码两种处理路径
+        cache_key = transcoder.build_cache_key(source_video_path, output_format='mp4',
+                                               processing_path='remux' if remux_eligible else 'transcode')
+        cached_asset = transcoder.find_cached_output(cache_key, exclude_asset_id=asset.id)
 
-        ffmpeg_command = ['ffmpeg', '-i', source_video_path, '-c:v', 'libx264', '-b:v', settings.FFMPEG_VIDEO_BITRATE, '-preset', settings.FFMPEG_VIDEO_PRESET, '-y',
-                          processed_video_path]
-        print(f"执行 FFmpeg 命令: {' '.join(ffmpeg_command)}")
-        subprocess.run(ffmpeg_command, check=True, capture_output=True, text=True)
-        print("FFmpeg 处理成功！")
-
-        # --- 3. 上传文件到 AWS S3 ---
         print("开始上传文件到 S3...")
-        s3_client = boto3.client('s3', region_name=settings.AWS_S3_REGION_NAME)
-
-        # 上传处理后的视频
-        video_s3_key = f"{settings.AWS_S3_PROCESSED_VIDEOS_PREFIX}{processed_filename}"
-        video_progress = ProgressLogger(processed_video_path)
-        s3_client.upload_file(processed_video_path, settings.AWS_STORAGE_BUCKET_NAME, video_s3_key,Callback=video_progress)
-        video_cdn_url = f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{video_s3_key}"
-        print(f"视频已上传, URL: {video_cdn_url}")
+        s3_client = get_s3_client()
+        transfer_config = get_transfer_config()
+        upload_started_at = time.monotonic()
+        # 上次上传时记录的校验和，内容未变化的产出物跳过上传
+        previous_checksums = asset.artifact_checksums or {}
+        artifact_checksums = {}
+
+        # 字幕与视频互不依赖，在后台线程中与视频的转码/上传并发进行
+        srt_executor = ThreadPoolExecutor(max_workers=1)
+        srt_future = None
+        if source_srt_path:
+            srt_s3_key = f"{settings.AWS_S3_SOURCE_SUBTITLES_PREFIX}{asset.id}/{os.path.basename(source_srt_path)}"
+            srt_reporter = UploadProgressReporter(asset.id, 'subtitle', source_srt_path, os.path.getsize(source_srt_path))
+            srt_reporter.start()
+            srt_future = srt_executor.submit(
+                upload_file_checked, s3_client, source_srt_path, settings.AWS_STORAGE_BUCKET_NAME, srt_s3_key,
+                transfer_config=transfer_config, callback=srt_reporter, previous=previous_checksums.get(srt_s3_key)
+            )
+            srt_future.add_done_callback(lambda future: srt_reporter.stop(failed=future.exception() is not None))
+        srt_executor.shutdown(wait=False)
+
+        # 命中转码缓存时将对方的产出物服务端复制到本 Asset 自己的对象键，缓存的对象已不存在时按未命中处理
+        video_cdn_url = None
+        if cached_asset:
+            video_s3_key = f"{settings.AWS_S3_PROCESSED_VIDEOS_PREFIX}{asset.id}.mp4"
+            cached_s3_key = f"{settings.AWS_S3_PROCESSED_VIDEOS_PREFIX}{cached_asset.id}.mp4"
+            copied_record = copy_object_checked(
+                s3_client, settings.AWS_STORAGE_BUCKET_NAME, cached_s3_key, video_s3_key,
+                transfer_config=transfer_config, source_record=(cached_asset.artifact_checksums or {}).get(cached_s3_key))
+            if copied_record is not None:
+                artifact_checksums[video_s3_key] = copied_record
+                video_cdn_url = f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{video_s3_key}"
+
+        if video_cdn_url:
+            processing_path = 'cache'
+            print(f"命中转码缓存 (key: {cache_key[:12]}...)，已复制 Asset {cached_asset.id} 的产出物并跳过 FFmpeg, "
+                  f"URL: {video_cdn_url}")
+        elif settings.FFMPEG_STREAM_TO_S3 and not remux_eligible:
+            processing_path = 'transcode'
+            # FFmpeg 输出 fragmented MP4 到管道，边编码边分片上传，不经过临时文件
+            video_s3_key = f"{settings.AWS_S3_PROCESSED_VIDEOS_PREFIX}{asset.id}.mp4"
+            ffmpeg_stream = transcoder.start_fragmented_mp4_stream(source_video_path, progress_callback=progress_recorder)
+            try:
+                with UploadProgressReporter(asset.id, 'video', video_s3_key) as video_reporter:
+                    artifact_checksums[video_s3_key] = upload_stream_multipart(
+                        s3_client, ffmpeg_stream.stdout, settings.AWS_STORAGE_BUCKET_NAME, video_s3_key,
+                        content_type='video/mp4', on_stream_end=ffmpeg_stream.wait, progress_callback=video_reporter
+                    )
+            finally:
+                ffmpeg_stream.kill_if_running()
+            video_cdn_url = f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{video_s3_key}"
+            print(f"视频已流式转码并上传, URL: {video_cdn_url}")
+        else:
+            temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp_processed')
+            os.makedirs(temp_dir, exist_ok=True)
+            processed_filename = f"{asset.id}.mp4"
+            processed_video_path = os.path.join(temp_dir, processed_filename)
 
-        # 如果有字幕文件，也上传它，并获取其 URL
+            if remux_eligible:
+                processing_path = 'remux'
+                transcoder.remux(source_video_path, processed_video_path, source_probe, progress_callback=progress_recorder)
+            else:
+                processing_path = 'transcode'
+                transcoder.transcode(source_video_path, processed_video_path, progress_callback=progress_recorder)
+            print(f"FFmpeg 处理成功！(处理路径: {processing_path})")
+
+            # --- 3. 上传文件到 AWS S3 ---
+            # 上传处理后的视频
+            video_s3_key = f"{settings.AWS_S3_PROCESSED_VIDEOS_PREFIX}{processed_filename}"
+            with UploadProgressReporter(asset.id, 'video', processed_video_path,
+                                        os.path.getsize(processed_video_path)) as video_reporter:
+                artifact_checksums[video_s3_key], video_skipped = upload_file_checked(
+                    s3_client, processed_video_path, settings.AWS_STORAGE_BUCKET_NAME, video_s3_key,
+                    content_type='video/mp4', transfer_config=transfer_config, callback=video_reporter,
+                    previous=previous_checksums.get(video_s3_key)
+                )
+            video_cdn_url = f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{video_s3_key}"
+            print(f"视频{'内容未变化，已跳过上传' if video_skipped else '已上传'}, URL: {video_cdn_url}")
+
+        # 如果有字幕文件，等待其上传完成并获取其 URL
         srt_cdn_url = None
-        if source_srt_path:
-            srt_filename = os.path.basename(source_srt_path)
-            srt_s3_key = f"{settings.AWS_S3_SOURCE_SUBTITLES_PREFIX}{asset.id}/{srt_filename}"
-            srt_progress = ProgressLogger(source_srt_path)
-            s3_client.upload_file(source_srt_path, settings.AWS_STORAGE_BUCKET_NAME, srt_s3_key,Callback=srt_progress)
+        if srt_future:
+            artifact_checksums[srt_s3_key], srt_skipped = srt_future.result()
             srt_cdn_url = f"https://{settings.AWS_S3_CUSTOM_DOMAIN}/{srt_s3_key}"
-            print(f"字幕已上传, URL: {srt_cdn_url}")
+            print(f"字幕{'内容未变化，已跳过上传' if srt_skipped else '已上传'}, URL: {srt_cdn_url}")
+        print(f"Asset {asset.id} 处理与上传总耗时: {time.monotonic() - upload_started_at:.1f}s")
 
         # --- 4. 将所有结果一次性写回数据库 ---
         asset.processing_status = 'completed'
         asset.processed_video_url = video_cdn_url
         asset.source_subtitle_url = srt_cdn_url  # <-- 关键的同步步骤
-        asset.save(update_fields=['processing_status', 'processed_video_url', 'source_subtitle_url'])
+        asset.transcode_cache_key = cache_key
+        asset.source_probe = source_probe
+        asset.processing_path = processing_path
+        asset.artifact_checksums = {**previous_checksums, **artifact_checksums}
+        asset.save(update_fields=['processing_status', 'processing_status_changed_at', 'processed_video_url', 'source_subtitle_url', 'transcode_cache_key',
+                                  'source_probe', 'processing_path', 'artifact_checksums'])
 
         print(f"处理完成 Asset: {asset.title}")
         return f"Asset {asset_id} processed and uploaded successfully."
@@ -103,19 +183,19 @@ def process_media_asset(asset_id):
         print("S3 凭证配置不正确或缺失！")
         if asset:
             asset.processing_status = 'failed'
-            asset.save(update_fields=['processing_status'])
+            asset.save(update_fields=['processing_status', 'processing_status_changed_at'])
         raise
     except ClientError as e:
         print(f"S3 上传时发生客户端错误: {e}")
         if asset:
             asset.processing_status = 'failed'
-            asset.save(update_fields=['processing_status'])
+            asset.save(update_fields=['processing_status', 'processing_status_changed_at'])
         raise
     except Exception as e:
         print(f"处理 Asset {asset_id} 时发生未知错误: {e}")
         if asset:
             asset.processing_status = 'failed'
-            asset.save(update_fields=['processing_status'])
+            asset.save(update_fields=['processing_status', 'processing_status_changed_at'])
         raise
     finally:
         # --- 5. 清理本地临时文件 ---
@@ -206,40 +286,43 @@ def generate_narrative_blueprint(media_id):
     try:
         # --- 1. 准备 ScriptModeler 所需的输入 ---
 
-        # a. 准备 Label Studio JSON 导出文件
-        # 注意：ScriptModeler 需要一个聚合的 JSON，而我们是按 Asset (Task) 导出的。
-        # 我们需要先将多个 Task 的标注数据合并成 LS 导出的那种列表格式。
-        all_annotations = []
-        for asset in media.assets.order_by('sequence_number'):
-            if asset.l2_l3_output_file and hasattr(asset.l2_l3_output_file, 'path'):
-                with open(asset.l2_l3_output_file.path, 'r', encoding='utf-8') as f:
-                    # l2_l3_output_file 存储的是单个 task 的数据
-                    # 我们需要把它模拟成 LS 导出的那种包含 "annotations" 的结构
-                    task_data = json.load(f)
-                    all_annotations.append(task_data)  # [FIX] 简化为直接聚合任务数据
-            else:
-                print(f"警告: Asset {asset.id} 缺少 L2/L3 标注文件，跳过。")
-
-        # 将聚合后的数据写入一个临时的 JSON 文件
-        temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp_modeler_inputs')
-        os.makedirs(temp_dir, exist_ok=True)
-        aggregated_ls_json_path = Path(temp_dir) / f"{media.id}_ls_export.json"
-        with open(aggregated_ls_json_path, 'w', encoding='utf-8') as f:
-            json.dump(all_annotations, f)
-
-        # b. 准备 ASS 文件所在的目录
-        # 我们将所有相关的 .ass 文件复制到一个临时目录中
-        ass_dir_path = Path(temp_dir) / f"{media.id}_ass_files"
-        os.makedirs(ass_dir_path, exist_ok=True)
-        for i, asset in enumerate(media.assets.order_by('sequence_number')):
-            if asset.l1_output_file and hasattr(asset.l1_output_file, 'path'):
-                # ScriptModeler 期望 ass 文件名为 01.ass, 02.ass ...
-                target_ass_name = f"{i + 1:02d}.ass"
-                shutil.copy(asset.l1_output_file.path, ass_dir_path / target_ass_name)
-
-        # --- 2. 实例化并运行 ScriptModeler ---
-        modeler = ScriptModeler(ls_json_path=aggregated_ls_json_path, ass_dir_path=ass_dir_path)
-        final_structured_script = modeler.build()
+        # a. 准备 Label Studio 标注：ScriptModeler 需要 LS 导出格式的任务序列，而我们是按 Asset (Task) 保存的。
+        # 这里逐个读取各 Asset 的任务数据交给 ScriptModeler 流式处理，不再聚合成一个完整的导出文件，
+        # 同一时刻内存中只有一个任务的原始标注
+        def iter_asset_tasks():
+            for asset in media.assets.order_by('sequence_number'):
+                if asset.l2_l3_output_file and hasattr(asset.l2_l3_output_file, 'path'):
+                    with open(asset.l2_l3_output_file.path, 'r', encoding='utf-8') as f:
+                        # l2_l3_output_file 存储的是单个 task 的数据
+                        yield json.load(f)
+                else:
+                    print(f"警告: Asset {asset.id} 缺少 L2/L3 标注文件，跳过。")
+
+        # ASS 文件放在本次运行独占的临时目录中，避免与其他 Media 的并发运行互相删除输入；
+        # 退出时（包括出错时）自动清理，运行期间 TempArtifactReaper 会跳过该目录
+        temp_root = Path(settings.MEDIA_ROOT) / 'temp_modeler_inputs'
+        with owned_work_dir(temp_root, prefix=f"{media.id}_") as temp_dir:
+            # b. 准备 ASS 文件所在的目录
+            # 我们将所有相关的 .ass 文件链接（不支持时复制）到一个临时目录中
+            ass_dir_path = temp_dir / f"{media.id}_ass_files"
+            os.makedirs(ass_dir_path, exist_ok=True)
+            transfer_stats = {'bytes_linked': 0, 'bytes_copied': 0}
+            for i, asset in enumerate(media.assets.order_by('sequence_number')):
+                if asset.l1_output_file and hasattr(asset.l1_output_file, 'path'):
+                    # ScriptModeler 期望 ass 文件名为 01.ass, 02.ass ...
+                    target_ass_name = f"{i + 1:02d}.ass"
+                    link_or_copy_file(asset.l1_output_file.path, ass_dir_path / target_ass_name, stats=transfer_stats)
+            print(f"ASS 文件已准备: linked {transfer_stats['bytes_linked']} bytes, copied {transfer_stats['bytes_copied']} bytes")
+
+            # --- 2. 实例化并运行 ScriptModeler ---
+            # 各章节的组装结果按内容哈希缓存在 blueprint_cache/<media_id>/ 中，只重新解析有变化的章节；
+            # 有变化的章节在最多 BLUEPRINT_PARSE_MAX_WORKERS 个子进程中并行解析
+            blueprint_cache_dir = Path(settings.MEDIA_ROOT) / 'blueprint_cache' / str(media.id)
+            modeler = ScriptModeler(ls_json_path=None, ass_dir_path=ass_dir_path,
+                                    cache_dir=blueprint_cache_dir, tasks=iter_asset_tasks(),
+                                    parse_workers=settings.BLUEPRINT_PARSE_MAX_WORKERS)
+            final_structured_script = modeler.build()
+            print(f"章节缓存: 命中 {modeler.cache_stats['hits']} 个, 重新组装 {modeler.cache_stats['misses']} 个")
 
         # --- 3. 将产出物保存回数据库 ---
         media.final_narrative_asset = final_structured_script
@@ -247,23 +330,27 @@ def generate_narrative_blueprint(media_id):
 
         print(f"成功为 Media ID: {media_id} 生成并保存了叙事蓝图！")
 
-        # --- 4. 清理临时文件 ---
-        shutil.rmtree(temp_dir)
-        print("已清理临时文件。")
-
         return f"Blueprint generated successfully for Media {media_id}"
 
     except Exception as e:
         print(f"为 Media ID: {media_id} 生成叙事蓝图时发生错误: {e}")
         raise
 
+def _sources_in_object_storage():
+    """批量加载的源文件是否由浏览器直传到了对象存储（而不是上传到本地接收目录）。"""
+    return settings.STORAGE_BACKEND == 's3' and settings.DIRECT_UPLOAD_TO_S3
+
 @shared_task
-def ingest_media_files(media_id):
+def ingest_media_files(media_id, force=False):
     """
     (新) 核心编排任务：
     1. 扫描指定目录的文件
     2. 自动创建 Asset 记录
-    3. 为每个 Asset 执行文件处理（转码+存储）
+    3. 将每个 Asset 的文件处理（转码+存储）扇出为并行子任务，
+       由 finalize_media_ingestion 汇总结果并更新 Media 状态
+
+    重新加载时按 Media.ingest_manifest 增量处理：与上次成功处理时相比未变化的源文件
+    （视频与同名字幕）直接跳过，其 Asset 保持不变。force=True 时忽略清单，重新处理所有文件。
     """
     from .models import Media, Asset
 
@@ -271,24 +358,44 @@ def ingest_media_files(media_id):
     try:
         media = Media.objects.get(id=media_id)
         media.ingestion_status = 'ingesting'
-        media.save()
+        media.save(update_fields=['ingestion_status', 'updated_at'])
 
         # 定义一个用于批量上传的“接收”目录
         upload_dir = Path(settings.MEDIA_ROOT) / 'batch_uploads' / str(media.id)
-        if not upload_dir.exists():
-            print(f"警告：未找到 Media ID: {media_id} 的上传目录: {upload_dir}")
-            media.ingestion_status = 'failed'
-            media.save()
-            return f"Ingestion failed: Upload directory not found for Media {media.id}"
-
-        # 扫描目录中的视频文件
-        video_files = list(upload_dir.glob('*.mp4')) + list(upload_dir.glob('*.mov'))
-        print(f"在 {upload_dir} 中找到 {len(video_files)} 个视频文件。")
 
+        if _sources_in_object_storage():
+            # 源文件已由浏览器直传到桶中，各子任务会将自己的源文件下载到接收目录后再处理
+            source_objects = S3DirectUploadService(media).list_source_objects()
+            video_files = [upload_dir / name for name in source_objects if Path(name).suffix in ('.mp4', '.mov')]
+            print(f"在对象存储中找到 {len(video_files)} 个视频文件。")
+        else:
+            if not upload_dir.exists():
+                print(f"警告：未找到 Media ID: {media_id} 的上传目录: {upload_dir}")
+                media.ingestion_status = 'failed'
+                media.save(update_fields=['ingestion_status', 'updated_at'])
+                return f"Ingestion failed: Upload directory not found for Media {media.id}"
+
+            # 扫描目录中的视频文件
+            video_files = list(upload_dir.glob('*.mp4')) + list(upload_dir.glob('*.mov'))
+            print(f"在 {upload_dir} 中找到 {len(video_files)} 个视频文件。")
+
+        if not video_files:
+            media.ingestion_status = 'completed'
+            media.save(update_fields=['ingestion_status', 'updated_at'])
+            return f"Ingestion complete for Media {media_id}: no video files found"
+
+        # --- a. 自动创建 Asset，并为新增或变化的源文件准备子任务签名 ---
+        manifest = IngestManifest(media)
+        subtasks = []
+        asset_ids = []
+        unchanged_count = 0
         for video_path in video_files:
-            # --- a. 自动创建 Asset ---
             base_name = video_path.stem
             srt_path = upload_dir / f"{base_name}.srt"
+            if _sources_in_object_storage():
+                fingerprint = {'video': source_objects[video_path.name], 'subtitle': source_objects.get(srt_path.name)}
+            else:
+                fingerprint = {'video': local_file_fingerprint(video_path), 'subtitle': local_file_fingerprint(srt_path)}
 
             # 假设 sequence_number 来自文件名，例如 ep01 -> 1
             sequence_number = int("".join(filter(str.isdigit, base_name)) or 0)
@@ -298,49 +405,404 @@ def ingest_media_files(media_id):
                 sequence_number=sequence_number,
                 defaults={'title': base_name}
             )
+            if not force and manifest.is_unchanged(asset, video_path, srt_path, fingerprint):
+                unchanged_count += 1
+                continue
             print(f"已创建/找到 Asset: {asset.title}")
 
-            # --- b. 执行文件处理 ---
-            asset.processing_status = 'processing'
-            asset.save()
+            asset_ids.append(str(asset.id))
+            subtasks.append(ingest_media_asset.si(str(asset.id), str(video_path), str(srt_path), fingerprint))
+        manifest.save()
+        if unchanged_count:
+            print(f"{unchanged_count} 个源文件自上次加载后未变化，已跳过。")
+
+        if not subtasks:
+            # 只写状态字段：清单已由 manifest.save() 单独写入，完整保存会用旧值覆盖刷新后的指纹
+            media.ingestion_status = 'completed'
+            media.save(update_fields=['ingestion_status', 'updated_at'])
+            return f"Ingestion complete for Media {media_id}: all {unchanged_count} files unchanged"
+
+        # --- b. 按并发上限将子任务分配到若干条“通道”中 ---
+        # 同一通道内的子任务串行执行，不同通道并行执行，
+        # 因此单个 Media 同时占用的 worker 数量不会超过 INGEST_MAX_CONCURRENCY。
+        max_concurrency = settings.INGEST_MAX_CONCURRENCY
+        if max_concurrency and max_concurrency < len(subtasks):
+            lanes = [chain(*subtasks[i::max_concurrency]) for i in range(max_concurrency)]
+        else:
+            lanes = subtasks
+
+        callback = finalize_media_ingestion.si(str(media.id), asset_ids)
+        chord(group(lanes))(callback)
+
+        print(f"已为 Media ID: {media_id} 派发 {len(subtasks)} 个子任务（并发通道数: {len(lanes)}）。")
+        return f"Ingestion dispatched for Media {media_id}: {len(subtasks)} assets"
 
-            # i. 视频转码 (FFmpeg)
+    except Exception as e:
+        print(f"为 Media ID: {media_id} 批量加载文件时发生错误: {e}")
+        if media:
+            media.ingestion_status = 'failed'
+            media.save(update_fields=['ingestion_status', 'updated_at'])
+        raise
+
+
+def _store_thumbnails(asset, video_path, source_probe, storage_service):
+    """
+    生成并保存 Asset 的缩略图雪碧图与 WebVTT 索引，返回索引的 URL。
+    缩略图不是加载流程的必需产出物，失败时只打印警告并返回 None。
+    """
+    if not settings.THUMBNAIL_SPRITES_ENABLED:
+        return None
+    thumbnail_dir = Path(settings.MEDIA_ROOT) / 'temp_processed' / f"{asset.id}_thumbnails"
+    try:
+        TranscodeService().generate_thumbnail_sprites(video_path, thumbnail_dir, source_probe)
+        return storage_service.save_thumbnails(thumbnail_dir, asset)
+    except Exception as e:
+        print(f"警告: 为 Asset {asset.id} 生成缩略图失败: {e}")
+        return None
+    finally:
+        if thumbnail_dir.exists():
+            shutil.rmtree(thumbnail_dir)
+
+
+def _store_proxy(asset, video_path, storage_service):
+    """
+    转码并保存 Asset 的标注代理视频（低分辨率、密集关键帧），返回其 URL。
+    代理视频缺失时 Label Studio 会退回使用处理后视频，因此失败时只打印警告并返回 None。
+    """
+    if not settings.PROXY_RENDITION_ENABLED:
+        return None
+    proxy_path = Path(settings.MEDIA_ROOT) / 'temp_processed' / f"{asset.id}_proxy.mp4"
+    try:
+        proxy_path.parent.mkdir(parents=True, exist_ok=True)
+        TranscodeService().transcode_proxy(video_path, str(proxy_path))
+        return storage_service.save_proxy_video(str(proxy_path), asset)
+    except Exception as e:
+        print(f"警告: 为 Asset {asset.id} 生成标注代理视频失败: {e}")
+        return None
+    finally:
+        proxy_path.unlink(missing_ok=True)
+
+
+@shared_task(bind=True)
+def ingest_media_asset(self, asset_id, video_path, srt_path, source_fingerprint=None):
+    """
+    批量加载的子任务：为单个 Asset 执行视频转码与文件存储，成功后将源文件指纹写入 Media 的加载清单。
+
+    失败时只将该 Asset 标记为 failed 并返回，不向上抛出异常，
+    以免中断同一通道内的后续子任务和最终的汇总回调。
+
+    对于电影类 Media，任务会将自身替换为“分段并行转码”工作流（见 finalize_segmented_transcode），
+    替换后的工作流继承本任务的 ID，上层的 chord 会等待其完成。
+    """
+    from .models import Asset
+
+    asset = None
+    processed_video_path = None
+    hls_output_dir = None
+    try:
+        asset = Asset.objects.get(id=asset_id)
+        asset.processing_status = 'processing'
+        asset.transcode_progress = None
+        asset.save()
+
+        if _sources_in_object_storage():
+            # 从桶中取回本集的源视频与字幕（字幕可能不存在）
+            direct_upload_service = S3DirectUploadService(asset.media)
+            if not direct_upload_service.download_source(Path(video_path)):
+                raise FileNotFoundError(f"对象存储中未找到源视频: {Path(video_path).name}")
+            direct_upload_service.download_source(Path(srt_path))
+
+        # i. 视频转码 (FFmpeg)，命中转码缓存时直接复用已有产出物
+        storage_service = StorageService()
+        transcoder = TranscodeService()
+        progress_recorder = TranscodeProgressRecorder(asset.id)
+        # 探测源文件，满足目标规格时走流复制封装的快速路径（仅适用于 MP4 输出）
+        source_probe = probe_media(video_path)
+        remux_eligible, remux_reason = transcoder.can_remux(source_probe)
+        remux_eligible = remux_eligible and transcoder.output_format == 'mp4'
+        print(f"Asset {asset.id} 源文件探测完成, 可直接封装: {remux_eligible} ({remux_reason})")
+
+        # 源文件哈希同时用于转码缓存键与加载清单；缓存键区分封装与转码两种处理路径
+        source_hash = compute_file_hash(video_path)
+        cache_key = transcoder.build_cache_key(video_path, source_hash=source_hash,
+                                               processing_path='remux' if remux_eligible else 'transcode')
+        cached_asset = transcoder.find_cached_output(cache_key, exclude_asset_id=asset.id)
+        # 命中时将对方的产出物复制到本 Asset 自己的位置，缓存的产出物已不存在时按未命中处理
+        video_url = (storage_service.copy_cached_video(cached_asset, asset, transcoder.output_format)
+                     if cached_asset else None)
+
+        use_segmented_transcode = (
+            settings.SEGMENTED_TRANSCODE_ENABLED
+            and asset.media.media_type == 'movie'
+            and transcoder.output_format == 'mp4'
+            and not remux_eligible
+            and (source_probe.get('duration') or 0) > transcoder.segment_seconds
+        )
+
+        if video_url:
+            processing_path = 'cache'
+            print(f"命中转码缓存 for Asset {asset.id}，已复制 Asset {cached_asset.id} 的产出物并跳过 FFmpeg, URL: {video_url}")
+            _, srt_url = storage_service.save_outputs(None, Path(srt_path), asset)
+        elif use_segmented_transcode:
+            # 长片：在关键帧处切分 -> 各片段作为独立任务并行转码 -> 拼接，由回调完成存储与回写
+            work_dir = Path(settings.MEDIA_ROOT) / 'temp_segments' / str(asset.id)
+            if work_dir.exists():
+                shutil.rmtree(work_dir)
+            segment_paths = transcoder.split_into_segments(video_path, work_dir)
+            print(f"Asset {asset.id} 已切分为 {len(segment_paths)} 个片段，开始分段并行转码。")
+
+            asset.source_probe = source_probe
+            asset.processing_path = 'segmented'
+            asset.save(update_fields=['source_probe', 'processing_path'])
+
+            encode_tasks = [
+                transcode_video_segment.si(str(segment_path), str(work_dir / f"encoded_{i:04d}.mp4"))
+                for i, segment_path in enumerate(segment_paths)
+            ]
+            if source_probe.get('audio_codec'):
+                encode_tasks.append(encode_audio_track.si(video_path, str(work_dir / 'audio.m4a')))
+            if settings.PROXY_RENDITION_ENABLED:
+                encode_tasks.append(generate_asset_proxy.si(asset_id, video_path))
+            if settings.THUMBNAIL_SPRITES_ENABLED:
+                encode_tasks.append(generate_asset_thumbnails.si(asset_id, video_path))
+            workflow = chord(group(encode_tasks), finalize_segmented_transcode.s(
+                asset_id, str(work_dir), srt_path, cache_key,
+                video_path=video_path, source_fingerprint=source_fingerprint, source_hash=source_hash,
+            ))
+            return self.replace(workflow)
+        elif transcoder.output_format == 'hls':
+            processing_path = 'transcode'
+            hls_output_dir = Path(settings.MEDIA_ROOT) / 'temp_processed' / f"{asset.id}_hls"
+            transcoder.transcode_hls(video_path, hls_output_dir, source_probe, progress_callback=progress_recorder)
+            print(f"FFmpeg HLS 处理成功 for Asset {asset.id}")
+
+            # ii. 使用 StorageService 处理文件存储（与字幕并发），URL 指向主播放列表
+            video_url, srt_url = storage_service.save_outputs(
+                partial(storage_service.save_processed_hls, local_hls_dir=hls_output_dir, asset=asset),
+                Path(srt_path),
+                asset
+            )
+        elif settings.FFMPEG_STREAM_TO_S3 and storage_service.storage_backend == 's3' and not remux_eligible:
+            processing_path = 'transcode'
+            # FFmpeg 输出 fragmented MP4 到管道，边编码边分片上传，不经过临时文件
+            ffmpeg_stream = transcoder.start_fragmented_mp4_stream(video_path, progress_callback=progress_recorder)
+            try:
+                video_url, srt_url = storage_service.save_outputs(
+                    partial(storage_service.save_processed_video_stream, stream=ffmpeg_stream.stdout,
+                            asset=asset, on_stream_end=ffmpeg_stream.wait),
+                    Path(srt_path),
+                    asset
+                )
+            finally:
+                ffmpeg_stream.kill_if_running()
+            print(f"FFmpeg 流式转码并上传成功 for Asset {asset.id}")
+        else:
             temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp_processed')
             os.makedirs(temp_dir, exist_ok=True)
             processed_filename = f"{asset.id}.mp4"
             processed_video_path = os.path.join(temp_dir, processed_filename)
-            ffmpeg_command = ['ffmpeg', '-i', str(video_path), '-c:v', 'libx264', '-b:v', settings.FFMPEG_VIDEO_BITRATE, '-preset', settings.FFMPEG_VIDEO_PRESET, '-y',
-                              processed_video_path]
-            subprocess.run(ffmpeg_command, check=True, capture_output=True, text=True)
-            print(f"FFmpeg 处理成功 for Asset {asset.id}")
-
-            # ii. 使用 StorageService 处理文件存储
-            storage_service = StorageService()
-            video_url = storage_service.save_processed_video(
-                local_temp_path=processed_video_path,
-                asset=asset
-            )
-            srt_url = storage_service.save_source_subtitle(
-                local_srt_path=srt_path,
-                asset=asset
+            if remux_eligible:
+                processing_path = 'remux'
+                transcoder.remux(video_path, processed_video_path, source_probe, progress_callback=progress_recorder)
+            else:
+                processing_path = 'transcode'
+                transcoder.transcode(video_path, processed_video_path, progress_callback=progress_recorder)
+            print(f"FFmpeg 处理成功 for Asset {asset.id} (处理路径: {processing_path})")
+
+            # ii. 使用 StorageService 处理文件存储（与字幕并发）
+            video_url, srt_url = storage_service.save_outputs(
+                partial(storage_service.save_processed_video, local_temp_path=processed_video_path, asset=asset),
+                Path(srt_path),
+                asset
             )
-
-            # iii. 回写 Asset 记录
-            asset.processed_video_url = video_url
-            asset.source_subtitle_url = srt_url
-            asset.processing_status = 'completed'
+        # 标注代理视频与缩略图各自运行独立的 FFmpeg 进程，互不依赖，并行生成
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            proxy_future = executor.submit(_store_proxy, asset, video_path, storage_service)
+            thumbnails_future = executor.submit(_store_thumbnails, asset, video_path, source_probe, storage_service)
+        proxy_video_url, thumbnails_vtt_url = proxy_future.result(), thumbnails_future.result()
+        print(f"Asset {asset.id} 上传耗时: {storage_service.format_upload_stats()}")
+
+        # iii. 回写 Asset 记录（先同步转码期间写入的进度，避免被整体保存覆盖）
+        asset.refresh_from_db(fields=['transcode_progress'])
+        asset.processed_video_url = video_url
+        asset.source_subtitle_url = srt_url
+        asset.proxy_video_url = proxy_video_url
+        asset.thumbnails_vtt_url = thumbnails_vtt_url
+        asset.transcode_cache_key = cache_key
+        asset.source_probe = source_probe
+        asset.processing_path = processing_path
+        asset.processing_status = 'completed'
+        storage_service.apply_artifact_checksums(asset)
+        asset.save()
+        IngestManifest.record(asset.media_id, asset.id, Path(video_path), Path(srt_path), source_fingerprint, source_hash)
+        print(f"文件处理和存储完成 for Asset {asset.id}")
+        return {'asset_id': asset_id, 'status': 'completed', 'upload_stats': storage_service.upload_stats}
+
+    except Ignore:
+        # self.replace() 通过抛出 Ignore 结束当前任务，这不是错误
+        raise
+    except Exception as e:
+        print(f"处理 Asset {asset_id} 时发生错误: {e}")
+        if asset:
+            asset.refresh_from_db(fields=['transcode_progress'])
+            asset.processing_status = 'failed'
             asset.save()
-            print(f"文件处理和存储完成 for Asset {asset.id}")
+        return {'asset_id': asset_id, 'status': 'failed', 'error': str(e)}
+    finally:
+        # 转码失败时可能残留不完整的输出文件
+        if processed_video_path and os.path.exists(processed_video_path):
+            os.remove(processed_video_path)
+        if hls_output_dir and hls_output_dir.exists():
+            shutil.rmtree(hls_output_dir)
+
 
-        # --- 最终化 ---
-        media.ingestion_status = 'completed'
-        media.save()
-        print(f"Media ID: {media_id} 的所有文件已加载处理完毕。")
-        return f"Ingestion complete for Media {media_id}"
+@shared_task
+def transcode_video_segment(segment_path, output_path):
+    """
+    分段并行转码的子任务：转码单个视频片段。
 
+    失败时返回错误信息而不抛出异常，由 finalize_segmented_transcode 统一判定整体结果。
+    """
+    try:
+        TranscodeService().transcode_segment(segment_path, output_path)
+        return {'output_path': output_path, 'ok': True}
     except Exception as e:
-        print(f"为 Media ID: {media_id} 批量加载文件时发生错误: {e}")
-        if media:
-            media.ingestion_status = 'failed'
-            media.save()
-        raise
\ No newline at end of file
+        print(f"转码片段 {segment_path} 时发生错误: {e}")
+        return {'output_path': output_path, 'ok': False, 'error': str(e)}
+
+
+@shared_task
+def encode_audio_track(source_path, output_path):
+    """分段并行转码的子任务：将源文件的音轨整体编码为 AAC。"""
+    try:
+        TranscodeService().encode_audio(source_path, output_path)
+        return {'output_path': output_path, 'ok': True, 'audio': True}
+    except Exception as e:
+        print(f"编码音轨 {source_path} 时发生错误: {e}")
+        return {'output_path': output_path, 'ok': False, 'audio': True, 'error': str(e)}
+
+
+@shared_task
+def generate_asset_thumbnails(asset_id, video_path):
+    """分段并行转码的子任务：与各片段的转码并行生成缩略图雪碧图，并直接回写 Asset.thumbnails_vtt_url。"""
+    from .models import Asset
+
+    asset = Asset.objects.get(id=asset_id)
+    thumbnails_vtt_url = _store_thumbnails(asset, video_path, asset.source_probe or {}, StorageService())
+    if thumbnails_vtt_url:
+        Asset.objects.filter(id=asset_id).update(thumbnails_vtt_url=thumbnails_vtt_url)
+    return {'output_path': None, 'ok': bool(thumbnails_vtt_url), 'auxiliary': 'thumbnails'}
+
+
+@shared_task
+def generate_asset_proxy(asset_id, video_path):
+    """分段并行转码的子任务：与各片段的转码并行生成标注代理视频，并直接回写 Asset.proxy_video_url。"""
+    from .models import Asset
+
+    asset = Asset.objects.get(id=asset_id)
+    storage_service = StorageService()
+    proxy_video_url = _store_proxy(asset, video_path, storage_service)
+    if proxy_video_url:
+        storage_service.apply_artifact_checksums(asset)
+        Asset.objects.filter(id=asset_id).update(proxy_video_url=proxy_video_url,
+                                                 artifact_checksums=asset.artifact_checksums)
+    return {'output_path': None, 'ok': bool(proxy_video_url), 'auxiliary': 'proxy'}
+
+
+@shared_task
+def finalize_segmented_transcode(results, asset_id, work_dir, srt_path, cache_key, video_path=None,
+                                 source_fingerprint=None, source_hash=None):
+    """
+    分段并行转码的汇总回调：拼接所有已转码片段与音轨，存储产出物并回写 Asset。
+
+    返回值与 ingest_media_asset 保持一致，作为被替换任务的最终结果。
+    """
+    from .models import Asset
+
+    asset = None
+    work_dir = Path(work_dir)
+    try:
+        asset = Asset.objects.get(id=asset_id)
+        # 代理视频与缩略图子任务自行回写 Asset，且失败不影响整体结果
+        results = [result for result in results if not result.get('auxiliary')]
+        failures = [result.get('error') for result in results if not result.get('ok')]
+        if failures:
+            raise RuntimeError(f"{len(failures)} 个片段转码失败: {failures[0]}")
+
+        segment_paths = [Path(result['output_path']) for result in results if not result.get('audio')]
+        audio_path = next((Path(result['output_path']) for result in results if result.get('audio')), None)
+
+        processed_video_path = str(work_dir / f"{asset.id}.mp4")
+        TranscodeService().concat_segments(segment_paths, audio_path, processed_video_path)
+        print(f"Asset {asset.id} 的 {len(segment_paths)} 个片段已拼接完成。")
+
+        storage_service = StorageService()
+        video_url, srt_url = storage_service.save_outputs(
+            partial(storage_service.save_processed_video, local_temp_path=processed_video_path, asset=asset),
+            Path(srt_path),
+            asset
+        )
+        print(f"Asset {asset.id} 上传耗时: {storage_service.format_upload_stats()}")
+
+        asset.refresh_from_db(fields=['transcode_progress'])
+        asset.processed_video_url = video_url
+        asset.source_subtitle_url = srt_url
+        asset.transcode_cache_key = cache_key
+        asset.processing_status = 'completed'
+        storage_service.apply_artifact_checksums(asset)
+        asset.save()
+        if video_path:
+            IngestManifest.record(asset.media_id, asset.id, Path(video_path), Path(srt_path), source_fingerprint,
+                                  source_hash)
+        print(f"文件处理和存储完成 for Asset {asset.id} (分段并行转码)")
+        return {'asset_id': asset_id, 'status': 'completed', 'upload_stats': storage_service.upload_stats}
+
+    except Exception as e:
+        print(f"拼接 Asset {asset_id} 的转码片段时发生错误: {e}")
+        if asset:
+            asset.refresh_from_db(fields=['transcode_progress'])
+            asset.processing_status = 'failed'
+            asset.save()
+        return {'asset_id': asset_id, 'status': 'failed', 'error': str(e)}
+    finally:
+        if work_dir.exists():
+            shutil.rmtree(work_dir)
+
+
+@shared_task
+def finalize_media_ingestion(media_id, asset_ids):
+    """
+    批量加载的汇总回调：在所有子任务结束后，根据各 Asset 的处理结果更新 Media.ingestion_status。
+
+    由于同一通道内的子任务以链式执行，chord 只能拿到每条通道最后一个子任务的返回值，
+    因此这里以数据库中各 Asset 的 processing_status 作为汇总依据。
+    """
+    from .models import Media, Asset
+
+    media = Media.objects.get(id=media_id)
+    statuses = list(Asset.objects.filter(id__in=asset_ids).values_list('processing_status', flat=True))
+    failed_count = sum(1 for status in statuses if status != 'completed')
+
+    media.ingestion_status = 'failed' if failed_count else 'completed'
+    media.save(update_fields=['ingestion_status', 'updated_at'])
+
+    if failed_count:
+        print(f"Media ID: {media_id} 批量加载结束，{failed_count}/{len(asset_ids)} 个文件处理失败。")
+        return f"Ingestion finished with {failed_count} failures for Media {media_id}"
+    print(f"Media ID: {media_id} 的所有文件已加载处理完毕。")
+    return f"Ingestion complete for Media {media_id}"
+
+
+@shared_task
+def reap_temp_artifacts(dry_run=False):
+    """
+    定时任务：清理崩溃或中断的任务遗留在 MEDIA_ROOT 下的临时产物（规则见 TempArtifactReaper），
+    返回回收的字节数与删除的路径。
+    """
+    report = TempArtifactReaper(dry_run=dry_run).run()
+    action = "可回收" if dry_run else "已回收"
+    print(f"临时文件清理完成: {action} {report['reclaimed_bytes'] / (1024 * 1024):.1f} MB，"
+          f"删除 {len(report['removed'])} 项，跳过运行中 {len(report['skipped_live'])} 项，错误 {len(report['errors'])} 项。")
+    for error in report['errors']:
+        print(f"清理失败: {error}")
+    return report
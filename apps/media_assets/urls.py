@@ -6,4 +6,6 @@ urlpatterns = [
     # 这个 URL 用于接收来自 Label Studio 的“标记完成”回调
     path('asset/<uuid:asset_id>/mark-as-complete/', views.mark_asset_as_complete, name='mark_asset_as_complete'),
     path('asset/<uuid:asset_id>/save-l1-output/', views.save_l1_output, name='save_l1_output'),
+    path('asset/<uuid:asset_id>/transcode-progress/', views.asset_transcode_progress, name='asset_transcode_progress'),
+    path('asset/<uuid:asset_id>/upload-progress/', views.asset_upload_progress, name='asset_upload_progress'),
 ]
\ No newline at end of file
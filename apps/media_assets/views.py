@@ -1,5 +1,8 @@
 import requests
 import json
+import mimetypes
+import posixpath
+from urllib.parse import quote
 from django.conf import settings
 from django.contrib import messages
 from django.http import HttpResponseRedirect, Http404, HttpResponse
@@ -10,11 +13,15 @@ from django.contrib.auth.decorators import login_required
 from django.template.loader import render_to_string
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST, require_http_methods
 from django.core.files.base import ContentFile
 from .models import Media, Asset
 from .tasks import export_data_from_ls, ingest_media_files
 from .services.label_studio import LabelStudioService
-from pathlib import Path
+from .services.chunked_upload import ChunkedUploadService, ChunkedUploadError
+from .services.direct_upload import S3DirectUploadService
+from .services.upload_progress import get_upload_progress
+from .services.modeling import ass_parser
 from django.shortcuts import render
 from django.contrib import admin
 from django.contrib.admin.views.decorators import staff_member_required
@@ -71,14 +78,20 @@ def save_l1_output(request, asset_id):
         asset = Asset.objects.get(pk=asset_id)
 
         # 从请求体中获取 .ass 文件内容
-        ass_content = request.body.decode('utf-8')
+        ass_content = request.body
 
         if not ass_content:
             return JsonResponse({'status': 'error', 'message': 'No content received'}, status=400)
 
+        # 保存前直接在内存中解析一次请求体，拒绝无法解析的内容（编码错误、Format 行缺列、时间格式错误等）
+        try:
+            dialogues, captions = ass_parser.parse_bytes(ass_content)
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'message': f'Invalid ASS content: {e}'}, status=400)
+
         # 构建文件名并保存到 l1_output_file 字段
         file_name = f"{asset.id}_l1.ass"
-        asset.l1_output_file.save(file_name, ContentFile(ass_content.encode('utf-8')), save=False)
+        asset.l1_output_file.save(file_name, ContentFile(ass_content), save=False)
 
         # 更新状态
         asset.l1_status = 'completed'
@@ -86,7 +99,8 @@ def save_l1_output(request, asset_id):
         # 一次性保存所有更改
         asset.save(update_fields=['l1_output_file', 'l1_status'])
 
-        return JsonResponse({'status': 'success', 'message': 'L1 output saved successfully.'})
+        return JsonResponse({'status': 'success', 'message': 'L1 output saved successfully.',
+                             'dialogues': len(dialogues), 'captions': len(captions)})
 
     except Asset.DoesNotExist:
         return JsonResponse({'status': 'error', 'message': 'Asset not found'}, status=404)
@@ -94,34 +108,174 @@ def save_l1_output(request, asset_id):
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 @login_required
-def batch_file_upload_view(request, media_id):
-    if request.method == 'POST':
-        try:
-            media = Media.objects.get(id=media_id)
-            # 为这个 Media 对象创建一个专属的“接收”目录
-            upload_dir = Path(settings.MEDIA_ROOT) / 'batch_uploads' / str(media.id)
-            upload_dir.mkdir(parents=True, exist_ok=True)
+@require_GET
+def asset_transcode_progress(request, asset_id):
+    """返回单个 Asset 的处理状态与实时转码进度（百分比、fps、速度倍率、剩余时间）。"""
+    asset = get_object_or_404(Asset, pk=asset_id)
+    return JsonResponse({
+        'status': 'success',
+        'asset_id': str(asset.id),
+        'processing_status': asset.processing_status,
+        'transcode_progress': asset.transcode_progress,
+    })
 
-            # request.FILES 包含了所有上传的文件
-            uploaded_file = request.FILES.get('file')
-            if not uploaded_file:
-                return JsonResponse({'status': 'error', 'message': 'No file provided'}, status=400)
+@login_required
+@require_GET
+def asset_upload_progress(request, asset_id):
+    """返回单个 Asset 产出物上传到存储的实时进度（按 video / subtitle 区分，包含已传字节数与吞吐量）。"""
+    asset = get_object_or_404(Asset, pk=asset_id)
+    return JsonResponse({
+        'status': 'success',
+        'asset_id': str(asset.id),
+        'processing_status': asset.processing_status,
+        'upload_progress': get_upload_progress(asset.id),
+    })
+
+# --- 受保护的本地媒体文件 ---
+# Django 只做权限校验，文件本身通过 X-Accel-Redirect 交给 nginx 的 internal location 发送，
+# 保留 sendfile、Range 请求与缓存头，Python 进程不读取任何视频字节。
+
+def _is_asset_media_path(asset, relative_path):
+    """判断 MEDIA_ROOT 下的相对路径是否属于该 Asset 的源文件或产出物。"""
+    asset_id = str(asset.id)
+    if relative_path in (f"processed_videos/{asset_id}.mp4", f"processed_videos/{asset_id}_proxy.mp4"):
+        return True
+    if relative_path.startswith((f"processed_videos/{asset_id}/", f"source_subtitles/{asset_id}/")):
+        return True
+    file_fields = (asset.source_video, asset.source_subtitle, asset.l1_output_file)
+    return any(field and field.name == relative_path for field in file_fields)
+
+@require_http_methods(['GET', 'HEAD'])
+def protected_asset_media(request, asset_id, relative_path):
+    if not request.user.is_authenticated:
+        return HttpResponse(status=401)
+    if not request.user.has_perm('media_assets.view_asset'):
+        return HttpResponse(status=403)
+
+    asset = get_object_or_404(Asset, pk=asset_id)
+    relative_path = posixpath.normpath(relative_path)
+    if relative_path.startswith(('../', '/')) or not _is_asset_media_path(asset, relative_path):
+        raise Http404("File not found")
 
-            # 将文件保存到我们的接收目录中
-            file_path = upload_dir / uploaded_file.name
-            with open(file_path, 'wb+') as fp:
-                for chunk in uploaded_file.chunks():
-                    fp.write(chunk)
+    content_type, _ = mimetypes.guess_type(relative_path)
+    response = HttpResponse(content_type=content_type or 'application/octet-stream')
+    response['X-Accel-Redirect'] = f"{settings.PROTECTED_MEDIA_INTERNAL_PREFIX}{quote(relative_path)}"
+    return response
 
-            print(f"接收到文件: {uploaded_file.name}，已保存到: {file_path}")
-            return JsonResponse({'status': 'success', 'message': f'File {uploaded_file.name} uploaded successfully'})
+# --- 可断点续传的分片上传 API ---
+# 协议：init -> (status) -> 并行 PUT 各分片 -> complete。
+# 连接中断后重新调用 init 即可拿到服务端已接收的分片列表，只补传缺失的分片。
 
-        except Media.DoesNotExist:
-            return JsonResponse({'status': 'error', 'message': 'Media not found'}, status=404)
-        except Exception as e:
-            return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+def _chunked_upload_error(e):
+    return JsonResponse({'status': 'error', 'message': str(e)}, status=e.status_code)
 
-    return JsonResponse({'status': 'error', 'message': 'Only POST method is allowed'}, status=405)
+@login_required
+@require_POST
+def chunked_upload_init_view(request, media_id):
+    media = get_object_or_404(Media, id=media_id)
+    try:
+        payload = json.loads(request.body or b'{}')
+        service = ChunkedUploadService(media)
+        session = service.init_upload(
+            filename=payload.get('filename', ''),
+            total_size=int(payload.get('total_size', -1)),
+            chunk_size=int(payload.get('chunk_size', 0)),
+            last_modified=int(payload.get('last_modified', -1)),
+        )
+        return JsonResponse({'status': 'success', **session})
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'status': 'error', 'message': f'Invalid payload: {e}'}, status=400)
+    except ChunkedUploadError as e:
+        return _chunked_upload_error(e)
+
+@login_required
+@require_GET
+def chunked_upload_status_view(request, media_id, upload_id):
+    media = get_object_or_404(Media, id=media_id)
+    try:
+        return JsonResponse({'status': 'success', **ChunkedUploadService(media).get_status(upload_id)})
+    except ChunkedUploadError as e:
+        return _chunked_upload_error(e)
+
+@login_required
+@require_http_methods(['PUT'])
+def chunked_upload_chunk_view(request, media_id, upload_id, chunk_index):
+    media = get_object_or_404(Media, id=media_id)
+    try:
+        # 直接从请求流中读取分片，避免 request.body 将整个分片读入内存
+        result = ChunkedUploadService(media).write_chunk(
+            upload_id, chunk_index, request, request.headers.get('X-Chunk-Checksum', '')
+        )
+        return JsonResponse({'status': 'success', **result})
+    except ChunkedUploadError as e:
+        return _chunked_upload_error(e)
+
+@login_required
+@require_POST
+def chunked_upload_complete_view(request, media_id, upload_id):
+    media = get_object_or_404(Media, id=media_id)
+    try:
+        file_path = ChunkedUploadService(media).complete_upload(upload_id)
+        print(f"接收到文件: {file_path.name}，已保存到: {file_path}")
+        return JsonResponse({'status': 'success', 'message': f'File {file_path.name} uploaded successfully'})
+    except ChunkedUploadError as e:
+        return _chunked_upload_error(e)
+
+# --- S3 直传 API（STORAGE_BACKEND='s3' 时使用）---
+# 协议：init -> 分批 sign 预签名 URL -> 浏览器并行 PUT 各分片到桶 -> complete（服务端合并分片）
+
+@login_required
+@require_POST
+def s3_upload_init_view(request, media_id):
+    media = get_object_or_404(Media, id=media_id)
+    try:
+        payload = json.loads(request.body or b'{}')
+        session = S3DirectUploadService(media).init_upload(
+            filename=payload.get('filename', ''),
+            total_size=int(payload.get('total_size', -1)),
+            last_modified=int(payload.get('last_modified', -1)),
+            content_type=payload.get('content_type', ''),
+        )
+        return JsonResponse({'status': 'success', **session})
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'status': 'error', 'message': f'Invalid payload: {e}'}, status=400)
+    except ChunkedUploadError as e:
+        return _chunked_upload_error(e)
+
+@login_required
+@require_POST
+def s3_upload_sign_view(request, media_id):
+    media = get_object_or_404(Media, id=media_id)
+    try:
+        payload = json.loads(request.body or b'{}')
+        urls = S3DirectUploadService(media).sign_parts(
+            key=payload.get('key', ''),
+            upload_id=payload.get('upload_id', ''),
+            part_numbers=[int(number) for number in payload.get('part_numbers', [])],
+        )
+        return JsonResponse({'status': 'success', 'urls': urls})
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'status': 'error', 'message': f'Invalid payload: {e}'}, status=400)
+    except ChunkedUploadError as e:
+        return _chunked_upload_error(e)
+
+@login_required
+@require_POST
+def s3_upload_complete_view(request, media_id):
+    media = get_object_or_404(Media, id=media_id)
+    try:
+        payload = json.loads(request.body or b'{}')
+        key = S3DirectUploadService(media).complete_upload(
+            key=payload.get('key', ''),
+            upload_id=payload.get('upload_id', ''),
+            total_parts=int(payload.get('total_parts', 0)),
+        )
+        print(f"文件已直传到 S3: {key}")
+        return JsonResponse({'status': 'success', 'message': f'File {key} uploaded successfully'})
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'status': 'error', 'message': f'Invalid payload: {e}'}, status=400)
+    except ChunkedUploadError as e:
+        return _chunked_upload_error(e)
 
 # 这个视图负责渲染我们的自定义上传页面
 @login_required
@@ -130,6 +284,9 @@ def batch_upload_page_view(request, media_id):
         media = Media.objects.get(id=media_id)
         context = {
             'media': media,
+            'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+            'parallel_chunks': settings.CHUNKED_UPLOAD_PARALLEL_CHUNKS,
+            'direct_s3_upload': settings.STORAGE_BACKEND == 's3' and settings.DIRECT_UPLOAD_TO_S3,
             # Django Admin 需要的一些上下文变量
             'opts': Media._meta,
             'site_header': admin.site.site_header,
@@ -144,11 +301,12 @@ def batch_upload_page_view(request, media_id):
 def trigger_ingest_task(request, media_id):
     """
     这个视图专门用于从前端接收信号，以启动批处理任务。
+    默认只处理新增或变化的文件；带上 ?full=1 时重新处理所有文件。
     """
     media = get_object_or_404(Media, pk=media_id)
 
     # 触发核心的 Celery 任务
-    ingest_media_files.delay(str(media.id))
+    ingest_media_files.delay(str(media.id), force=request.GET.get('full') == '1')
 
     # 向用户显示成功消息
     messages.success(request, f"已成功为《{media.title}》启动后台批量加载任务，请稍后刷新查看状态。")
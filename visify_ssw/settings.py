@@ -157,16 +157,52 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_IMPORTS = ('apps.media_assets.tasks',)
 
+# Temp Artifact Reaper
+# 定时清理崩溃或中断的任务遗留的临时产物（temp_processed、temp_segments、temp_modeler_inputs、batch_uploads）
+TEMP_REAPER_INTERVAL_MINUTES = config('TEMP_REAPER_INTERVAL_MINUTES', default=60, cast=int)
+# 不属于运行中任务的临时产物超过该时长未修改即删除
+TEMP_REAPER_MAX_AGE_HOURS = config('TEMP_REAPER_MAX_AGE_HOURS', default=6, cast=float)
+# processing 状态超过该时长的 Asset 视为其任务已崩溃，不再保护它的临时产物
+TEMP_REAPER_STALE_HOURS = config('TEMP_REAPER_STALE_HOURS', default=24, cast=float)
+# 未完成的分片上传会话的保留时长
+TEMP_REAPER_PARTIAL_UPLOAD_MAX_AGE_HOURS = config('TEMP_REAPER_PARTIAL_UPLOAD_MAX_AGE_HOURS', default=48, cast=float)
+# 本地模式下加载完成后源文件的保留时长，0 表示永久保留（重新加载需要源文件）
+TEMP_REAPER_UPLOAD_RETENTION_HOURS = config('TEMP_REAPER_UPLOAD_RETENTION_HOURS', default=0, cast=float)
+CELERY_BEAT_SCHEDULE = {
+    'reap-temp-artifacts': {
+        'task': 'apps.media_assets.tasks.reap_temp_artifacts',
+        'schedule': TEMP_REAPER_INTERVAL_MINUTES * 60,
+    },
+}
+
 # AWS Credentials
 AWS_ACCESS_KEY_ID = config('AWS_ACCESS_KEY_ID', default='')
 AWS_SECRET_ACCESS_KEY = config('AWS_SECRET_ACCESS_KEY', default='')
 AWS_STORAGE_BUCKET_NAME = config('AWS_STORAGE_BUCKET_NAME', default='')
 AWS_S3_REGION_NAME = config('AWS_S3_REGION_NAME', default='')
 AWS_S3_CUSTOM_DOMAIN = config('AWS_S3_CUSTOM_DOMAIN', default='')
+# 使用 MinIO 等 S3 兼容服务时的服务地址；预签名 URL 需要浏览器可访问的地址，默认与服务地址相同
+AWS_S3_ENDPOINT_URL = config('AWS_S3_ENDPOINT_URL', default='')
+AWS_S3_PRESIGN_ENDPOINT_URL = config('AWS_S3_PRESIGN_ENDPOINT_URL', default=AWS_S3_ENDPOINT_URL)
 
 # AWS S3 Path Prefixes
 AWS_S3_PROCESSED_VIDEOS_PREFIX = config('AWS_S3_PROCESSED_VIDEOS_PREFIX', default='processed_videos/')
 AWS_S3_SOURCE_SUBTITLES_PREFIX = config('AWS_S3_SOURCE_SUBTITLES_PREFIX', default='source_subtitles/')
+AWS_S3_SOURCE_UPLOADS_PREFIX = config('AWS_S3_SOURCE_UPLOADS_PREFIX', default='batch_uploads/')
+
+# AWS S3 Transfer Tuning
+# 进程内共享的 S3 客户端的连接池大小，需不小于 单次上传并发数 x 同时进行的上传数（视频与字幕并发上传）
+AWS_S3_MAX_POOL_CONNECTIONS = config('AWS_S3_MAX_POOL_CONNECTIONS', default=32, cast=int)
+# 超过该大小的文件使用分片上传；分片大小与单个文件的上传并发数
+AWS_S3_MULTIPART_THRESHOLD = config('AWS_S3_MULTIPART_THRESHOLD', default=16 * 1024 * 1024, cast=int)
+AWS_S3_MULTIPART_CHUNKSIZE = config('AWS_S3_MULTIPART_CHUNKSIZE', default=16 * 1024 * 1024, cast=int)
+AWS_S3_MAX_CONCURRENCY = config('AWS_S3_MAX_CONCURRENCY', default=10, cast=int)
+# 重新处理时，若桶中对象仍是上次上传的内容（ETag 与大小一致）且本地文件的 SHA-256 与记录相同，则跳过上传
+S3_SKIP_IDENTICAL_UPLOADS = config('S3_SKIP_IDENTICAL_UPLOADS', default=True, cast=bool)
+# 上传进度写入 Redis 的间隔（秒）与保留时间（秒），默认使用 Celery 的 Redis
+UPLOAD_PROGRESS_REDIS_URL = config('UPLOAD_PROGRESS_REDIS_URL', default=CELERY_BROKER_URL)
+UPLOAD_PROGRESS_INTERVAL = config('UPLOAD_PROGRESS_INTERVAL', default=1.0, cast=float)
+UPLOAD_PROGRESS_TTL = config('UPLOAD_PROGRESS_TTL', default=24 * 3600, cast=int)
 
 
 # CORS Configuration
@@ -202,16 +238,69 @@ CORS_ALLOW_HEADERS = [
 
 SUBEDITOR_URL = config("SUBEDITOR_URL", default="http://subeditor:3000")
 LOCAL_MEDIA_URL_BASE = config('LOCAL_MEDIA_URL_BASE', default='http://localhost:9999')
+# 本地后端下产出物 URL 是否指向需要登录的 /protected-media/（由 nginx 转发给 Django 校验权限后经 X-Accel-Redirect 发送），
+# 以及 nginx 中对应的 internal location 前缀
+PROTECTED_MEDIA_ENABLED = config('PROTECTED_MEDIA_ENABLED', default=False, cast=bool)
+PROTECTED_MEDIA_INTERNAL_PREFIX = config('PROTECTED_MEDIA_INTERNAL_PREFIX', default='/_protected_media/')
 LABEL_STUDIO_PUBLIC_URL = config("LABEL_STUDIO_PUBLIC_URL", default="http://localhost:8081")
 SUBEDITOR_PUBLIC_URL = config("SUBEDITOR_PUBLIC_URL", default="http://localhost:3000")
 
 # --- 加载存储后端配置 ---
 # 从 .env 文件读取 STORAGE_BACKEND 的值，如果找不到，则默认为 'local'
 STORAGE_BACKEND = config('STORAGE_BACKEND', default='local')
+# 本地后端放置文件时优先尝试的零拷贝方式：'auto' (reflink -> 硬链接)、'reflink'、'hardlink' 或 'copy' (总是复制)
+# 跨文件系统时总会退化为复制
+LOCAL_STORAGE_LINK_MODE = config('LOCAL_STORAGE_LINK_MODE', default='auto')
 
 # FFmpeg Configuration
 FFMPEG_VIDEO_BITRATE = config('FFMPEG_VIDEO_BITRATE', default='2M')
 FFMPEG_VIDEO_PRESET = config('FFMPEG_VIDEO_PRESET', default='fast')
+# 是否启用转码缓存：相同源文件 + 相同编码参数时直接复用已有的处理后视频
+TRANSCODE_CACHE_ENABLED = config('TRANSCODE_CACHE_ENABLED', default=True, cast=bool)
+# 处理后视频的输出格式：'mp4' (单码率渐进式 MP4) 或 'hls' (多码率 HLS 分片 + 主播放列表)
+VIDEO_OUTPUT_FORMAT = config('VIDEO_OUTPUT_FORMAT', default='mp4')
+# HLS 码率阶梯，格式为逗号分隔的 "高度:码率"
+HLS_BITRATE_LADDER = config('HLS_BITRATE_LADDER', default='720:2M,480:1M,360:500k')
+HLS_SEGMENT_SECONDS = config('HLS_SEGMENT_SECONDS', default=4, cast=int)
+# 源文件已是满足目标规格的 H.264 时，跳过重新编码，仅做流复制 + faststart 封装
+REMUX_FAST_PATH_ENABLED = config('REMUX_FAST_PATH_ENABLED', default=True, cast=bool)
+REMUX_MAX_HEIGHT = config('REMUX_MAX_HEIGHT', default=1080, cast=int)
+# 电影类 Media 的分段并行转码：在关键帧处切分为 N 分钟的片段，分发给多个 worker 并行编码后拼接
+SEGMENTED_TRANSCODE_ENABLED = config('SEGMENTED_TRANSCODE_ENABLED', default=True, cast=bool)
+SEGMENTED_TRANSCODE_SEGMENT_MINUTES = config('SEGMENTED_TRANSCODE_SEGMENT_MINUTES', default=5, cast=int)
+# FFmpeg 转码进度写入 Asset 的最小间隔（秒）
+FFMPEG_PROGRESS_INTERVAL = config('FFMPEG_PROGRESS_INTERVAL', default=0.5, cast=float)
+# S3 后端下是否让 FFmpeg 直接输出 fragmented MP4 到管道并边编码边分片上传（不落地临时文件）
+FFMPEG_STREAM_TO_S3 = config('FFMPEG_STREAM_TO_S3', default=False, cast=bool)
+# 流式分片上传的分片大小（字节，S3 要求除最后一片外不小于 5MB）与最大在途分片数
+S3_STREAM_PART_SIZE = config('S3_STREAM_PART_SIZE', default=16 * 1024 * 1024, cast=int)
+S3_STREAM_MAX_INFLIGHT_PARTS = config('S3_STREAM_MAX_INFLIGHT_PARTS', default=4, cast=int)
+# 批量加载时为每个 Asset 生成时间轴预览用的缩略图雪碧图与 WebVTT 索引：截帧间隔（秒）、缩略图宽度、每张雪碧图的列数与行数
+THUMBNAIL_SPRITES_ENABLED = config('THUMBNAIL_SPRITES_ENABLED', default=True, cast=bool)
+THUMBNAIL_INTERVAL_SECONDS = config('THUMBNAIL_INTERVAL_SECONDS', default=2, cast=int)
+THUMBNAIL_WIDTH = config('THUMBNAIL_WIDTH', default=160, cast=int)
+THUMBNAIL_SPRITE_COLUMNS = config('THUMBNAIL_SPRITE_COLUMNS', default=10, cast=int)
+THUMBNAIL_SPRITE_ROWS = config('THUMBNAIL_SPRITE_ROWS', default=10, cast=int)
+# 批量加载时额外生成仅用于标注的代理视频（Label Studio 任务使用它）：高度、CRF 质量与关键帧间隔（秒）
+PROXY_RENDITION_ENABLED = config('PROXY_RENDITION_ENABLED', default=True, cast=bool)
+PROXY_HEIGHT = config('PROXY_HEIGHT', default=360, cast=int)
+PROXY_CRF = config('PROXY_CRF', default=28, cast=int)
+PROXY_KEYFRAME_INTERVAL_SECONDS = config('PROXY_KEYFRAME_INTERVAL_SECONDS', default=0.5, cast=float)
+
+# Ingestion Configuration
+# 批量上传页面的分片大小（字节）、每个文件同时在途的分片数，以及服务端接受的最大分片大小
+CHUNKED_UPLOAD_CHUNK_SIZE = config('CHUNKED_UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024, cast=int)
+CHUNKED_UPLOAD_PARALLEL_CHUNKS = config('CHUNKED_UPLOAD_PARALLEL_CHUNKS', default=4, cast=int)
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = config('CHUNKED_UPLOAD_MAX_CHUNK_SIZE', default=64 * 1024 * 1024, cast=int)
+# S3 后端下，批量上传页面通过预签名 URL 将源文件分片直传到桶中，不再经过 Django（默认关闭，需显式启用）
+# 注意：桶需要配置允许浏览器来源的 PUT 请求的 CORS 规则
+DIRECT_UPLOAD_TO_S3 = config('DIRECT_UPLOAD_TO_S3', default=False, cast=bool)
+S3_DIRECT_UPLOAD_PART_SIZE = config('S3_DIRECT_UPLOAD_PART_SIZE', default=16 * 1024 * 1024, cast=int)
+S3_DIRECT_UPLOAD_URL_EXPIRES = config('S3_DIRECT_UPLOAD_URL_EXPIRES', default=3600, cast=int)
+# 单个 Media 批量加载时最多同时占用的 worker 数量，0 表示不限制
+INGEST_MAX_CONCURRENCY = config('INGEST_MAX_CONCURRENCY', default=4, cast=int)
+# 生成叙事蓝图时并行解析各章节 ASS 文件的最大进程数，0 表示按 CPU 核数，1 表示在 worker 进程内逐个解析
+BLUEPRINT_PARSE_MAX_WORKERS = config('BLUEPRINT_PARSE_MAX_WORKERS', default=4, cast=int)
 
 from django.utils.functional import SimpleLazyObject
 
@@ -25,6 +25,9 @@ urlpatterns = [
     path('admin/login/', RedirectView.as_view(pattern_name='oidc_authentication_init')),
     path('admin/', admin.site.urls),
     path('status/', media_views.status_view, name='status_view'),
+    # 受保护的本地媒体文件：权限校验后通过 X-Accel-Redirect 交给 nginx 发送
+    path('protected-media/<uuid:asset_id>/<path:relative_path>', media_views.protected_asset_media,
+         name='protected_asset_media'),
     path('integrations/ls/', include('apps.media_assets.urls', namespace='media_assets')),
     path('oidc/', include('mozilla_django_oidc.urls')),
     path('debug/oidc-config/', media_views.debug_oidc_config_view, name='debug_oidc_config'),